@@ -0,0 +1,157 @@
+"""
+Allocation budget of the Sentencer. Parses a synthetic corpus (and any .lf files given) and measures, per token:
+    allocations: memory blocks allocated by the parse, temporaries included. sys.getallocatedblocks is sampled
+        before every bytecode instruction (sys.monitoring) and what it grew by is summed: a list or closure built
+        and dropped in the same call is counted, the live memory measures below never see it
+    blocks: memory blocks still allocated after the parse (sys.getallocatedblocks), the sentences and words it built
+    peak: bytes of the biggest the parse got (tracemalloc), what it built plus what it was holding while building it
+Fails (exit code 1) when a measure goes over the budget recorded in allocationBudget.json by more than the tolerance,
+run with --record to write the current measures as the new budget. The interpreter changes its allocations between
+versions, every python version (major.minor) has its own budget
+The tokens are made before measuring, only the parse is counted
+"""
+
+import argparse
+import gc
+import json
+import os
+import sys
+import tracemalloc
+
+from tokenizer import Token, Tokenizer
+from sentencer import Sentencer
+
+
+BUDGET_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "allocationBudget.json")
+DEFAULT_TOLERANCE = 0.05
+VERSION = "{}.{}".format(*sys.version_info[:2])
+MEASURES = ("allocations", "blocks", "peak")
+
+
+def syntheticCorpus(nFunctions: int = 400) -> str:
+    """Source using every construct the sentencer knows: classes with features and generics, functions with generic
+        constraints, declarations, chains of calls, string and number literals and operators
+    """
+    parts = []
+    for i in range(nFunctions):
+        parts.append(
+            f"class Vehicle{i}<T: Engine{i}|Motor % Drives&Stops, U>{{\n"
+            f"    speed: [Value]float = 0.5;\n"
+            f"    def getSpeed(unit: string): float {{\n"
+            f"        return speed + {i};\n"
+            f"    }}\n"
+            f"}}\n"
+            f"def route{i}<T>(car: Vehicle{i}, name: string, stops: Array[Heap]<int>): int {{\n"
+            f"    distance: int = {i} + stops.get(0) + car.getSpeed(\"km\").max.inUnit(\"m{i}\");\n"
+            f"    label: string = \"route\" + name;\n"
+            f"    log(label, distance, cast<int>(car.speed));\n"
+            f"    return distance;\n"
+            f"}}\n"
+        )
+    return "".join(parts)
+
+
+def countAllocations(parse) -> int:
+    """Blocks allocated while parse runs, summing what sys.getallocatedblocks grew by between two instructions.
+        An instruction that allocates and frees the same block (inside a C call) is not seen. Call with gc disabled
+    """
+    monitoring = sys.monitoring
+    tool = monitoring.PROFILER_ID
+    getBlocks = sys.getallocatedblocks
+    count = [getBlocks(), 0] #BLOCKS AT THE LAST INSTRUCTION, BLOCKS ALLOCATED
+
+    def onInstruction(code, offset) -> None:
+        now = getBlocks()
+        if now > count[0]: count[1] += now - count[0]
+        count[0] = now
+
+    monitoring.use_tool_id(tool, "allocationBudget")
+    try:
+        monitoring.register_callback(tool, monitoring.events.INSTRUCTION, onInstruction)
+        count[0] = getBlocks()
+        monitoring.set_events(tool, monitoring.events.INSTRUCTION)
+        try:
+            parse()
+        finally:
+            monitoring.set_events(tool, monitoring.events.NO_EVENTS)
+            monitoring.register_callback(tool, monitoring.events.INSTRUCTION, None)
+    finally:
+        monitoring.free_tool_id(tool)
+    return count[1]
+
+
+def measure(tokens: list[Token]) -> dict[str, float]:
+    """Allocations per token of one (eager) parse of the tokens"""
+    sentencer = Sentencer()
+    sentencer.parseSentences(tokens) #WARM UP: INTERNED NAMES, CACHES OF THE INTERPRETER
+
+    gc.collect()
+    gc.disable()
+    try:
+        tracemalloc.start()
+        before = sys.getallocatedblocks()
+        tracedBefore = tracemalloc.get_traced_memory()[0]
+
+        result = sentencer.parseSentences(tokens)
+
+        blocks = sys.getallocatedblocks() - before
+        peak = tracemalloc.get_traced_memory()[1] - tracedBefore
+        tracemalloc.stop()
+        del result
+
+        allocations = countAllocations(lambda: sentencer.parseSentences(tokens))
+    finally:
+        gc.enable()
+
+    return {"tokens": len(tokens), "allocations": allocations / len(tokens), "blocks": blocks / len(tokens), "peak": peak / len(tokens)}
+
+
+def check(measures: dict[str, float], budget: dict[str, float], tolerance: float) -> list[str]:
+    """Measures over the budget"""
+    over = []
+    for name in MEASURES:
+        if measures[name] > budget[name] * (1 + tolerance):
+            over.append(f"{name} per token is {measures[name]:.2f}, the budget is {budget[name]:.2f}")
+    return over
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Check the allocations per token of the sentencer against its budget")
+    parser.add_argument("paths", nargs="*", help=".lf files parsed together with the synthetic corpus")
+    parser.add_argument("--record", action="store_true", help="write the current measures as the budget")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="how much over the budget is still accepted (0.05 is 5%%)")
+    args = parser.parse_args()
+
+    source = syntheticCorpus()
+    for path in args.paths:
+        with open(path, "r") as f:
+            source += "\n" + f.read()
+
+    measures = measure(Tokenizer().tokenize(source))
+    print(f"{measures['tokens']} tokens: {measures['allocations']:.2f} allocations, {measures['blocks']:.2f} blocks and {measures['peak']:.2f} peak bytes per token")
+
+    budgets = {}
+    if os.path.exists(BUDGET_PATH):
+        with open(BUDGET_PATH, "r") as f:
+            budgets = json.load(f)
+
+    if args.record:
+        budgets[VERSION] = {name: round(measures[name], 2) for name in MEASURES}
+        with open(BUDGET_PATH, "w") as f:
+            json.dump(dict(sorted(budgets.items())), f, indent=4)
+            f.write("\n")
+        print(f"Budget of python {VERSION} recorded in {BUDGET_PATH}")
+        return
+
+    if VERSION not in budgets:
+        print(f"No budget recorded for python {VERSION}, run with --record to add it to {BUDGET_PATH}")
+        sys.exit(1)
+
+    over = check(measures, budgets[VERSION], args.tolerance)
+    for line in over: print(f"Over budget: {line}")
+    if len(over) > 0: sys.exit(1)
+    print("Within budget")
+
+
+if __name__ == "__main__":
+    main()
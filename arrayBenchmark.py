@@ -0,0 +1,114 @@
+"""
+Memory and throughput of unboxed arrays (TypedArray) against boxed ones (BoxedArray, a list of python objects), for
+both backends of TypedArray: a NumPy array, and the array.array used when NumPy is not installed. Reports per array
+of --size ints:
+    memory: bytes still allocated (tracemalloc) after building it from a list of new values, the list is dropped
+    the time of the bulk operations (fill, sum, add a number, add an array) and of reading and writing it one
+    element at a time, as interpreted code does
+The results of every backend are checked against the boxed ones before timing
+"""
+
+import argparse
+import time
+import tracemalloc
+
+import arrayStorage
+from arrayStorage import ArrayLayout, BoxedArray, TypedArray, fromList
+
+
+def boxedOperations(size: int) -> dict:
+    """The same operations done on a BoxedArray, the bulk ones as list comprehensions over its values"""
+
+    def fill(array: BoxedArray) -> None: array._storeFlat([0] * size)
+    def total(array: BoxedArray): return sum(array.values)
+    def addNumber(array: BoxedArray): return [value + 1 for value in array.values]
+    def addArray(array: BoxedArray): return [a + b for a, b in zip(array.values, array.values)]
+    return {"fill": fill, "sum": total, "add number": addNumber, "add array": addArray}
+
+
+def typedOperations(size: int) -> dict:
+    def fill(array: TypedArray) -> None: array.fill(0)
+    def total(array: TypedArray): return array.sum()
+    def addNumber(array: TypedArray): return array.add(1)
+    def addArray(array: TypedArray): return array.add(array)
+    return {"fill": fill, "sum": total, "add number": addNumber, "add array": addArray}
+
+
+def elementLoop(array: TypedArray | BoxedArray) -> None:
+    for i in range(len(array)): array[i] = array[i] + 1
+
+
+def comparable(result):
+    if isinstance(result, (TypedArray, BoxedArray)): return result.tolist()
+    return result
+
+
+def best(function, repeats: int) -> float:
+    elapsed = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        elapsed = min(elapsed, time.perf_counter() - start)
+    return elapsed
+
+
+def retained(build) -> int:
+    """Bytes still allocated by what build returns"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    allocated = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del result
+    return allocated
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare the memory and speed of unboxed and boxed leaf arrays")
+    parser.add_argument("--size", type=int, default=1_000_000, help="ints per array")
+    parser.add_argument("--loop-size", type=int, default=100_000, help="ints of the arrays walked one element at a time")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    newValues = lambda: [1_000_000 + i for i in range(args.size)] #NOT SMALL INTS, EVERY BOXED ELEMENT IS ITS OWN OBJECT
+    values = newValues()
+    typed = ArrayLayout("int", None, ["Value"])
+    boxed = ArrayLayout("int", None, ["Heap"])
+
+    installedNumpy = arrayStorage.numpy
+    backends = [("array.array", None)] + ([("numpy", installedNumpy)] if installedNumpy is not None else [])
+    if installedNumpy is None: print("NumPy is not installed, only the array.array backend is measured")
+
+    boxedArray, boxedLoop = fromList(boxed, values), fromList(boxed, values[:args.loop_size])
+    expected = {name: comparable(operation(fromList(boxed, values))) for name, operation in boxedOperations(args.size).items()}
+
+    rows = [("boxed", retained(lambda: fromList(boxed, newValues())),
+        {name: best(lambda: operation(boxedArray), args.repeats) for name, operation in boxedOperations(args.size).items()},
+        best(lambda: elementLoop(boxedLoop), args.repeats))]
+
+    try:
+        for backend, module in backends:
+            arrayStorage.numpy = module
+            for name, operation in typedOperations(args.size).items():
+                result = comparable(operation(fromList(typed, values)))
+                if result != expected[name]: raise Exception(f"{backend} gives a different result for {name}")
+            looped = fromList(typed, values[:args.loop_size])
+            elementLoop(looped)
+            if looped.tolist() != [value + 1 for value in values[:args.loop_size]]: raise Exception(f"{backend} gives a different result walking the array")
+
+            typedArray, typedLoop = fromList(typed, values), fromList(typed, values[:args.loop_size])
+            rows.append((backend, retained(lambda: fromList(typed, newValues())),
+                {name: best(lambda: operation(typedArray), args.repeats) for name, operation in typedOperations(args.size).items()},
+                best(lambda: elementLoop(typedLoop), args.repeats)))
+    finally:
+        arrayStorage.numpy = installedNumpy
+
+    names = list(boxedOperations(args.size))
+    print(f"{args.size} ints, {args.loop_size} walked one at a time, times in ms")
+    print(f"{'':>12} {'bytes/int':>10}" + "".join(f" {name:>11}" for name in names) + f" {'loop':>9}")
+    for backend, memory, times, loop in rows:
+        print(f"{backend:>12} {memory / args.size:>10.1f}" + "".join(f" {times[name] * 1000:>11.2f}" for name in names) + f" {loop * 1000:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
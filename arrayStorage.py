@@ -0,0 +1,289 @@
+"""
+Runtime storage of leaf arrays. The storage features of the descriptor decide the layout:
+    Array[Value]<int> and Array[Value]<float> live unboxed in one contiguous buffer (a NumPy array if NumPy is
+    installed, an array.array otherwise). Nested arrays are the same single buffer with row major strides:
+    Array[Value]<int>(2, 3) is 6 ints, the row i starts at i * 3
+    Any other array is a list of boxed objects
+    Array[Stack] needs its shape when it is declared, the size of a stack frame is fixed
+Unboxed ints are checked on both backends: storing a float in an int array, or an int (given or computed) that
+does not fit in 64 bits raises, nothing is truncated or wraps around
+"""
+
+import array
+import operator
+from itertools import repeat
+from math import prod
+
+import words
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+TYPECODES = {"int": "q", "float": "d"} #ELEMENT TYPES THAT CAN BE STORED UNBOXED, 64 BITS EACH
+DTYPES = {"q": "int64", "d": "float64"}
+INT_MIN, INT_MAX = -(1 << 63), (1 << 63) - 1
+
+
+class ArrayLayout:
+    """Element type, shape (None if only known at runtime) and storage features of an array"""
+    __slots__ = ("elementType", "shape", "features")
+
+    def __init__(self, elementType: str, shape: tuple[int, ...] | None, features: list[str]) -> None:
+        self.elementType: str = elementType
+        self.shape: tuple[int, ...] | None = shape
+        self.features: frozenset[str] = frozenset(features)
+
+        if "Stack" in self.features and shape is None:
+            raise Exception(f"Array[Stack]<{elementType}> needs a fixed shape")
+
+    @staticmethod
+    def fromDescriptor(descriptor: words.VariableDescriptor, shape: tuple[int, ...] | None = None) -> "ArrayLayout":
+        """Layout of an Array descriptor, the element type is its first generic. shape comes from the construction
+            (Array<int>(2, 3)), a nested array is one more dimension of the same buffer
+        """
+        if len(descriptor.typeTree) == 0 or descriptor.typeTree[-1].value != "Array":
+            raise Exception(f"{descriptor} is not an Array")
+        if len(descriptor.generics) == 0 or len(descriptor.generics[0].typeTree) == 0:
+            raise Exception(f"{descriptor} does not say the type of its elements")
+
+        return ArrayLayout(descriptor.generics[0].typeTree[-1].value, shape, descriptor.features)
+
+    @property
+    def typecode(self) -> str | None:
+        """array.array typecode of the elements, None if they are boxed"""
+        if "Value" not in self.features: return None
+        return TYPECODES.get(self.elementType)
+
+    @property
+    def strides(self) -> tuple[int, ...]:
+        """In elements, row major"""
+        strides = [1]
+        for size in reversed(self.shape[1:]):
+            strides.insert(0, strides[0] * size)
+        return tuple(strides)
+
+    def __repr__(self) -> str:
+        return f"Array[{', '.join(sorted(self.features))}]<{self.elementType}>{self.shape}"
+
+
+def newArray(layout: ArrayLayout, shape: tuple[int, ...] | None = None) -> "TypedArray | BoxedArray":
+    """Zero filled (None filled if boxed) array with the storage its layout asks for"""
+    if shape is not None: layout = ArrayLayout(layout.elementType, shape, layout.features)
+    if layout.shape is None: raise Exception(f"Cannot allocate {layout} without its shape")
+
+    if layout.typecode is not None: return TypedArray(layout)
+    return BoxedArray(layout)
+
+
+def fromList(layout: ArrayLayout, values: list) -> "TypedArray | BoxedArray":
+    """Array with the given (possibly nested) values, the shape is taken from them"""
+    shape = []
+    level = values
+    while isinstance(level, list):
+        shape.append(len(level))
+        level = level[0] if len(level) > 0 else None
+
+    flat = values
+    for _ in range(len(shape) - 1):
+        flat = [value for row in flat for value in row]
+    if len(flat) != prod(shape):
+        raise Exception(f"Cannot make {layout.elementType} array of shape {tuple(shape)}, the rows are not all the same length")
+
+    result = newArray(layout, tuple(shape))
+    result._storeFlat(flat)
+    return result
+
+
+class TypedArray:
+    """Unboxed elements in one buffer. Indexing with less indices than dimensions gives a view of the same buffer"""
+    __slots__ = ("layout", "buffer", "offset", "shape", "strides")
+
+    def __init__(self, layout: ArrayLayout, buffer=None, offset: int = 0, shape: tuple[int, ...] | None = None) -> None:
+        self.layout: ArrayLayout = layout
+        self.shape: tuple[int, ...] = layout.shape if shape is None else shape
+        self.strides: tuple[int, ...] = layout.strides[len(layout.shape) - len(self.shape):]
+        self.offset: int = offset
+
+        if buffer is None:
+            size = prod(self.shape)
+            if numpy is not None: buffer = numpy.zeros(size, DTYPES[layout.typecode])
+            else: buffer = array.array(layout.typecode, bytes(array.array(layout.typecode).itemsize * size))
+        self.buffer = buffer
+
+    @property
+    def size(self) -> int:
+        return prod(self.shape)
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    def _flat(self):
+        """The elements of this array (or view), contiguous in the buffer"""
+        return self.buffer[self.offset:self.offset + self.size]
+
+    def _storeFlat(self, values) -> None:
+        if numpy is not None:
+            if self.layout.elementType == "int": values = self._checkedInts(values)
+            self.buffer[self.offset:self.offset + self.size] = values
+        elif isinstance(values, array.array) and values.typecode == self.layout.typecode:
+            self.buffer[self.offset:self.offset + self.size] = values
+        else:
+            if not isinstance(values, (list, tuple, array.array)): values = list(values)
+            try:
+                self.buffer[self.offset:self.offset + self.size] = array.array(self.layout.typecode, values)
+            except (TypeError, OverflowError):
+                for value in values: self._checkElement(value)
+                raise
+
+    def _checkElement(self, value):
+        """The value if an element of this array can hold it, raises if it would be truncated or not fit"""
+        if self.layout.elementType != "int": return value
+        if isinstance(value, float) or (numpy is not None and isinstance(value, numpy.floating)):
+            raise Exception(f"Cannot store the float {value} in an int array")
+        if not INT_MIN <= value <= INT_MAX:
+            raise Exception(f"Cannot store {value} in an int array, it does not fit in 64 bits")
+        return value
+
+    def _checkedInts(self, values):
+        """values as a NumPy array of ints, NumPy would truncate floats and wrap big ints without a word"""
+        given = values if isinstance(values, (list, tuple, array.array, numpy.ndarray)) else list(values)
+        values = numpy.asarray(given)
+        if values.size == 0 or values.dtype.kind in "bi": return values
+        if values.dtype.kind == "u" and values.max() <= INT_MAX: return values
+
+        for value in (given.tolist() if isinstance(given, numpy.ndarray) else given): self._checkElement(value)
+        return values
+
+    def _locate(self, index: int | tuple[int, ...]) -> tuple[int, int]:
+        """Flat position of the index and number of dimensions it consumed"""
+        if not isinstance(index, tuple): index = (index,)
+        if len(index) > len(self.shape):
+            raise IndexError(f"{len(index)} indices for an array of {len(self.shape)} dimensions")
+
+        position = self.offset
+        for i, size, stride in zip(index, self.shape, self.strides):
+            if i < 0: i += size
+            if not 0 <= i < size: raise IndexError(f"Index {i} out of an array of size {size}")
+            position += i * stride
+        return position, len(index)
+
+    def __getitem__(self, index: int | tuple[int, ...]):
+        position, depth = self._locate(index)
+        if depth == len(self.shape): return self.buffer[position].item() if numpy is not None else self.buffer[position]
+        return TypedArray(self.layout, self.buffer, position, self.shape[depth:])
+
+    def __setitem__(self, index: int | tuple[int, ...], value) -> None:
+        position, depth = self._locate(index)
+        if depth == len(self.shape):
+            self.buffer[position] = self._checkElement(value)
+        else:
+            TypedArray(self.layout, self.buffer, position, self.shape[depth:])._storeFlat(value._flat() if isinstance(value, TypedArray) else value)
+
+    def __iter__(self):
+        for i in range(self.shape[0]): yield self[i]
+
+    def tolist(self) -> list:
+        flat = self._flat().tolist()
+        for size in reversed(self.shape[1:]):
+            flat = [flat[i:i + size] for i in range(0, len(flat), size)]
+        return flat
+
+    def copy(self) -> "TypedArray":
+        result = TypedArray(ArrayLayout(self.layout.elementType, self.shape, self.layout.features))
+        result._storeFlat(self._flat())
+        return result
+
+
+    ##BULK OPERATIONS, ONE PASS OVER THE BUFFER (IN C) INSTEAD OF ONE INTERPRETED STEP PER ELEMENT
+
+    def fill(self, value) -> None:
+        self._checkElement(value)
+        if numpy is not None: self.buffer[self.offset:self.offset + self.size] = value
+        else: self._storeFlat(array.array(self.layout.typecode, [value]) * self.size)
+
+    def sum(self):
+        if numpy is not None: return self._flat().sum().item()
+        return sum(self._flat())
+
+    def add(self, other: "TypedArray | int | float") -> "TypedArray":
+        return self._elementwise(other, operator.add)
+
+    def multiply(self, other: "TypedArray | int | float") -> "TypedArray":
+        return self._elementwise(other, operator.mul)
+
+    def _elementwise(self, other: "TypedArray | int | float", function) -> "TypedArray":
+        if isinstance(other, TypedArray):
+            if other.shape != self.shape:
+                raise Exception(f"Cannot operate arrays of shapes {self.shape} and {other.shape}")
+            operand = other._flat()
+        else:
+            operand = self._checkElement(other) if isinstance(other, int) else other
+
+        elementType = self.layout.elementType
+        if isinstance(other, float) or (isinstance(other, TypedArray) and other.layout.elementType == "float"): elementType = "float"
+        result = TypedArray(ArrayLayout(elementType, self.shape, self.layout.features))
+
+        if numpy is not None:
+            values = function(self._flat(), operand)
+            if elementType == "int": result._checkOverflow(function, self._flat(), operand)
+            result._storeFlat(values)
+        elif isinstance(other, TypedArray): result._storeFlat(map(function, self._flat(), operand))
+        else: result._storeFlat(map(function, self._flat(), repeat(operand)))
+        return result
+
+    def _checkOverflow(self, function, flat, operand) -> None:
+        """NumPy int64 operations wrap around. The operation is done again in floats, only the elements whose
+            result is near the limits are computed exactly (python ints) to find the ones that do not fit
+        """
+        approximate = function(flat.astype("float64"), operand.astype("float64") if isinstance(operand, numpy.ndarray) else operand)
+        for i in numpy.flatnonzero(numpy.abs(approximate) >= 2.0 ** 62).tolist():
+            self._checkElement(function(int(flat[i]), int(operand[i]) if isinstance(operand, numpy.ndarray) else operand))
+
+
+class BoxedArray:
+    """Elements as python objects in a flat list, same indexing as TypedArray"""
+    __slots__ = ("layout", "values", "offset", "shape", "strides")
+
+    def __init__(self, layout: ArrayLayout, values: list | None = None, offset: int = 0, shape: tuple[int, ...] | None = None) -> None:
+        self.layout: ArrayLayout = layout
+        self.shape: tuple[int, ...] = layout.shape if shape is None else shape
+        self.strides: tuple[int, ...] = layout.strides[len(layout.shape) - len(self.shape):]
+        self.offset: int = offset
+        self.values: list = [None] * prod(self.shape) if values is None else values
+
+    @property
+    def size(self) -> int:
+        return prod(self.shape)
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    def _flat(self) -> list:
+        return self.values[self.offset:self.offset + self.size]
+
+    def _storeFlat(self, values) -> None:
+        self.values[self.offset:self.offset + self.size] = list(values)
+
+    _locate = TypedArray._locate
+
+    def __getitem__(self, index: int | tuple[int, ...]):
+        position, depth = self._locate(index)
+        if depth == len(self.shape): return self.values[position]
+        return BoxedArray(self.layout, self.values, position, self.shape[depth:])
+
+    def __setitem__(self, index: int | tuple[int, ...], value) -> None:
+        position, depth = self._locate(index)
+        if depth == len(self.shape): self.values[position] = value
+        else: BoxedArray(self.layout, self.values, position, self.shape[depth:])._storeFlat(value._flat() if isinstance(value, BoxedArray) else value)
+
+    def __iter__(self):
+        for i in range(self.shape[0]): yield self[i]
+
+    def tolist(self) -> list:
+        flat = self._flat()
+        for size in reversed(self.shape[1:]):
+            flat = [flat[i:i + size] for i in range(0, len(flat), size)]
+        return flat
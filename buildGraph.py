@@ -0,0 +1,255 @@
+"""
+The build graph remembers what every leaf file exports and which external names it references,
+so changing one file only rebuilds that file and the files whose imported interfaces changed
+"""
+
+import hashlib
+import json
+import os
+
+import sentences
+import words
+from sentences import Sentence
+from tokenizer import Tokenizer
+from sentencer import Sentencer
+
+
+STATE_FILE = ".leafbuild.json"
+
+
+def hashText(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class FileInterface:
+    """What a file offers to others (exports, name -> signature) and what it needs from them (references)"""
+
+    def __init__(self, contentHash: str, exports: dict[str, str], references: set[str]) -> None:
+        self.contentHash: str = contentHash
+        self.exports: dict[str, str] = exports
+        self.references: set[str] = references
+        self.interfaceHash: str = hashText(json.dumps(sorted(exports.items())))
+
+    @staticmethod
+    def fromSentences(contentHash: str, sentenceList: list[Sentence]) -> "FileInterface":
+        exports: dict[str, str] = {}
+        references: set[str] = set()
+        depth = 0
+        pendingClass: str | None = None
+        owner: str | None = None #CLASS WHOSE BODY IS BEING READ, ITS MEMBERS ARE PART OF ITS EXPORT
+
+        for sentence in sentences.flatten(sentenceList):
+            if type(sentence) == sentences.ScopeOpener:
+                if depth == 0: owner = pendingClass
+                pendingClass = None
+                depth += 1
+            elif type(sentence) == sentences.ScopeCloser:
+                depth -= 1
+                if depth == 0: owner = None
+
+            elif type(sentence) == sentences.FunctionDeclaration:
+                if depth == 0: exports[sentence.name] = repr(sentence)
+                elif depth == 1 and owner is not None: exports[owner] += f"\nmethod {sentence!r}"
+                for parameter in sentence.parameters: _descriptorReferences(parameter.descriptor, references)
+                _genericsReferences(sentence.generics, references)
+                _descriptorReferences(sentence.returnDescriptor, references)
+
+            elif type(sentence) == sentences.ClassDeclaration:
+                if depth == 0:
+                    exports[sentence.name] = f"class {sentence.name} features {sentence.features} generics {sentence.generics}"
+                    pendingClass = sentence.name
+                _genericsReferences(sentence.generics, references)
+
+            elif type(sentence) == sentences.VariableDeclaration:
+                if depth == 1 and owner is not None: exports[owner] += f"\nfield {sentence.variableName}: {sentence.descriptor}"
+                _descriptorReferences(sentence.descriptor, references)
+
+            elif type(sentence) == sentences.VariableAssignment:
+                if depth == 1 and owner is not None and sentence.descriptor is not None:
+                    exports[owner] += f"\nfield {sentence.nameTree[0].value}: {sentence.descriptor}"
+                _crawlableReferences(sentence.nameTree, references)
+                if sentence.descriptor is not None: _descriptorReferences(sentence.descriptor, references)
+                _expressionReferences(sentence.expression, references)
+
+            elif type(sentence) == sentences.ReturnExpression:
+                _expressionReferences(sentence.expression, references)
+
+            elif type(sentence) == sentences.NakedFunctionCall:
+                _crawlableReferences(sentence.tree, references)
+
+        return FileInterface(contentHash, exports, references - exports.keys())
+
+    def toJson(self) -> dict:
+        return {"contentHash": self.contentHash, "exports": self.exports, "references": sorted(self.references)}
+
+    @staticmethod
+    def fromJson(data: dict) -> "FileInterface":
+        return FileInterface(data["contentHash"], data["exports"], set(data["references"]))
+
+
+def _expressionReferences(expression: words.Expression, references: set[str]) -> None:
+    if type(expression) == words.Operator:
+        _expressionReferences(expression.leftHand, references)
+        _expressionReferences(expression.rightHand, references)
+    else:
+        _crawlableReferences(expression, references)
+
+def _crawlableReferences(tree: list[words.Crawlable], references: set[str]) -> None:
+    """Only the head of a chain can be external, car.speed references car but not speed"""
+    for i, crawlable in enumerate(tree):
+        if type(crawlable) == words.NameMention:
+            if i == 0: references.add(crawlable.value)
+
+        elif type(crawlable) == words.FunctionCall:
+            if i == 0: references.add(crawlable.functionName)
+            for argument in crawlable.parameters: _expressionReferences(argument, references)
+            _genericsReferences(crawlable.generics, references)
+
+def _descriptorReferences(descriptor: words.VariableDescriptor, references: set[str]) -> None:
+    if len(descriptor.typeTree) > 0: references.add(descriptor.typeTree[0].value)
+    _genericsReferences(descriptor.generics, references)
+
+def _genericsReferences(generics: list[words.Generic], references: set[str]) -> None:
+    for generic in generics:
+        for tree in [generic.typeTree] + generic.appertains + generic.behaves:
+            if len(tree) > 0: references.add(tree[0].value)
+
+
+def collectFiles(paths: list[str]) -> list[str]:
+    """Expands directories to the .lf files they contain"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in sorted(os.walk(path)):
+                files += [os.path.join(root, n) for n in sorted(names) if n.endswith(".lf")]
+        else:
+            files.append(path)
+    return files
+
+
+class BuildStep:
+    """A file that has to be recompiled, why, and its already parsed sentences (if the graph had to parse it)"""
+
+    def __init__(self, path: str, reason: str, sentences: list[Sentence] | None) -> None:
+        self.path: str = path
+        self.reason: str = reason
+        self.sentences: list[Sentence] | None = sentences
+
+
+class BuildGraph:
+    """Decides which files need to be recompiled. The state persists in a json file between runs"""
+
+    def __init__(self, statePath: str = STATE_FILE) -> None:
+        self.statePath: str = statePath
+        self.interfaces: dict[str, FileInterface] = {}
+        self.dependencies: dict[str, dict[str, str]] = {} #path -> {dependency path -> interface hash at last build}
+        self.built: set[str] = set()
+        self.load()
+
+    def load(self) -> None:
+        if not os.path.exists(self.statePath): return
+
+        with open(self.statePath, "r") as f:
+            state = json.load(f)
+
+        for path, data in state["files"].items():
+            self.interfaces[path] = FileInterface.fromJson(data["interface"])
+            self.dependencies[path] = data["dependencies"]
+            if not data.get("failed", False): self.built.add(path)
+
+    def save(self) -> None:
+        """Every known file, also the ones not in the last plan, failed ones are flagged to be rebuilt"""
+        files = {path: {"interface": self.interfaces[path].toJson(), "dependencies": self.dependencies.get(path, {}), "failed": path not in self.built}
+            for path in sorted(self.interfaces)}
+        with open(self.statePath, "w") as f:
+            json.dump({"files": files}, f, indent=1)
+
+
+    def plan(self, paths: list[str], changed: set[str] | None = None) -> list[BuildStep]:
+        """Returns the files that have to be rebuilt, in the order given
+            If changed is given only those files (and the ones the graph does not know yet) are read again
+            Files known from earlier runs but not given keep their state, and still export to the given ones,
+            only the files that do not exist anymore are forgotten
+        """
+
+        paths = [os.path.normpath(p) for p in paths]
+        if changed is not None: changed = {os.path.normpath(p) for p in changed}
+        reasons: dict[str, str] = {}
+        parsed: dict[str, list[Sentence]] = {}
+
+        for path in set(self.interfaces) - set(paths):
+            if not os.path.exists(path): self._forget(path)
+
+        for path in paths:
+            if changed is not None and path not in changed and path in self.interfaces: continue
+
+            with open(path, "r") as f:
+                content = f.read()
+
+            contentHash = hashText(content)
+            previous = self.interfaces.get(path)
+            if previous is not None and previous.contentHash == contentHash and path in self.built: continue
+
+            try:
+                parsed[path] = Sentencer().parseSentences(Tokenizer().tokenize(content))
+                self.interfaces[path] = FileInterface.fromSentences(contentHash, parsed[path])
+            except Exception:
+                #THE REBUILD WILL REPORT THE ERROR, UNTIL THEN THE FILE OFFERS NOTHING
+                self.interfaces[path] = FileInterface(contentHash, {}, set())
+            self.built.discard(path)
+            if previous is None: reasons[path] = "new file"
+            elif previous.contentHash == contentHash: reasons[path] = "last build failed"
+            else: reasons[path] = "content changed"
+
+        exporters: dict[str, str] = {}
+        for path in paths + sorted(set(self.interfaces) - set(paths)): #THE GIVEN FILES FIRST
+            for name in self.interfaces[path].exports:
+                exporters.setdefault(name, path)
+
+        for path in paths:
+            current = self._dependenciesOf(path, exporters)
+            if path not in reasons:
+                reasons.update(self._dependencyChange(path, current))
+            self.dependencies[path] = current
+
+        return [BuildStep(path, reasons[path], parsed.get(path)) for path in paths if path in reasons]
+
+    def markBuilt(self, path: str) -> None:
+        self.built.add(os.path.normpath(path))
+
+    def markFailed(self, path: str) -> None:
+        """Failed files are saved flagged, they are retried on the next run"""
+        self.built.discard(os.path.normpath(path))
+
+    def dependentsOf(self, path: str) -> set[str]:
+        path = os.path.normpath(path)
+        return {p for p, deps in self.dependencies.items() if path in deps}
+
+
+    def _forget(self, path: str) -> None:
+        self.interfaces.pop(path, None)
+        self.dependencies.pop(path, None)
+        self.built.discard(path)
+
+    def _dependenciesOf(self, path: str, exporters: dict[str, str]) -> dict[str, str]:
+        result = {}
+        for name in self.interfaces[path].references:
+            exporter = exporters.get(name)
+            if exporter is not None and exporter != path:
+                result[exporter] = self.interfaces[exporter].interfaceHash
+        return result
+
+    def _dependencyChange(self, path: str, current: dict[str, str]) -> dict[str, str]:
+        previous = self.dependencies.get(path, {})
+
+        for dependency, interfaceHash in sorted(current.items()):
+            if dependency not in previous:
+                return {path: f"now imports from {dependency}"}
+            if previous[dependency] != interfaceHash:
+                return {path: f"interface of {dependency} changed"}
+
+        for dependency in sorted(previous):
+            if dependency not in current:
+                return {path: f"no longer imports from {dependency}"}
+
+        return {}
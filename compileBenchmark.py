@@ -0,0 +1,99 @@
+"""
+Speedup of checking function bodies on a process pool. Compiles a generated file with thousands of functions with
+1 worker (everything in this process) and with more, and reports:
+    check: both passes of the compiler (global symbols, then the bodies, in parallel if there are workers)
+    infer: the type inference that runs after a successful check, always in this process
+And the cost per body of the pool: finding its range in the text (in this process) and parsing and checking it (in
+a worker), which bound the speedup on machines with more cores than this one
+"""
+
+import argparse
+import os
+import time
+
+from tokenizer import Tokenizer
+from sentencer import Sentencer
+from sentences import Sentence
+from compiler import CompilerContext, MIN_BODIES_PER_WORKER, _bodyRange, _initWorker, _checkBodiesInWorker
+
+
+def generatedFile(nFunctions: int) -> str:
+    parts = ["class Car{\n    speed: int = 3;\n    def getSpeed(unit: int): int {\n        return speed + unit;\n    }\n}\n"]
+    for i in range(nFunctions):
+        parts.append(
+            f"def function{i}(car: Car, a: int): int {{\n"
+            f"    b: int = a + {i};\n"
+            f"    c: int = car.getSpeed(b) + b;\n"
+            f"    {{\n"
+            f"        d: int = c + b + a;\n"
+            f"        c = d + 1;\n"
+            f"    }}\n"
+            f"    return c + car.speed;\n"
+            f"}}\n"
+        )
+    return "".join(parts)
+
+
+def timeCompile(sentenceList: list[Sentence], workers: int, repeats: int) -> tuple[float, float]:
+    """Best seconds of the check and of the inference"""
+    bestCheck = bestInfer = float("inf")
+    for _ in range(repeats):
+        context = CompilerContext(workers)
+        context.reset(sentenceList)
+
+        start = time.perf_counter()
+        context._firstPass()
+        context._secondPass()
+        checked = time.perf_counter()
+        if len(context.diagnostics) > 0: raise Exception("\n".join(context.diagnostics))
+        context.types.infer(sentenceList)
+        inferred = time.perf_counter()
+
+        bestCheck = min(bestCheck, checked - start)
+        bestInfer = min(bestInfer, inferred - checked)
+    return bestCheck, bestInfer
+
+
+def costPerBody(sentenceList: list[Sentence]) -> tuple[float, float]:
+    """Seconds per body of finding its range and of checking it the way a worker does, measured in this process"""
+    context = CompilerContext()
+    context.reset(sentenceList)
+    context._firstPass()
+
+    source = sentenceList[0].source
+    start = time.perf_counter()
+    ranges = [_bodyRange(body, source) for body in context.bodies]
+    packing = time.perf_counter() - start
+
+    _initWorker(context.scopeManager.snapshot(), source)
+    start = time.perf_counter()
+    _checkBodiesInWorker(ranges)
+    working = time.perf_counter() - start
+    return packing / len(context.bodies), working / len(context.bodies)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Time the compiler with its bodies checked by 1 and more worker processes")
+    parser.add_argument("--functions", type=int, default=5000)
+    parser.add_argument("--workers", default=f"2,4,{os.cpu_count() or 1}", help="comma separated worker counts compared to 1")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    sentenceList = Sentencer().parseSentences(Tokenizer().tokenize(generatedFile(args.functions)))
+    print(f"{args.functions} functions, {os.cpu_count()} cpus, at least {2 * MIN_BODIES_PER_WORKER} bodies to use workers")
+
+    sequentialCheck, sequentialInfer = timeCompile(sentenceList, 1, args.repeats)
+    packing, working = costPerBody(sentenceList)
+    print(f"per body: {packing * 1e6:.1f} us in this process and {working * 1e6:.0f} us in a worker with workers, "
+        f"{sequentialCheck / (args.functions + 1) * 1e6:.0f} us checking sequentially")
+    print(f"{'workers':>8} {'check ms':>9} {'speedup':>8} {'infer ms':>9}")
+    print(f"{1:>8} {sequentialCheck * 1000:>9.1f} {1:>8.2f} {sequentialInfer * 1000:>9.1f}")
+
+    for workers in sorted(set(map(int, args.workers.split(",")))):
+        if workers <= 1: continue
+        check, infer = timeCompile(sentenceList, workers, args.repeats)
+        print(f"{workers:>8} {check * 1000:>9.1f} {sequentialCheck / check:>8.2f} {infer * 1000:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
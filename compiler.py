@@ -1,36 +1,293 @@
 """
 The meat of the action. The compiler revises the sentences and detects mistakes
+Compiles in two phases: first the global symbols are collected, then every body (the sentences between a top level
+ScopeOpener and its ScopeCloser) is checked against them. Bodies are independent, so they can be checked in parallel.
+Parsed sentences cost more to pickle than to check: workers get the text of the file once and parse their bodies
+(declaration included) again from their offsets in it, and return the diagnostics and which of their sentences the
+escape analysis marked frameLocal, marked here on the sentences of this process
 """
 
+import itertools
+import os
+import pickle
+from concurrent.futures import Executor, ProcessPoolExecutor
+from itertools import repeat
+
 import sentences
+import words
 from sentences import Sentence
-from scopeManager import ScopeManager
+from tokenizer import SourceMap, Tokenizer
+from sentencer import Sentencer
+from scopeManager import ScopeManager, Scope
+from escapeAnalysis import analyzeEscapes
+from typeInference import TypeInference
+from leaf.leafClass import LeafClass
+from leaf.leafFunction import LeafFunction
+from leaf.leafVariable import LeafVariable
+
+
+MIN_BODIES_PER_WORKER = 64 #BELOW THIS, SHIPPING THE BODIES COSTS MORE THAN CHECKING THEM
+
+
+class Body:
+    """The sentences of a top level block (ScopeOpener and ScopeCloser included, or a single UnparsedBody),
+        the parameters it declares and the function or class declaration it belongs to (None for a bare block)
+    """
+
+    def __init__(self, parameters: list[words.ParameterDescription], sentences: list[Sentence], declaration: Sentence | None = None) -> None:
+        self.parameters: list[words.ParameterDescription] = parameters
+        self.sentences: list[Sentence] = sentences
+        self.declaration: Sentence | None = declaration
+
 
 class Compiler:
+    """Holds no state, every compilation works on its own CompilerContext so one instance can be shared between threads"""
 
-    def __init__(self) -> None:
+    def __init__(self, workers: int = 1) -> None:
+        self.workers: int = workers
+
+    def compile(self, sentences: list[Sentence]) -> None:
+        CompilerContext(self.workers).compile(sentences)
+
+    def newContext(self) -> "CompilerContext":
+        """A context to compile sentences that arrive one by one (feed)"""
+        return CompilerContext(self.workers)
+
+
+class CompilerContext:
+    """Working state of one compilation. The type inference (and its cache) lives across compilations,
+        pass the same one to reuse it
+    """
+
+    def __init__(self, workers: int = 1, types: TypeInference | None = None, pool: Executor | None = None) -> None:
+        """pool is a process pool kept between compilations (watch mode), without one every compilation that
+            uses workers starts its own
+        """
+        self.workers: int = workers
+        self.types: TypeInference = TypeInference() if types is None else types
+        self.pool: Executor | None = pool
         self.reset([])
 
-    def reset(self, sentences: list[Sentence]) -> None:
+    def reset(self, sentences: list[Sentence], scope: Scope | None = None) -> None:
         self.index = 0
         self.sentences: list[Sentence] = sentences
-        self.scopeManager: ScopeManager = ScopeManager()
+        self.scopeManager: ScopeManager = ScopeManager(scope)
+        self.pendingParameters: list[words.ParameterDescription] = []
+        self.pendingDeclaration: Sentence | None = None
+        self.bodies: list[Body] = []
+        self.diagnostics: list[str] = []
+        self.inferredUpTo: int = 0 #SENTENCES ALREADY GIVEN TO THE TYPE INFERENCE BY feed
+
 
-    
     def compile(self, sentences: list[Sentence]) -> None:
         self.reset(sentences)
         self._firstPass()
+        self._secondPass()
+
+        if len(self.diagnostics) > 0:
+            raise Exception("\n".join(self.diagnostics))
+
+        self.types.infer(self.sentences)
+
+
+    def feed(self, sentence: Sentence) -> None:
+        """Checks one more sentence after the ones already compiled, keeping the scope (used by the REPL)"""
+        self._checkSentence(sentence)
+        self.sentences.append(sentence)
+        self.index = len(self.sentences)
+
+        #A TOP LEVEL STATEMENT, FUNCTION OR CLASS IS COMPLETE: INFER IT (AND WHAT DEPENDS ON IT), NOT THE WHOLE SESSION
+        if self.scopeManager.nLayers == 1 and type(sentence) not in (sentences.FunctionDeclaration, sentences.ClassDeclaration):
+            self.types.inferMore(self.sentences[self.inferredUpTo:])
+            self.inferredUpTo = len(self.sentences)
 
 
     def _firstPass(self) -> None:
-        ##CATCH VARIABLES FUNCTIONS AND CLASSES WITH INVALID NAMES
-        
+        ##COLLECT THE GLOBAL SYMBOLS AND CATCH TOP LEVEL NAMES ALREADY IN USE, SET THE BODIES ASIDE
+
         while self.index < len(self.sentences):
             sentence = self.sentences[self.index]
 
-            if type(sentence) in [sentences.ClassDeclaration, sentences.FunctionDeclaration, sentences.VariableDeclaration, sentences.VariableAssignment]:
-                if self.scopeManager.isNameInValid(sentence.name):
-                    raise Exception(f"Error: cannot name class /function/variable {sentence.name}, name already in use")
-                
+            if type(sentence) == sentences.ScopeOpener:
+                self.bodies.append(Body(self.pendingParameters, self._takeBody(), self.pendingDeclaration))
+                self.pendingParameters = []
+                self.pendingDeclaration = None
+                continue
+
+            if type(sentence) == sentences.UnparsedBody:
+                #PARSED WHEN THE BODY IS CHECKED, IN A WORKER IF THERE ARE WORKERS
+                self.bodies.append(Body(self.pendingParameters, [sentence], self.pendingDeclaration))
+                self.pendingParameters = []
+                self.pendingDeclaration = None
+                self.index += 1
+                continue
+
+            try:
+                self._checkSentence(sentence)
+            except Exception as e:
+                self.diagnostics.append(str(e))
+
+            self.index += 1
+
+
+    def _secondPass(self) -> None:
+        ##CHECK EVERY BODY AGAINST THE GLOBAL SYMBOLS
+        globalScope = self.scopeManager.snapshot()
+        source = self.sentences[0].source if len(self.sentences) > 0 else None
+
+        if self.workers <= 1 or len(self.bodies) < 2 * MIN_BODIES_PER_WORKER or source.text is None:
+            results = [checkBody(globalScope, body) for body in self.bodies]
+
+        else:
+            workers = min(self.workers, len(self.bodies) // MIN_BODIES_PER_WORKER)
+            chunksize = max(1, len(self.bodies) // (workers * 4))
+            ranges = [_bodyRange(body, source) for body in self.bodies]
+            chunks = [ranges[i:i + chunksize] for i in range(0, len(ranges), chunksize)]
+            compilation = (f"{os.getpid()}-{next(_compilationIds)}", pickle.dumps((globalScope, source)))
+
+            if self.pool is not None:
+                results = [result for chunk in self.pool.map(_checkChunk, repeat(compilation), chunks) for result in chunk]
+            else:
+                with ProcessPoolExecutor(workers) as pool:
+                    results = [result for chunk in pool.map(_checkChunk, repeat(compilation), chunks) for result in chunk]
+
+            for body, (_, frameLocal) in zip(self.bodies, results):
+                if len(frameLocal) > 0: _markFrameLocal(body, frameLocal)
+
+        for diagnostics, _ in results:
+            self.diagnostics += diagnostics
 
+
+    def _takeBody(self) -> list[Sentence]:
+        """Consumes from the ScopeOpener to its matching ScopeCloser (both included)"""
+        start = self.index
+        depth = 0
+
+        while self.index < len(self.sentences):
+            sentence = self.sentences[self.index]
             self.index += 1
+
+            if type(sentence) == sentences.ScopeOpener: depth += 1
+            elif type(sentence) == sentences.ScopeCloser:
+                depth -= 1
+                if depth == 0: return self.sentences[start:self.index]
+
+        raise Exception(f"Scope opened at {self.sentences[start].position} is never closed")
+
+
+    def _checkSentence(self, sentence: Sentence) -> None:
+        """Checks one sentence against the current scope and registers whatever it declares"""
+
+        if type(sentence) == sentences.ScopeOpener:
+            self.scopeManager.openScope()
+            for parameter in self.pendingParameters:
+                self._declare(LeafVariable([parameter.name], [parameter.symbol]), sentence.position)
+            self.pendingParameters = []
+
+        elif type(sentence) == sentences.ScopeCloser:
+            self.scopeManager.closeScope()
+
+        elif type(sentence) == sentences.UnparsedBody:
+            for bodySentence in sentence.sentences:
+                self._checkSentence(bodySentence)
+
+        elif type(sentence) == sentences.ClassDeclaration:
+            self._declare(LeafClass([sentence.name], [sentence.symbol]), sentence.position)
+            self.pendingDeclaration = sentence
+
+        elif type(sentence) == sentences.FunctionDeclaration:
+            self._declare(LeafFunction([sentence.name], [sentence.symbol]), sentence.position)
+            self.pendingParameters = sentence.parameters
+            self.pendingDeclaration = sentence
+
+        elif type(sentence) == sentences.VariableDeclaration:
+            self._declare(LeafVariable([sentence.variableName], [sentence.symbol]), sentence.position)
+
+        elif type(sentence) == sentences.VariableAssignment and sentence.descriptor is not None:
+            #ONLY x: int = 3; DECLARES, x = 3; REASSIGNS
+            name = sentence.nameTree[0]
+            self._declare(LeafVariable([name.value], [name.symbol]), sentence.position)
+
+
+    def _declare(self, symbol: LeafClass | LeafFunction | LeafVariable, position: str) -> None:
+        if self.scopeManager.isNameInValid(symbol.scopedSymbols[-1]):
+            raise Exception(f"Error: cannot name class /function/variable {symbol.scopedName[-1]} at {position}, name already in use")
+
+        if type(symbol) == LeafClass: self.scopeManager.addClass(symbol)
+        elif type(symbol) == LeafFunction: self.scopeManager.addFunction(symbol)
+        else: self.scopeManager.addVariable(symbol)
+
+
+def checkBody(globalScope: Scope, body: Body) -> tuple[list[str], list[int]]:
+    """Checks a body on its own, starting from the global symbols. Returns the diagnostics and the indices (in the
+        declaration followed by the flattened body) of the sentences marked frameLocal
+    """
+    compiler = CompilerContext()
+    compiler.reset(body.sentences, globalScope)
+    compiler.pendingParameters = body.parameters
+
+    try:
+        for sentence in body.sentences:
+            compiler._checkSentence(sentence)
+    except Exception as e:
+        return [str(e)], []
+
+    if body.declaration is None: return [], []
+    analyzed = [body.declaration, *sentences.flatten(body.sentences)]
+    report = analyzeEscapes(analyzed, globalScope)
+    indices = {id(sentence): index for index, sentence in enumerate(analyzed)}
+    return report.errors, [indices[id(sentence)] for sentence in report.frameLocal]
+
+
+def _markFrameLocal(body: Body, frameLocal: list[int]) -> None:
+    """Applies the marks of a body checked in a worker, the worker parsed the same sentences in the same order"""
+    analyzed = [body.declaration, *sentences.flatten(body.sentences)]
+    for index in frameLocal: analyzed[index].frameLocal = True
+
+
+_workerGlobalScope: Scope | None = None
+_workerSourceMap: SourceMap | None = None
+_workerCompilation: str | None = None #ID OF THE COMPILATION WHOSE SCOPE AND SOURCE THE WORKER HOLDS
+_compilationIds = itertools.count()
+_workerTokenizer = Tokenizer()
+_workerSentencer = Sentencer()
+
+DECLARATION_KEYWORDS = {sentences.FunctionDeclaration: "def", sentences.ClassDeclaration: "class"}
+
+def _initWorker(globalScope: Scope, source: SourceMap) -> None:
+    """The global scope and the SourceMap (with the text) of the file are shipped once per worker"""
+    global _workerGlobalScope, _workerSourceMap
+    _workerGlobalScope = globalScope
+    _workerSourceMap = source
+
+def _checkChunk(compilation: tuple[str, bytes], ranges: list[tuple[int, int]]) -> list[tuple[list[str], list[int]]]:
+    """A pool serves many compilations: every chunk carries the id of its compilation and its global scope and
+        SourceMap pickled once by the parent, a worker only loads them the first time it sees the compilation
+    """
+    global _workerCompilation
+    compilationId, payload = compilation
+    if _workerCompilation != compilationId:
+        _initWorker(*pickle.loads(payload))
+        _workerCompilation = compilationId
+    return _checkBodiesInWorker(ranges)
+
+def _bodyRange(body: Body, source: SourceMap) -> tuple[int, int]:
+    """Offsets of the start of the declaration (or the { of a bare block) and right after the } of the body.
+        The declaration records the offset of its name, only whitespace separates it from its keyword
+    """
+    last = body.sentences[-1]
+    if type(last) == sentences.UnparsedBody:
+        last = last.tokens[-1] if last._sentences is None else last._sentences[-1]
+
+    if body.declaration is None: return body.sentences[0].offset, last.offset + 1
+    return source.text.rfind(DECLARATION_KEYWORDS[type(body.declaration)], 0, body.declaration.offset), last.offset + 1
+
+def _checkBodiesInWorker(ranges: list[tuple[int, int]]) -> list[tuple[list[str], list[int]]]:
+    """Parses the bodies again from the text, shipping parsed sentences costs more than checking them"""
+    results = []
+    for start, end in ranges:
+        sentenceList = _workerSentencer.parseSentences(_workerTokenizer.tokenizeRange(_workerSourceMap, start, end))
+        declaration = sentenceList[0] if type(sentenceList[0]) in DECLARATION_KEYWORDS else None
+        parameters = declaration.parameters if type(declaration) == sentences.FunctionDeclaration else []
+        results.append(checkBody(_workerGlobalScope, Body(parameters, sentenceList[1:] if declaration is not None else sentenceList, declaration)))
+    return results
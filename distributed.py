@@ -0,0 +1,295 @@
+"""
+Distributed compilation. Workers listen on a TCP ("host:port") or unix ("unix:/path") socket and run the
+Tokenizer -> Sentencer -> Compiler pipeline on the files they receive. The coordinator spreads the files among them,
+retries the files of workers that fail and never sends content that a worker already has cached
+
+Messages are pickled and prefixed by their length and two HMAC-SHA256 with the key shared by the hosts of the build
+(LEAF_BUILD_KEY), one of the length and one of the data. The MACs also cover random nonces of both sides of the
+connection and the number of the message, so a frame cannot be forged without the key or replayed. No data is read
+before the MAC of its length is checked, and nothing is unpickled before the MAC of the data is checked
+"""
+
+import hashlib
+import hmac
+import os
+import pickle
+import socket
+import socketserver
+import struct
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from pipeline import CompileResult, compileSource
+from buildGraph import hashText
+
+
+HEADER = struct.Struct("!Q")
+NONCE_SIZE = 16
+MAC_SIZE = hashlib.sha256().digest_size
+MAX_MESSAGE = 64 << 20 #BYTES, EVEN AUTHENTICATED PEERS CANNOT MAKE THE OTHER SIDE BUFFER MORE
+KEY_VARIABLE = "LEAF_BUILD_KEY"
+
+
+class AuthenticationError(ConnectionError):
+    pass
+
+
+def buildKey() -> bytes:
+    """The key shared by the workers and coordinators of the build, from the environment"""
+    key = os.environ.get(KEY_VARIABLE, "")
+    if len(key) == 0:
+        raise Exception(f"Set {KEY_VARIABLE} to the secret shared by the hosts of the build")
+    return key.encode()
+
+
+def parseAddress(address: str) -> tuple[int, str | tuple[str, int]]:
+    if address.startswith("unix:"):
+        return socket.AF_UNIX, address[len("unix:"):]
+
+    host, _, port = address.rpartition(":")
+    return socket.AF_INET, (host or "127.0.0.1", int(port))
+
+
+class Channel:
+    """Authenticated messages over a connection. Both sides send a nonce first, every message is then
+        length, HMAC(key, nonces, sender, message number, length), HMAC(key, nonces, sender, message number, data), data
+    """
+
+    def __init__(self, connection: socket.socket, key: bytes, isWorker: bool) -> None:
+        self.connection: socket.socket = connection
+        self.key: bytes = key
+
+        nonce = os.urandom(NONCE_SIZE)
+        connection.sendall(nonce)
+        peerNonce = _receiveExactly(connection, NONCE_SIZE)
+        if peerNonce is None: raise ConnectionError("Connection closed before the handshake")
+
+        self.session: bytes = nonce + peerNonce if isWorker else peerNonce + nonce #WORKER NONCE FIRST ON BOTH SIDES
+        self.sender: bytes = b"W" if isWorker else b"C"
+        self.peer: bytes = b"C" if isWorker else b"W"
+        self.sent: int = 0
+        self.received: int = 0
+
+    def _mac(self, sender: bytes, number: int, part: bytes, data: bytes) -> bytes:
+        return hmac.new(self.key, self.session + sender + HEADER.pack(number) + part + data, hashlib.sha256).digest()
+
+    def send(self, message) -> None:
+        data = pickle.dumps(message, pickle.HIGHEST_PROTOCOL)
+        if len(data) > MAX_MESSAGE: raise Exception(f"Message of {len(data)} bytes is over the limit of {MAX_MESSAGE}")
+        length = HEADER.pack(len(data))
+        self.connection.sendall(length + self._mac(self.sender, self.sent, b"L", length) + self._mac(self.sender, self.sent, b"D", data) + data)
+        self.sent += 1
+
+    def receive(self):
+        """Returns None if the other side closed the connection"""
+        header = _receiveExactly(self.connection, HEADER.size + 2 * MAC_SIZE)
+        if header is None: return None
+
+        length = header[:HEADER.size]
+        if not hmac.compare_digest(header[HEADER.size:HEADER.size + MAC_SIZE], self._mac(self.peer, self.received, b"L", length)):
+            raise AuthenticationError("Message length not signed with the build key")
+        size = HEADER.unpack(length)[0]
+        if size > MAX_MESSAGE: raise AuthenticationError(f"Message of {size} bytes refused")
+
+        data = _receiveExactly(self.connection, size)
+        if data is None: raise ConnectionError("Connection closed in the middle of a message")
+        if not hmac.compare_digest(header[HEADER.size + MAC_SIZE:], self._mac(self.peer, self.received, b"D", data)):
+            raise AuthenticationError("Message not signed with the build key")
+        self.received += 1
+        return pickle.loads(data)
+
+
+def _receiveExactly(connection: socket.socket, size: int) -> bytes | None:
+    chunks = []
+    while size > 0:
+        chunk = connection.recv(min(size, 1 << 20))
+        if len(chunk) == 0: return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+class Worker:
+    """Compiles the batches it receives. Keeps the most recent contents and results, keyed by content hash"""
+
+    def __init__(self, maxCached: int = 4096) -> None:
+        self.maxCached: int = maxCached
+        self.contents: OrderedDict[str, str] = OrderedDict()
+        self.results: OrderedDict[str, CompileResult] = OrderedDict()
+        self.lock: threading.Lock = threading.Lock()
+
+    def compileBatch(self, files: list[tuple[str, str, str | None]]) -> list[tuple[str, str, CompileResult | None]]:
+        """files are (path, content hash, content or None if the worker should have it). A None result means
+            the content is not cached anymore and has to be sent
+        """
+        replies = []
+
+        for path, contentHash, content in files:
+            with self.lock:
+                if content is not None: self._remember(self.contents, contentHash, content)
+                else: content = self._recall(self.contents, contentHash)
+                result = self._recall(self.results, contentHash)
+
+            if result is None and content is not None:
+                result = compileSource(content)
+                with self.lock: self._remember(self.results, contentHash, result)
+
+            replies.append((path, contentHash, result))
+
+        return replies
+
+    def _remember(self, cache: OrderedDict, key: str, value) -> None:
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > self.maxCached: cache.popitem(last=False)
+
+    def _recall(self, cache: OrderedDict, key: str):
+        value = cache.get(key)
+        if value is not None: cache.move_to_end(key)
+        return value
+
+    def serve(self, address: str, key: bytes, timeout: float = 120) -> None:
+        """Serves coordinators that know the key until interrupted, one thread per connection. A connection
+            that sends nothing for timeout seconds is dropped
+        """
+        family, socketAddress = parseAddress(address)
+        worker = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self) -> None:
+                self.request.settimeout(timeout)
+                try:
+                    channel = Channel(self.request, key, True)
+                    while True:
+                        message = channel.receive()
+                        if message is None: return
+
+                        kind, files = message
+                        if kind != "compile":
+                            raise Exception(f"Unknown message {kind}")
+                        channel.send(("results", worker.compileBatch(files)))
+                except (ConnectionError, TimeoutError) as e:
+                    print(f"Dropped connection from {self.client_address or 'unix socket'}: {e}")
+
+        if family == socket.AF_UNIX:
+            if os.path.exists(socketAddress): os.unlink(socketAddress)
+            server = socketserver.ThreadingUnixStreamServer(socketAddress, Handler)
+        else:
+            server = socketserver.ThreadingTCPServer(socketAddress, Handler)
+
+        server.daemon_threads = True
+        with server:
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                pass
+
+
+class Coordinator:
+    """Sends files to the workers, biggest files first and always to the least loaded worker.
+        The files of a worker that fails are retried on the others, up to maxRetries times
+    """
+
+    def __init__(self, addresses: list[str], key: bytes, timeout: float = 120, maxRetries: int = 2) -> None:
+        self.addresses: list[str] = addresses
+        self.key: bytes = key
+        self.timeout: float = timeout
+        self.maxRetries: int = maxRetries
+
+        self.connections: dict[str, Channel] = {}
+        self.known: dict[str, set[str]] = {a: set() for a in addresses} #content hashes each worker already has
+        self.alive: set[str] = set(addresses)
+
+    def compileFiles(self, paths: list[str]) -> dict[str, CompileResult]:
+        pending = []
+        for path in paths:
+            with open(path, "r") as f:
+                content = f.read()
+            pending.append((path, hashText(content), content))
+
+        attempts = {path: 0 for path in paths}
+        results: dict[str, CompileResult] = {}
+
+        while len(pending) > 0:
+            workers = [a for a in self.addresses if a in self.alive]
+            if len(workers) == 0:
+                raise Exception(f"No compile worker left, {len(pending)} file(s) not compiled")
+
+            batches = self._schedule(pending, workers)
+            pending = []
+
+            with ThreadPoolExecutor(len(batches)) as pool:
+                futures = {address: pool.submit(self._runBatch, address, batch) for address, batch in batches.items()}
+
+                for address, future in futures.items():
+                    try:
+                        results.update(future.result())
+                    except (OSError, EOFError, pickle.PickleError) as e:
+                        self._dropWorker(address)
+                        for path, contentHash, content in batches[address]:
+                            attempts[path] += 1
+                            if attempts[path] > self.maxRetries:
+                                results[path] = CompileResult(None, [f"Could not compile {path}, last worker error: {e}"])
+                            else:
+                                pending.append((path, contentHash, content))
+
+        return results
+
+    def close(self) -> None:
+        for channel in self.connections.values():
+            channel.connection.close()
+        self.connections = {}
+
+
+    def _schedule(self, files: list[tuple[str, str, str]], workers: list[str]) -> dict[str, list[tuple[str, str, str]]]:
+        """Longest processing time first: biggest file to the worker with the fewest bytes assigned"""
+        load = {address: 0 for address in workers}
+        batches: dict[str, list[tuple[str, str, str]]] = {}
+
+        for file in sorted(files, key=lambda f: len(f[2]), reverse=True):
+            address = min(workers, key=lambda a: load[a])
+            load[address] += len(file[2])
+            batches.setdefault(address, []).append(file)
+
+        return batches
+
+    def _runBatch(self, address: str, batch: list[tuple[str, str, str]]) -> dict[str, CompileResult]:
+        channel = self._connect(address)
+        known = self.known[address]
+
+        channel.send(("compile", [(p, h, None if h in known else c) for p, h, c in batch]))
+        replies = self._receiveResults(channel)
+
+        missing = [(p, h, c) for (p, h, c), (_, _, result) in zip(batch, replies) if result is None]
+        if len(missing) > 0:
+            #THE WORKER EVICTED OR NEVER HAD THEM (IT MAY HAVE RESTARTED)
+            channel.send(("compile", missing))
+            retried = iter(self._receiveResults(channel))
+            replies = [reply if reply[2] is not None else next(retried) for reply in replies]
+
+        known.update(h for _, h, _ in batch)
+        return {path: result for path, _, result in replies}
+
+    def _receiveResults(self, channel: Channel) -> list[tuple[str, str, CompileResult | None]]:
+        message = channel.receive()
+        if message is None: raise ConnectionError("Worker closed the connection")
+        return message[1]
+
+    def _connect(self, address: str) -> Channel:
+        if address not in self.connections:
+            family, socketAddress = parseAddress(address)
+            connection = socket.socket(family, socket.SOCK_STREAM)
+            connection.settimeout(self.timeout)
+            connection.connect(socketAddress)
+            try:
+                self.connections[address] = Channel(connection, self.key, False)
+            except BaseException:
+                connection.close()
+                raise
+        return self.connections[address]
+
+    def _dropWorker(self, address: str) -> None:
+        self.alive.discard(address)
+        channel = self.connections.pop(address, None)
+        if channel is not None: channel.connection.close()
@@ -0,0 +1,226 @@
+"""
+Escape analysis of function bodies. A value escapes its function when it is returned, passed as an argument to a
+function call, stored in a field of something that is not a new value of the function (car.speed = x with car a
+parameter, a global, or a local that aliases one of them, a field or the result of a call) or flows into a local
+that escapes
+Locals declared [Stack] that escape are errors. Locals that do not escape, are not declared [Heap] and only ever hold
+a new value (a construction, literal or the result of an operator, not an alias of a parameter, global or other local)
+are marked frameLocal, a backend can keep them in the frame of the function
+
+One pass over the sentences builds a graph of what flows into what, then the escapes are propagated backwards
+through it: linear in the size of the body
+"""
+
+from typing import Iterable
+
+import sentences
+import words
+from sentences import Sentence
+from scopeManager import Scope
+from leaf.leafClass import LeafClass
+
+
+CONSTRUCTED_BUILTINS = {"Array"} #CALLS THAT MAKE A NEW VALUE WITHOUT A CLASS DECLARED FOR THEM
+
+
+class Local:
+    """A variable or parameter of the function being analyzed"""
+    __slots__ = ("name", "features", "sentence", "isParameter", "escape", "flowsFrom", "ownsValue")
+
+    def __init__(self, name: str, descriptor: words.VariableDescriptor | None, sentence: Sentence, isParameter: bool) -> None:
+        self.name: str = name
+        self.features: list[str] = [] if descriptor is None else descriptor.features
+        self.sentence: Sentence = sentence
+        self.isParameter: bool = isParameter
+        self.escape: str | None = None #HOW IT ESCAPES, None IF IT DOES NOT
+        self.flowsFrom: list[Local] = [] #LOCALS STORED IN THIS ONE, THEY ESCAPE IF IT DOES
+        self.ownsValue: bool = not isParameter #EVERY VALUE ASSIGNED TO IT (NOT TO ITS FIELDS) WAS NEW
+
+
+class EscapeReport:
+    """Result of the analysis of a list of sentences"""
+
+    def __init__(self) -> None:
+        self.errors: list[str] = []
+        self.frameLocal: list[Sentence] = [] #DECLARATIONS WHOSE VALUE CAN LIVE IN THE FRAME
+        self.escaping: list[Sentence] = []
+
+
+class _Function:
+    """Locals of the function being analyzed. names maps a symbol to the locals with that name, innermost last"""
+
+    def __init__(self, declaration: sentences.FunctionDeclaration) -> None:
+        self.declaration: sentences.FunctionDeclaration = declaration
+        self.locals: list[Local] = []
+        self.names: dict[int, list[Local]] = {}
+        self.scopes: list[list[int]] = [] #SYMBOLS DECLARED IN EVERY OPEN SCOPE OF THE FUNCTION
+        self.fieldStores: list[tuple[Local, Local, str]] = [] #(OWNER, VALUE, WHERE) OF EVERY x.field = value
+
+    def declare(self, symbol: int, local: Local) -> None:
+        self.locals.append(local)
+        self.names.setdefault(symbol, []).append(local)
+        self.scopes[-1].append(symbol)
+
+    def lookup(self, symbol: int) -> Local | None:
+        found = self.names.get(symbol)
+        return found[-1] if found else None
+
+    def closeScope(self) -> None:
+        for symbol in self.scopes.pop():
+            self.names[symbol].pop()
+
+
+def analyzeEscapes(sentenceList: Iterable[Sentence], globalScope: Scope | None = None) -> EscapeReport:
+    """Analyzes every function declared in the sentences (with its body, parsed), methods of classes included.
+        A call to a class of globalScope is a construction, a new value
+    """
+    report = EscapeReport()
+    functions: list[_Function] = []
+    pending: sentences.FunctionDeclaration | None = None
+
+    for sentence in sentenceList:
+        kind = type(sentence)
+
+        if kind == sentences.FunctionDeclaration:
+            pending = sentence
+            continue
+
+        if kind == sentences.ScopeOpener:
+            if pending is not None:
+                function = _Function(pending)
+                functions.append(function)
+                function.scopes.append([])
+                for parameter in pending.parameters:
+                    function.declare(parameter.symbol, Local(parameter.name, parameter.descriptor, pending, True))
+                pending = None
+            elif len(functions) > 0:
+                functions[-1].scopes.append([])
+            continue
+
+        pending = None
+        if len(functions) == 0: continue #CLASS MEMBERS AND GLOBALS, NOT IN A FUNCTION
+        function = functions[-1]
+
+        if kind == sentences.ScopeCloser:
+            function.closeScope()
+            if len(function.scopes) == 0:
+                _finish(functions.pop(), report)
+
+        elif kind == sentences.ReturnExpression:
+            _visitCalls(function, sentence.expression, sentence)
+            _escape(_flowingValue(function, sentence.expression), f"returned at {sentence.position}")
+
+        elif kind == sentences.NakedFunctionCall:
+            _visitChainCalls(function, sentence.tree, sentence)
+
+        elif kind == sentences.VariableDeclaration:
+            function.declare(sentence.symbol, Local(sentence.variableName, sentence.descriptor, sentence, False))
+
+        elif kind == sentences.VariableAssignment:
+            _visitCalls(function, sentence.expression, sentence)
+            _visitChainCalls(function, sentence.nameTree, sentence)
+            value = _flowingValue(function, sentence.expression)
+            _assign(function, sentence, value, _isNewValue(sentence.expression, globalScope))
+
+    return report
+
+
+def _assign(function: _Function, sentence: sentences.VariableAssignment, value: Local | None, isNew: bool) -> None:
+    target = sentence.nameTree
+    head = target[0]
+
+    if sentence.descriptor is not None:
+        local = Local(head.value, sentence.descriptor, sentence, False)
+        local.ownsValue = isNew
+        function.declare(head.symbol, local)
+        if value is not None: local.flowsFrom.append(value)
+        return
+
+    owner = function.lookup(head.symbol) if type(head) == words.NameMention else None
+    if any(type(crawlable) == words.FunctionCall for crawlable in target): owner = None
+    if owner is not None and len(target) == 1 and not isNew: owner.ownsValue = False #x = car; x IS AN ALIAS NOW
+
+    if value is None: return
+
+    if owner is None:
+        _escape(value, f"stored in {_describeChain(target)} (not a local) at {sentence.position}")
+    elif len(target) > 1 and owner.isParameter:
+        _escape(value, f"stored in {_describeChain(target)}, a field of the parameter {owner.name}, at {sentence.position}")
+    else:
+        owner.flowsFrom.append(value) #x = y; OR x.field = y; WITH x LOCAL, y ESCAPES IF x DOES
+        if len(target) > 1: function.fieldStores.append((owner, value, f"stored in {_describeChain(target)} at {sentence.position}"))
+
+
+def _flowingValue(function: _Function, expression: words.Expression) -> Local | None:
+    """The local whose value (or a field of it) is the result of the expression. None if the result is a new value:
+        literals, results of calls or operators
+    """
+    if type(expression) == words.Operator or len(expression) == 0: return None
+    head = expression[0]
+    if type(head) != words.NameMention: return None
+    if any(type(crawlable) == words.FunctionCall for crawlable in expression): return None
+    return function.lookup(head.symbol)
+
+
+def _isNewValue(expression: words.Expression, globalScope: Scope | None) -> bool:
+    """If the expression makes a value of its own: a literal, a construction or the result of an operator. Anything
+        else may be (or be part of) a value that already exists
+    """
+    if type(expression) == words.Operator: return True
+    if len(expression) != 1: return False
+    head = expression[0]
+    kind = type(head)
+    if kind == words.NumberLiteral or kind == words.StringLiteral: return True
+    if kind != words.FunctionCall: return False
+    if head.functionName in CONSTRUCTED_BUILTINS: return True
+    return globalScope is not None and type(globalScope.lookup(head.functionSymbol)) == LeafClass
+
+
+def _visitCalls(function: _Function, expression: words.Expression, sentence: Sentence) -> None:
+    while type(expression) == words.Operator:
+        _visitChainCalls(function, expression.leftHand, sentence)
+        expression = expression.rightHand
+    _visitChainCalls(function, expression, sentence)
+
+
+def _visitChainCalls(function: _Function, chain: list[words.Crawlable], sentence: Sentence) -> None:
+    """The arguments of the calls in the chain escape. The receiver (car in car.getSpeed()) is only borrowed"""
+    for crawlable in chain:
+        if type(crawlable) != words.FunctionCall: continue
+        for argument in crawlable.parameters:
+            _visitCalls(function, argument, sentence)
+            _escape(_flowingValue(function, argument), f"passed to {crawlable.functionName} at {sentence.position}")
+
+
+def _escape(local: Local | None, reason: str) -> None:
+    if local is not None and local.escape is None: local.escape = reason
+
+
+def _finish(function: _Function, report: EscapeReport) -> None:
+    #x MAY ALIAS A PARAMETER, A GLOBAL, A FIELD OR A CALL RESULT AT ANY x.field = value (LOOPS), ITS FIELDS ARE NOT LOCAL
+    for owner, value, where in function.fieldStores:
+        if not owner.ownsValue: _escape(value, f"{where}, {owner.name} does not hold a value of its own")
+
+    #PROPAGATE BACKWARDS, EVERY LOCAL IS QUEUED AT MOST ONCE
+    queue = [local for local in function.locals if local.escape is not None]
+    while len(queue) > 0:
+        local = queue.pop()
+        for source in local.flowsFrom:
+            if source.escape is None:
+                source.escape = f"flows into {local.name}, {local.escape}"
+                queue.append(source)
+
+    for local in function.locals:
+        if local.isParameter: continue
+
+        if local.escape is not None:
+            report.escaping.append(local.sentence)
+            if "Stack" in local.features:
+                report.errors.append(f"Error: {local.name} is declared [Stack] at {local.sentence.position} but escapes {function.declaration.name}, {local.escape}")
+        elif "Heap" not in local.features and local.ownsValue:
+            local.sentence.frameLocal = True
+            report.frameLocal.append(local.sentence)
+
+
+def _describeChain(chain: list[words.Crawlable]) -> str:
+    return ".".join(crawlable.functionName + "()" if type(crawlable) == words.FunctionCall else str(crawlable.value) for crawlable in chain)
@@ -0,0 +1,96 @@
+"""
+Effect of the inliner on call-heavy generated programs: classes with tiny accessors, generic helpers, recursive and
+big functions (never inlined), and callers that chain them. For every budget it reports:
+    sites and inlined: call sites the inliner looked at and the ones it replaced
+    calls: calls left in the program (what a backend would pay call overhead for), before and after
+    cost: the summed cost (costOf) of the function bodies, before and after, the code growth
+    inline ms: time of the inlining pass, compile ms: time of checking and inferring the program it returns
+The inlined program is compiled again to make sure the inliner kept it valid (hygienic names, declared hoists)
+"""
+
+import argparse
+import time
+
+import sentences
+from tokenizer import Tokenizer
+from sentencer import Sentencer
+from sentences import Sentence
+from compiler import CompilerContext
+from inliner import Inliner, _callCount, costOf
+from typeInference import collectGlobals
+
+
+def callHeavyProgram(nClasses: int, nCallers: int, callsPerCaller: int) -> str:
+    parts = [
+        "def twice<T>(value: T): T {\n    return value + value;\n}\n",
+        "def count(n: int): int {\n    return count(n + 1);\n}\n", #RECURSIVE
+        "def big(a: int): int {\n    b: int = a + 1;\n    c: int = b + a + 2;\n    d: int = c + b + a + 3;\n    return d + c + b + a;\n}\n", #OVER THE BUDGET
+    ]
+    for c in range(nClasses):
+        parts.append(
+            f"class Car{c}{{\n"
+            f"    speed: int = {c};\n"
+            f"    weight: float = 1.5;\n"
+            f"    def getSpeed(unit: int): int {{\n        return speed + unit;\n    }}\n"
+            f"    def getWeight(extra: float): float {{\n        return weight + extra;\n    }}\n"
+            f"}}\n"
+        )
+    for f in range(nCallers):
+        car = f"Car{f % nClasses}"
+        lines = [f"def caller{f}(car: {car}, a: int): int {{", f"    total: int = a;"]
+        for k in range(callsPerCaller):
+            call = ("car.getSpeed(total)", f"twice<int>(a + {k})", "car.getWeight(0.5)", "count(a)", "big(total)")[k % 5]
+            if k % 5 == 2: lines.append(f"    w{k}: float = {call};")
+            else: lines.append(f"    total = total + {call};")
+        lines += ["    return total;", "}"]
+        parts.append("\n".join(lines) + "\n")
+    return "".join(parts)
+
+
+def measures(sentenceList: list[Sentence]) -> tuple[int, int]:
+    """Calls left in the program and summed cost of the function bodies"""
+    calls = 0
+    for sentence in sentences.flatten(sentenceList):
+        kind = type(sentence)
+        if kind == sentences.VariableAssignment: calls += _callCount([sentence.expression, sentence.nameTree])
+        elif kind == sentences.ReturnExpression: calls += _callCount([sentence.expression])
+        elif kind == sentences.NakedFunctionCall: calls += _callCount([sentence.tree])
+    cost = sum(costOf(body[1:-1]) for _, _, body in collectGlobals(sentenceList).bodies)
+    return calls, cost
+
+
+def compiled(source: str) -> list[Sentence]:
+    sentenceList = Sentencer().parseSentences(Tokenizer().tokenize(source))
+    CompilerContext().compile(sentenceList)
+    return sentenceList
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare call-heavy generated programs before and after inlining")
+    parser.add_argument("--classes", type=int, default=20)
+    parser.add_argument("--callers", type=int, default=400)
+    parser.add_argument("--calls", type=int, default=20, help="calls in every caller")
+    parser.add_argument("--budgets", default="0,4,8,16,32", help="comma separated inlining budgets")
+    args = parser.parse_args()
+
+    source = callHeavyProgram(args.classes, args.callers, args.calls)
+    calls, cost = measures(compiled(source))
+    print(f"{args.callers} callers of {args.calls} calls, {args.classes} classes: {calls} calls, cost {cost} before inlining")
+    print(f"{'budget':>7} {'sites':>7} {'inlined':>8} {'calls':>7} {'cost':>7} {'inline ms':>10} {'compile ms':>11}")
+
+    for budget in map(int, args.budgets.split(",")):
+        sentenceList = compiled(source)
+        start = time.perf_counter()
+        inlined, report = Inliner(budget).inline(sentenceList)
+        inlineTime = time.perf_counter() - start
+
+        start = time.perf_counter()
+        CompilerContext().compile(inlined) #RAISES IF THE INLINED PROGRAM IS NOT VALID
+        compileTime = time.perf_counter() - start
+
+        calls, cost = measures(inlined)
+        print(f"{budget:>7} {len(report.decisions):>7} {report.inlined:>8} {calls:>7} {cost:>7} {inlineTime * 1000:>10.1f} {compileTime * 1000:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
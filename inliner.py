@@ -0,0 +1,483 @@
+"""
+Inlining of small functions. A call graph is built from the function declarations (methods included) and the calls
+in their bodies, every function gets a cost from its sentences and expressions, and calls to functions that are
+cheap enough, not recursive and only return an expression (def getSpeed(...): float { return speed; }) are
+replaced by that expression. Functions are rewritten callees first (reverse topological order of the call graph),
+so a call is decided against the body and cost its callee has after its own calls were inlined
+
+The arguments are hoisted into fresh variables declared right before the statement (literals are substituted
+directly), so each argument is still evaluated once and before the body. Fields used by a method are reached
+through the receiver of the call (car.getSpeed() becomes car.speed). Generic parameters take the generics given in
+the call or the inferred types of the arguments
+
+Expects the sentences annotated by the type inference (the compiler does it): a method is only inlined if the type
+of its receiver is known
+"""
+
+from typing import Callable
+
+import sentences
+import words
+from sentences import Sentence
+from symbols import intern, nameOf
+from typeInference import ClassInfo, Globals, collectGlobals
+
+
+DEFAULT_BUDGET = 8
+SENTENCE_COST = 2
+MAX_INLINES_PER_STATEMENT = 32
+
+
+class FunctionInfo:
+    """A function or method, its body (without the braces) and what it costs to inline"""
+
+    def __init__(self, index: int, name: str, declaration: sentences.FunctionDeclaration, owner: ClassInfo | None, body: list[Sentence]) -> None:
+        self.index: int = index #IN Inliner.functions
+        self.name: str = name #Car.getSpeed FOR METHODS, ONLY FOR THE REPORT
+        self.declaration: sentences.FunctionDeclaration = declaration
+        self.owner: ClassInfo | None = owner
+        self.body: list[Sentence] = body
+        self.cost: int = costOf(body)
+        self.calls: set[int] = set() #INDICES OF THE CALLEES
+        self.recursive: bool = False
+
+    @property
+    def returned(self) -> words.Expression | None:
+        """The expression it returns, if that is all the body does"""
+        if len(self.body) != 1 or type(self.body[0]) != sentences.ReturnExpression: return None
+        return self.body[0].expression
+
+
+class InlineDecision:
+
+    def __init__(self, caller: str, callee: str, position: str, inlined: bool, reason: str) -> None:
+        self.caller: str = caller
+        self.callee: str = callee
+        self.position: str = position
+        self.inlined: bool = inlined
+        self.reason: str = reason
+
+    def __repr__(self) -> str:
+        if self.inlined: return f"{self.position}: {self.callee} inlined into {self.caller}, {self.reason}"
+        return f"{self.position}: {self.callee} not inlined into {self.caller}, {self.reason}"
+
+
+class InlineReport:
+
+    def __init__(self) -> None:
+        self.decisions: list[InlineDecision] = []
+
+    @property
+    def inlined(self) -> int:
+        return sum(1 for decision in self.decisions if decision.inlined)
+
+    def __str__(self) -> str:
+        lines = [repr(decision) for decision in self.decisions]
+        lines.append(f"Inlined {self.inlined} of {len(self.decisions)} call sites")
+        return "\n".join(lines)
+
+
+def costOf(body: list[Sentence]) -> int:
+    """SENTENCE_COST per sentence plus one per crawlable and operator in its expressions"""
+    cost = 0
+    for sentence in body:
+        kind = type(sentence)
+        if kind == sentences.ScopeOpener or kind == sentences.ScopeCloser: continue
+        cost += SENTENCE_COST
+        if kind == sentences.ReturnExpression: cost += _expressionCost(sentence.expression)
+        elif kind == sentences.NakedFunctionCall: cost += _chainCost(sentence.tree)
+        elif kind == sentences.VariableAssignment: cost += _expressionCost(sentence.expression) + _chainCost(sentence.nameTree)
+    return cost
+
+def _expressionCost(expression: words.Expression) -> int:
+    cost = 0
+    while type(expression) == words.Operator:
+        cost += 1 + _chainCost(expression.leftHand)
+        expression = expression.rightHand
+    return cost + _chainCost(expression)
+
+def _chainCost(chain: list[words.Crawlable]) -> int:
+    cost = len(chain)
+    for crawlable in chain:
+        if type(crawlable) == words.FunctionCall:
+            cost += sum(_expressionCost(argument) for argument in crawlable.parameters)
+    return cost
+
+
+class _Site:
+    """A call found in a statement: the chain it is in, its index there and how to replace the whole chain"""
+
+    def __init__(self, chain: list[words.Crawlable], index: int, replace: Callable[[words.Expression], None], acceptsOperator: bool) -> None:
+        self.chain: list[words.Crawlable] = chain
+        self.index: int = index
+        self.replace: Callable[[words.Expression], None] = replace
+        self.acceptsOperator: bool = acceptsOperator #FALSE FOR THE LEFT HAND OF AN OPERATOR, THERE ARE NO PARENTHESES
+
+    @property
+    def call(self) -> words.FunctionCall:
+        return self.chain[self.index]
+
+
+class Inliner:
+    """Inlines in place the calls that fit the budget. Not thread safe"""
+
+    def __init__(self, budget: int = DEFAULT_BUDGET) -> None:
+        self.budget: int = budget
+
+    def inline(self, sentenceList: list[Sentence]) -> tuple[list[Sentence], InlineReport]:
+        """Returns the sentences (bodies parsed) with the calls inlined, and what was decided for every call site"""
+        self.sentences: list[Sentence] = list(sentences.flatten(sentenceList))
+        self.table: Globals = collectGlobals(self.sentences)
+        self.report: InlineReport = InlineReport()
+        self.functions: list[FunctionInfo] = []
+        self.byDeclaration: dict[int, FunctionInfo] = {}
+        self.freshCount: int = 0
+        self.hoisted: dict[int, list[Sentence]] = {} #STATEMENT -> ARGUMENTS DECLARED BEFORE IT
+
+        for declaration, owner, body in self.table.bodies:
+            name = declaration.name if owner is None else f"{owner.declaration.name}.{declaration.name}"
+            info = FunctionInfo(len(self.functions), name, declaration, owner, body[1:-1])
+            self.functions.append(info)
+            self.byDeclaration[id(declaration)] = info
+
+        #CALLEES FIRST: A CALLER INLINES THE BODY ITS CALLEE HAS AFTER ITS OWN CALLS WERE INLINED
+        for index in self._buildCallGraph():
+            info = self.functions[index]
+            self._inlineInto(info)
+            info.cost = costOf(info.body) #returned FOLLOWS THE BODY, HOISTED ARGUMENTS INCLUDED
+
+        inlined = []
+        for sentence in self.sentences:
+            inlined += self.hoisted.get(id(sentence), ())
+            inlined.append(sentence)
+        return inlined, self.report
+
+
+    def _resolve(self, caller: FunctionInfo, site: _Site) -> FunctionInfo | None:
+        symbol = site.call.functionSymbol
+        if site.index == 0:
+            if caller.owner is not None and symbol in caller.owner.methods:
+                return self.byDeclaration.get(id(caller.owner.methods[symbol]))
+            declaration = self.table.functions.get(symbol)
+            return None if declaration is None else self.byDeclaration.get(id(declaration))
+
+        receiverType = site.chain[site.index - 1].resolvedType #THE ANNOTATION IS TEXT, IT TRAVELS PICKLED
+        owner = None if receiverType is None else self.table.classes.get(intern(receiverType))
+        if owner is None or symbol not in owner.methods: return None
+        return self.byDeclaration.get(id(owner.methods[symbol]))
+
+    def _buildCallGraph(self) -> list[int]:
+        """Fills the calls of every function and marks the recursive ones. Returns the functions in reverse
+            topological order of the call graph (callees before their callers), the order Tarjan completes them
+        """
+        for info in self.functions:
+            for sentence in info.body:
+                for site in _sitesOf(sentence):
+                    callee = self._resolve(info, site)
+                    if callee is not None: info.calls.add(callee.index)
+
+        #TARJAN, ITERATIVE: A FUNCTION IS RECURSIVE IF IT IS IN A CYCLE (OR CALLS ITSELF)
+        index: dict[int, int] = {}
+        lowLink: dict[int, int] = {}
+        stack: list[int] = []
+        onStack: set[int] = set()
+        order: list[int] = []
+
+        for root in range(len(self.functions)):
+            if root in index: continue
+            work = [(root, iter(sorted(self.functions[root].calls)))]
+            index[root] = lowLink[root] = len(index)
+            stack.append(root)
+            onStack.add(root)
+
+            while len(work) > 0:
+                function, calls = work[-1]
+                callee = next(calls, None)
+
+                if callee is not None:
+                    if callee not in index:
+                        index[callee] = lowLink[callee] = len(index)
+                        stack.append(callee)
+                        onStack.add(callee)
+                        work.append((callee, iter(sorted(self.functions[callee].calls))))
+                    elif callee in onStack:
+                        lowLink[function] = min(lowLink[function], index[callee])
+                    continue
+
+                work.pop()
+                if len(work) > 0: lowLink[work[-1][0]] = min(lowLink[work[-1][0]], lowLink[function])
+
+                if lowLink[function] == index[function]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        onStack.discard(member)
+                        component.append(member)
+                        if member == function: break
+                    if len(component) > 1 or function in self.functions[function].calls:
+                        for member in component: self.functions[member].recursive = True
+                    order += reversed(component)
+
+        return order
+
+
+    def _inlineInto(self, caller: FunctionInfo) -> None:
+        locals_ = _declaredSymbols(caller)
+        decided: set[int] = set()
+        position = 0
+
+        while position < len(caller.body):
+            statement = caller.body[position]
+            hoisted: list[Sentence] = []
+
+            for _ in range(MAX_INLINES_PER_STATEMENT):
+                if not self._inlineFirst(caller, statement, locals_, hoisted, decided): break
+
+            if len(hoisted) > 0:
+                caller.body[position:position] = hoisted
+                self.hoisted[id(statement)] = hoisted
+                position += len(hoisted)
+            position += 1
+
+    def _inlineFirst(self, caller: FunctionInfo, statement: Sentence, locals_: set[int], hoisted: list[Sentence], decided: set[int]) -> bool:
+        """Inlines the first call of the statement that can be inlined, False if there is none"""
+        sites = _sitesOf(statement)
+        evaluated = 0 #CALLS EVALUATED BEFORE THE SITE, NOT COUNTING THE ONES IN ITS OWN ARGUMENTS
+
+        for site in sites:
+            callee = self._resolve(caller, site)
+            nested = _callCount(site.call.parameters)
+            earlier = evaluated - nested
+            evaluated += 1
+            if callee is None or id(site.call) in decided: continue
+
+            reason = self._refusal(caller, callee, site, earlier, locals_)
+            if reason is not None:
+                decided.add(id(site.call))
+                self.report.decisions.append(InlineDecision(caller.name, callee.name, statement.position, False, reason))
+                continue
+
+            self._apply(callee, site, statement, locals_, hoisted)
+            self.report.decisions.append(InlineDecision(caller.name, callee.name, statement.position, True, f"cost {callee.cost} within budget {self.budget}"))
+            return True
+
+        return False
+
+    def _refusal(self, caller: FunctionInfo, callee: FunctionInfo, site: _Site, earlier: int, locals_: set[int]) -> str | None:
+        """Why the call cannot be inlined, None if it can"""
+        if callee.recursive: return "recursive"
+        if callee.returned is None: return "body does more than return an expression"
+        if callee.cost > self.budget: return f"cost {callee.cost} over budget {self.budget}"
+        if len(site.call.parameters) != len(callee.declaration.parameters): return "wrong number of arguments"
+        if site.index > 0 and any(type(crawlable) != words.NameMention for crawlable in site.chain[:site.index]):
+            return "receiver is not a plain name chain"
+        if type(callee.returned) == words.Operator and (len(site.chain) > site.index + 1 or not site.acceptsOperator):
+            return "the result would need parentheses"
+        if earlier > 0 and not all(_isLiteral(argument) for argument in site.call.parameters):
+            return "arguments would be evaluated before earlier calls of the statement"
+        if self._genericMapping(callee, site.call) is None: return "generic parameters cannot be resolved"
+
+        parameters = {parameter.symbol for parameter in callee.declaration.parameters}
+        for symbol in _headSymbols(callee) - parameters:
+            if callee.owner is not None and (symbol in callee.owner.fields or symbol in callee.owner.methods): continue
+            if symbol in locals_ or (caller.owner is not None and caller.owner is not callee.owner and (symbol in caller.owner.fields or symbol in caller.owner.methods)):
+                return f"{nameOf(symbol)} would be captured by a name of {caller.name}"
+        return None
+
+
+    def _genericMapping(self, callee: FunctionInfo, call: words.FunctionCall) -> dict[int, int] | None:
+        """Generic of the callee -> type, from the call generics or the types of the arguments"""
+        generics = [generic.typeTree[-1].symbol for generic in callee.declaration.generics if len(generic.typeTree) > 0]
+        mapping = {}
+
+        for generic, given in zip(generics, call.generics):
+            if len(given.typeTree) > 0: mapping[generic] = given.typeTree[-1].symbol
+
+        for parameter, argument in zip(callee.declaration.parameters, call.parameters):
+            declared = parameter.descriptor.typeTree[-1].symbol if parameter.descriptor is not None and len(parameter.descriptor.typeTree) > 0 else None
+            if declared in generics and declared not in mapping:
+                argumentType = _typeOfExpression(argument)
+                if argumentType is None: return None
+                mapping[declared] = intern(argumentType)
+
+        return mapping if all(generic in mapping for generic in generics) else None
+
+    def _apply(self, callee: FunctionInfo, site: _Site, statement: Sentence, locals_: set[int], hoisted: list[Sentence]) -> None:
+        mapping = self._genericMapping(callee, site.call)
+        substitutes: dict[int, list[words.Crawlable]] = {}
+        used = _headSymbols(callee)
+
+        for parameter, argument in zip(callee.declaration.parameters, site.call.parameters):
+            if _isLiteral(argument):
+                substitutes[parameter.symbol] = argument
+                continue
+            if parameter.symbol not in used and _callCount([argument]) == 0: continue #NOTHING TO EVALUATE
+
+            fresh = self._freshSymbol(parameter.name, locals_)
+            descriptor = _mapDescriptor(parameter.descriptor, mapping)
+            hoisted.append(sentences.VariableAssignment(statement, [words.NameMention(nameOf(fresh), fresh)], descriptor, argument))
+            name = words.NameMention(nameOf(fresh), fresh)
+            name.resolvedType = _typeOfExpression(argument)
+            substitutes[parameter.symbol] = [name]
+
+        receiver = site.chain[:site.index]
+        copier = _Copier(substitutes, mapping, receiver, callee.owner)
+        replacement = copier.expression(callee.returned)
+
+        if type(replacement) != words.Operator: replacement = replacement + site.chain[site.index + 1:]
+        site.replace(replacement)
+
+    def _freshSymbol(self, name: str, locals_: set[int]) -> int:
+        while True:
+            self.freshCount += 1
+            fresh = intern(f"{name}__{self.freshCount}")
+            if fresh not in locals_ and fresh not in self.table.variables and fresh not in self.table.functions and fresh not in self.table.classes:
+                locals_.add(fresh)
+                return fresh
+
+
+class _Copier:
+    """Copies the returned expression of the callee into the caller: parameters by their substitutes, fields and
+        methods of the callee class through the receiver, generic names by their types
+    """
+
+    def __init__(self, substitutes: dict[int, list[words.Crawlable]], mapping: dict[int, int], receiver: list[words.Crawlable], owner: ClassInfo | None) -> None:
+        self.substitutes: dict[int, list[words.Crawlable]] = substitutes
+        self.mapping: dict[int, int] = mapping
+        self.receiver: list[words.Crawlable] = receiver
+        self.owner: ClassInfo | None = owner
+
+    def expression(self, expression: words.Expression) -> words.Expression:
+        if type(expression) == words.Operator:
+            operator = words.Operator(expression.kind, self.chain(expression.leftHand), self.expression(expression.rightHand))
+            operator.resolvedType, operator.operation = expression.resolvedType, expression.operation
+            return operator
+        return self.chain(expression)
+
+    def chain(self, chain: list[words.Crawlable]) -> list[words.Crawlable]:
+        copied = []
+
+        for index, crawlable in enumerate(chain):
+            kind = type(crawlable)
+
+            if index == 0 and kind == words.NameMention and crawlable.symbol in self.substitutes:
+                copied += [self.crawlable(c) for c in self.substitutes[crawlable.symbol]]
+                continue
+
+            if index == 0 and self.owner is not None and (
+                (kind == words.NameMention and crawlable.symbol in self.owner.fields) or
+                (kind == words.FunctionCall and crawlable.functionSymbol in self.owner.methods)):
+                copied += [self.crawlable(c) for c in self.receiver]
+
+            copied.append(self.crawlable(crawlable))
+
+        return copied
+
+    def crawlable(self, crawlable: words.Crawlable) -> words.Crawlable:
+        kind = type(crawlable)
+        if kind == words.NameMention: copy = words.NameMention(crawlable.value, crawlable.symbol)
+        elif kind == words.NumberLiteral: copy = words.NumberLiteral(crawlable.value, crawlable.isFloat)
+        elif kind == words.StringLiteral: copy = words.StringLiteral(crawlable.value)
+        else:
+            copy = words.FunctionCall(crawlable.functionName, [self.expression(argument) for argument in crawlable.parameters],
+                [_mapGeneric(generic, self.mapping) for generic in crawlable.generics], crawlable.functionSymbol)
+        copy.resolvedType = _mapTypeName(crawlable.resolvedType, self.mapping)
+        return copy
+
+
+def _sitesOf(sentence: Sentence) -> list[_Site]:
+    """Calls of the statement in evaluation order (arguments before their call, left before right)"""
+    sites: list[_Site] = []
+    kind = type(sentence)
+
+    if kind == sentences.ReturnExpression:
+        _expressionSites(sentence.expression, lambda new: setattr(sentence, "expression", new), sites)
+    elif kind == sentences.VariableAssignment:
+        _expressionSites(sentence.expression, lambda new: setattr(sentence, "expression", new), sites)
+    elif kind == sentences.NakedFunctionCall:
+        _chainSites(sentence.tree, lambda new: setattr(sentence, "tree", new), False, sites)
+    return sites
+
+def _expressionSites(expression: words.Expression, replace: Callable, sites: list[_Site]) -> None:
+    if type(expression) == words.Operator:
+        _chainSites(expression.leftHand, lambda new: setattr(expression, "leftHand", new), False, sites)
+        _expressionSites(expression.rightHand, lambda new: setattr(expression, "rightHand", new), sites)
+    else:
+        _chainSites(expression, replace, True, sites)
+
+def _chainSites(chain: list[words.Crawlable], replace: Callable, acceptsOperator: bool, sites: list[_Site]) -> None:
+    for index, crawlable in enumerate(chain):
+        if type(crawlable) != words.FunctionCall: continue
+        for argumentIndex, argument in enumerate(crawlable.parameters):
+            _expressionSites(argument, lambda new, call=crawlable, i=argumentIndex: call.parameters.__setitem__(i, new), sites)
+        sites.append(_Site(chain, index, replace, acceptsOperator))
+
+def _callCount(expressions: list[words.Expression]) -> int:
+    count = 0
+    for expression in expressions:
+        while type(expression) == words.Operator:
+            count += _chainCallCount(expression.leftHand)
+            expression = expression.rightHand
+        count += _chainCallCount(expression)
+    return count
+
+def _chainCallCount(chain: list[words.Crawlable]) -> int:
+    count = 0
+    for crawlable in chain:
+        if type(crawlable) == words.FunctionCall: count += 1 + _callCount(crawlable.parameters)
+    return count
+
+
+def _isLiteral(expression: words.Expression) -> bool:
+    return type(expression) != words.Operator and len(expression) == 1 and type(expression[0]) in (words.NumberLiteral, words.StringLiteral)
+
+def _typeOfExpression(expression: words.Expression) -> str | None:
+    if type(expression) == words.Operator: return expression.resolvedType
+    return expression[-1].resolvedType if len(expression) > 0 else None
+
+def _declaredSymbols(function: FunctionInfo) -> set[int]:
+    symbols = {parameter.symbol for parameter in function.declaration.parameters}
+    for sentence in function.body:
+        if type(sentence) == sentences.VariableDeclaration: symbols.add(sentence.symbol)
+        elif type(sentence) == sentences.VariableAssignment and sentence.descriptor is not None: symbols.add(sentence.nameTree[0].symbol)
+    return symbols
+
+def _headSymbols(function: FunctionInfo) -> set[int]:
+    """Names (variables and functions) at the head of the chains of the returned expression"""
+    names: set[int] = set()
+
+    def visit(expression: words.Expression) -> None:
+        while type(expression) == words.Operator:
+            visitChain(expression.leftHand)
+            expression = expression.rightHand
+        visitChain(expression)
+
+    def visitChain(chain: list[words.Crawlable]) -> None:
+        for index, crawlable in enumerate(chain):
+            kind = type(crawlable)
+            if index == 0 and kind == words.NameMention: names.add(crawlable.symbol)
+            elif index == 0 and kind == words.FunctionCall: names.add(crawlable.functionSymbol)
+            if kind == words.FunctionCall:
+                for argument in crawlable.parameters: visit(argument)
+
+    visit(function.returned)
+    return names
+
+
+def _mapName(name: words.NameMention, mapping: dict[int, int]) -> words.NameMention:
+    symbol = mapping.get(name.symbol, name.symbol)
+    return words.NameMention(nameOf(symbol), symbol)
+
+def _mapTypeName(typeName: str | None, mapping: dict[int, int]) -> str | None:
+    if typeName is None or len(mapping) == 0: return typeName
+    return nameOf(mapping.get(intern(typeName), intern(typeName)))
+
+def _mapDescriptor(descriptor: words.VariableDescriptor | None, mapping: dict[int, int]) -> words.VariableDescriptor | None:
+    if descriptor is None: return None
+    typeTree = [_mapName(name, mapping) for name in descriptor.typeTree]
+    return words.VariableDescriptor(typeTree, list(descriptor.features), [_mapGeneric(generic, mapping) for generic in descriptor.generics])
+
+def _mapGeneric(generic: words.Generic, mapping: dict[int, int]) -> words.Generic:
+    def mapNames(names: list[words.NameMention]) -> list[words.NameMention]:
+        return [_mapName(name, mapping) for name in names]
+    return words.Generic(mapNames(generic.typeTree), [mapNames(names) for names in generic.appertains], [mapNames(names) for names in generic.behaves])
@@ -1,11 +1,22 @@
+from types import MappingProxyType
 
-
+from symbols import intern
 
 
 class LeafClass:
-    """A leaf class"""
-    def __init__(self, scopedName: list[str]) -> None:
-        self.scopedName: list[str] = scopedName
+    """A leaf class. Immutable, the base classes are shared by every compilation (and thread)"""
+    __slots__ = ("scopedName", "scopedSymbols")
+
+    def __init__(self, scopedName: list[str], scopedSymbols: list[int] | None = None) -> None:
+        object.__setattr__(self, "scopedName", tuple(scopedName))
+        object.__setattr__(self, "scopedSymbols", tuple(map(intern, scopedName)) if scopedSymbols is None else tuple(scopedSymbols))
+
+    def __setattr__(self, name: str, value) -> None:
+        raise AttributeError(f"LeafClass is immutable, cannot set {name}")
+
+    def __reduce__(self):
+        """Symbol ids are per process, the names are interned again on load"""
+        return (LeafClass, (self.scopedName,))
 
 
 
@@ -15,4 +26,4 @@ intClass = LeafClass(["int"])
 
 
 
-BASE_CLASSES = {"int": intClass}
\ No newline at end of file
+BASE_CLASSES = MappingProxyType({"int": intClass})
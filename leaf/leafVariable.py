@@ -1,6 +1,17 @@
-
+from symbols import intern
 
 
 class LeafVariable:
-    def __init__(self, scopedName: list[str]) -> None:
-        self.scopedName: list[str] = scopedName
\ No newline at end of file
+    """Immutable, scopes holding it are shared between threads"""
+    __slots__ = ("scopedName", "scopedSymbols")
+
+    def __init__(self, scopedName: list[str], scopedSymbols: list[int] | None = None) -> None:
+        object.__setattr__(self, "scopedName", tuple(scopedName))
+        object.__setattr__(self, "scopedSymbols", tuple(map(intern, scopedName)) if scopedSymbols is None else tuple(scopedSymbols))
+
+    def __setattr__(self, name: str, value) -> None:
+        raise AttributeError(f"LeafVariable is immutable, cannot set {name}")
+
+    def __reduce__(self):
+        """Symbol ids are per process, the names are interned again on load"""
+        return (LeafVariable, (self.scopedName,))
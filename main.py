@@ -1,23 +1,107 @@
+import argparse
+
 from tokenizer import Token, Tokenizer
 from sentencer import Sentence, Sentencer
 from compiler import Compiler
+from buildGraph import BuildGraph, collectFiles
+from watcher import watch
+from repl import Repl
+from distributed import Worker, Coordinator, buildKey
+from moduleFile import writeModule
+from inliner import Inliner, DEFAULT_BUDGET
 
-def main()-> None:
-    with open("test.lf", "r") as f:
-        fileString = f.read()
 
-    tokenizer = Tokenizer()
-    tokens = tokenizer.tokenize(fileString)
-    #print(tokens)
+def compileFile(path: str, sentences: list[Sentence] | None = None, workers: int = 1) -> list[Sentence]:
+    if sentences is None:
+        with open(path, "r") as f:
+            fileString = f.read()
+
+        tokenizer = Tokenizer()
+        tokens = tokenizer.tokenize(fileString)
+        #print(tokens)
+
+        sentencer = Sentencer()
+        sentences = sentencer.parseSentences(tokens)
 
-    sentencer = Sentencer()
-    sentences = sentencer.parseSentences(tokens)
     for s in sentences:
         print(type(s), s)
 
-    compiler = Compiler()
+    compiler = Compiler(workers)
     compiler.compile(sentences)
+    return sentences
+
+
+def compileDistributed(graph: BuildGraph, steps: list, addresses: list[str], explain: bool) -> None:
+    coordinator = Coordinator(addresses, buildKey())
+    try:
+        results = coordinator.compileFiles([step.path for step in steps])
+    finally:
+        coordinator.close()
+
+    for step in steps:
+        if explain: print(f"{step.path}: rebuilding, {step.reason}")
+
+        result = results[step.path]
+        for diagnostic in result.diagnostics:
+            print(f"{step.path}: {diagnostic}")
+
+        if len(result.diagnostics) > 0: graph.markFailed(step.path)
+        else: graph.markBuilt(step.path)
+
+
+def main()-> None:
+    parser = argparse.ArgumentParser(description="Compile leaf files")
+    parser.add_argument("paths", nargs="*", default=["test.lf"], help="files or directories of .lf files")
+    parser.add_argument("--jobs", type=int, default=1, help="worker processes used to check function bodies, they only pay off on more than 3 cores")
+    parser.add_argument("--explain", action="store_true", help="say why each file is rebuilt")
+    parser.add_argument("--watch", action="store_true", help="keep running and rebuild whenever a file changes")
+    parser.add_argument("--repl", action="store_true", help="interactive session")
+    parser.add_argument("--serve", metavar="ADDRESS", help="run as a compile worker on host:port or unix:/path (needs LEAF_BUILD_KEY)")
+    parser.add_argument("--workers", metavar="ADDRESSES", help="comma separated compile workers to send the files to (needs LEAF_BUILD_KEY)")
+    parser.add_argument("--emit", action="store_true", help="write a compiled module (.lfc) next to every file that compiles")
+    parser.add_argument("--inline", action="store_true", help="inline small functions and say what was inlined and why")
+    parser.add_argument("--inline-budget", type=int, default=DEFAULT_BUDGET, help="biggest cost of a function that is inlined")
+    args = parser.parse_args()
+
+    if args.serve:
+        Worker().serve(args.serve, buildKey())
+        return
+
+    if args.repl:
+        Repl().run()
+        return
+
+    if args.watch:
+        watch(args.paths, args.jobs, args.explain)
+        return
+
+    graph = BuildGraph()
+    steps = graph.plan(collectFiles(args.paths))
+
+    if args.workers:
+        compileDistributed(graph, steps, args.workers.split(","), args.explain)
+        graph.save()
+        return
+
+    for step in steps:
+        if args.explain: print(f"{step.path}: rebuilding, {step.reason}")
+
+        try:
+            sentences = compileFile(step.path, step.sentences, args.jobs)
+        except Exception as e:
+            print(f"{step.path}: {e}")
+            graph.markFailed(step.path)
+        else:
+            graph.markBuilt(step.path)
+            if args.emit:
+                with open(step.path, "r") as f:
+                    writeModule(step.path + "c", sentences, f.read())
+            if args.inline:
+                print(Inliner(args.inline_budget).inline(sentences)[1])
+
+    if args.explain and len(steps) == 0: print("Everything is up to date")
+    graph.save()
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
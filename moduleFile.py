@@ -0,0 +1,561 @@
+"""
+Compiled leaf modules (.lfc). A module file keeps the sentences of a source file so it can be loaded without
+tokenizing or parsing it again, and without decoding what is not used: opening it only reads the header and checks
+the directory, every function or class declaration (with its body) is decoded the first time it is looked up
+
+Layout, all integers little endian:
+    header          magic, format version, sha256 of the source, sizes and offsets of the sections, crc32 of the new
+                    lines and crc32 of the header and the directory
+    string table    stringCount + 1 u32 offsets into the utf-8 blob, stringCount u32 crc32 of the strings, the blob
+    directory       one entry per declaration, sorted by name: kind, name, offset, length and crc32 of its record
+    new lines       u32 offsets of the new lines of the source, to give positions to the decoded sentences
+    records         the encoded declarations, in source order, and the record of the top level sentences
+
+Only the header and the directory are checked when opening, the rest is checked when it is first used: a record
+when it is decoded, a string when it is read and the new lines when a position is asked for, so opening does not
+grow with the strings, lines or records of the module
+
+Records are a compact prefix encoding: a tag per sentence or word, unsigned LEB128 integers for counts, string
+table indices and source offsets (delta from the previous sentence)
+"""
+
+import mmap
+import os
+import struct
+import zlib
+from bisect import bisect_left
+from enum import IntEnum
+
+import sentences
+import words
+from sentences import Sentence
+from tokenizer import SourceMap
+from buildGraph import hashText
+
+
+MAGIC = b"LFC\x00"
+VERSION = 2
+
+HEADER = struct.Struct("<4sHH32s13I")
+ENTRY = struct.Struct("<B3xIIII")
+U32 = struct.Struct("<I")
+
+
+class DeclarationKind(IntEnum):
+    FUNCTION = 0
+    CLASS = 1
+
+
+class SentenceTag(IntEnum):
+    SCOPE_OPENER = 0
+    SCOPE_CLOSER = 1
+    FUNCTION_DECLARATION = 2
+    CLASS_DECLARATION = 3
+    RETURN_EXPRESSION = 4
+    NAKED_FUNCTION_CALL = 5
+    VARIABLE_DECLARATION = 6
+    VARIABLE_ASSIGNMENT = 7
+
+
+class WordTag(IntEnum):
+    NAME_MENTION = 0
+    FUNCTION_CALL = 1
+    NUMBER_LITERAL = 2
+    STRING_LITERAL = 3
+    CRAWLABLE_LIST = 4
+    OPERATOR = 5
+    DESCRIPTOR = 6
+    NONE = 7
+
+
+class _Anchor:
+    """Stands for the starting token of a decoded sentence, only its position is known"""
+    __slots__ = ("offset", "source")
+
+    def __init__(self, offset: int, source: SourceMap) -> None:
+        self.offset: int = offset
+        self.source: SourceMap = source
+
+
+class _U32Array:
+    """u32 array read in place from the file. Enough of a sequence for bisect. Checked against its crc32 on first read"""
+    __slots__ = ("buffer", "offset", "count", "crc", "path")
+
+    def __init__(self, buffer, offset: int, count: int, crc: int, path: str) -> None:
+        self.buffer = buffer
+        self.offset: int = offset
+        self.count: int = count
+        self.crc: int | None = crc
+        self.path: str = path
+
+    def __len__(self) -> int:
+        return self.count
+
+    def check(self) -> None:
+        if self.crc is None: return
+        with memoryview(self.buffer) as view:
+            crc = zlib.crc32(view[self.offset:self.offset + 4 * self.count])
+        if crc != self.crc:
+            raise Exception(f"Corrupt module {self.path}, new lines do not match their checksum")
+        self.crc = None
+
+    def __getitem__(self, index: int) -> int:
+        if self.crc is not None: self.check()
+        if index < 0: index += self.count
+        if not 0 <= index < self.count: raise IndexError(index)
+        return U32.unpack_from(self.buffer, self.offset + 4 * index)[0]
+
+
+class _Writer:
+
+    def __init__(self, strings: dict[str, int]) -> None:
+        self.data: bytearray = bytearray()
+        self.strings: dict[str, int] = strings
+        self.lastOffset: int = 0
+
+    def uint(self, value: int) -> None:
+        data = self.data
+        while value >= 0x80:
+            data.append((value & 0x7F) | 0x80)
+            value >>= 7
+        data.append(value)
+
+    def string(self, value: str) -> None:
+        index = self.strings.get(value)
+        if index is None:
+            index = len(self.strings)
+            self.strings[value] = index
+        self.uint(index)
+
+    def stringList(self, values: list[str]) -> None:
+        self.uint(len(values))
+        for value in values: self.string(value)
+
+    def names(self, names: list[words.NameMention]) -> None:
+        self.stringList([name.value for name in names])
+
+    def sentence(self, sentence: Sentence) -> None:
+        kind = type(sentence)
+        tag = SENTENCE_TAGS[kind]
+        self.data.append(tag)
+        self.uint(sentence.offset - self.lastOffset)
+        self.lastOffset = sentence.offset
+
+        if tag == SentenceTag.FUNCTION_DECLARATION:
+            self.string(sentence.name)
+            self.uint(len(sentence.parameters))
+            for parameter in sentence.parameters:
+                self.string(parameter.name)
+                self.descriptor(parameter.descriptor)
+            self.generics(sentence.generics)
+            self.descriptor(sentence.returnDescriptor)
+
+        elif tag == SentenceTag.CLASS_DECLARATION:
+            self.string(sentence.name)
+            self.stringList(sentence.features)
+            self.generics(sentence.generics)
+
+        elif tag == SentenceTag.RETURN_EXPRESSION:
+            self.expression(sentence.expression)
+
+        elif tag == SentenceTag.NAKED_FUNCTION_CALL:
+            self.crawlables(sentence.tree)
+
+        elif tag == SentenceTag.VARIABLE_DECLARATION:
+            self.string(sentence.variableName)
+            self.descriptor(sentence.descriptor)
+
+        elif tag == SentenceTag.VARIABLE_ASSIGNMENT:
+            self.crawlables(sentence.nameTree)
+            self.descriptor(sentence.descriptor)
+            self.expression(sentence.expression)
+
+    def descriptor(self, descriptor: words.VariableDescriptor | None) -> None:
+        if descriptor is None:
+            self.data.append(WordTag.NONE)
+            return
+        self.data.append(WordTag.DESCRIPTOR)
+        self.names(descriptor.typeTree)
+        self.stringList(descriptor.features)
+        self.generics(descriptor.generics)
+
+    def generics(self, generics: list[words.Generic]) -> None:
+        self.uint(len(generics))
+        for generic in generics:
+            self.names(generic.typeTree)
+            self.uint(len(generic.appertains))
+            for names in generic.appertains: self.names(names)
+            self.uint(len(generic.behaves))
+            for names in generic.behaves: self.names(names)
+
+    def expression(self, expression: words.Expression) -> None:
+        if type(expression) == words.Operator:
+            self.data.append(WordTag.OPERATOR)
+            self.uint(expression.kind)
+            self.crawlables(expression.leftHand)
+            self.expression(expression.rightHand)
+        else:
+            self.data.append(WordTag.CRAWLABLE_LIST)
+            self.crawlables(expression)
+
+    def crawlables(self, crawlables: list[words.Crawlable]) -> None:
+        self.uint(len(crawlables))
+        for crawlable in crawlables:
+            kind = type(crawlable)
+            if kind == words.NameMention:
+                self.data.append(WordTag.NAME_MENTION)
+                self.string(crawlable.value)
+            elif kind == words.FunctionCall:
+                self.data.append(WordTag.FUNCTION_CALL)
+                self.string(crawlable.functionName)
+                self.uint(len(crawlable.parameters))
+                for parameter in crawlable.parameters: self.expression(parameter)
+                self.generics(crawlable.generics)
+            elif kind == words.NumberLiteral:
+                self.data.append(WordTag.NUMBER_LITERAL)
+                self.string(crawlable.value)
+            else:
+                self.data.append(WordTag.STRING_LITERAL)
+                self.string(crawlable.value)
+
+
+SENTENCE_TAGS = {
+    sentences.ScopeOpener: SentenceTag.SCOPE_OPENER,
+    sentences.ScopeCloser: SentenceTag.SCOPE_CLOSER,
+    sentences.FunctionDeclaration: SentenceTag.FUNCTION_DECLARATION,
+    sentences.ClassDeclaration: SentenceTag.CLASS_DECLARATION,
+    sentences.ReturnExpression: SentenceTag.RETURN_EXPRESSION,
+    sentences.NakedFunctionCall: SentenceTag.NAKED_FUNCTION_CALL,
+    sentences.VariableDeclaration: SentenceTag.VARIABLE_DECLARATION,
+    sentences.VariableAssignment: SentenceTag.VARIABLE_ASSIGNMENT,
+}
+
+
+class _Reader:
+
+    def __init__(self, module: "ModuleFile", start: int, end: int) -> None:
+        self.module: "ModuleFile" = module
+        self.buffer = module.buffer
+        self.index: int = start
+        self.end: int = end
+        self.lastOffset: int = 0
+
+    def byte(self) -> int:
+        if self.index >= self.end: raise Exception(f"Corrupt module {self.module.path}, record ends too early")
+        value = self.buffer[self.index]
+        self.index += 1
+        return value
+
+    def uint(self) -> int:
+        value = 0
+        shift = 0
+        while True:
+            byte = self.byte()
+            value |= (byte & 0x7F) << shift
+            if byte < 0x80: return value
+            shift += 7
+
+    def string(self) -> str:
+        return self.module.string(self.uint())
+
+    def stringList(self) -> list[str]:
+        return [self.string() for _ in range(self.uint())]
+
+    def names(self) -> list[words.NameMention]:
+        return [words.NameMention(self.string()) for _ in range(self.uint())]
+
+    def sentence(self) -> Sentence:
+        tag = self.byte()
+        self.lastOffset += self.uint()
+        anchor = _Anchor(self.lastOffset, self.module.source)
+
+        if tag == SentenceTag.SCOPE_OPENER: return sentences.ScopeOpener(anchor)
+        if tag == SentenceTag.SCOPE_CLOSER: return sentences.ScopeCloser(anchor)
+
+        if tag == SentenceTag.FUNCTION_DECLARATION:
+            name = self.string()
+            parameters = [words.ParameterDescription(self.string(), self.descriptor()) for _ in range(self.uint())]
+            generics = self.generics()
+            return sentences.FunctionDeclaration(anchor, name, parameters, generics, self.descriptor())
+
+        if tag == SentenceTag.CLASS_DECLARATION:
+            name = self.string()
+            features = self.stringList()
+            return sentences.ClassDeclaration(anchor, name, features, self.generics())
+
+        if tag == SentenceTag.RETURN_EXPRESSION: return sentences.ReturnExpression(anchor, self.expression())
+        if tag == SentenceTag.NAKED_FUNCTION_CALL: return sentences.NakedFunctionCall(anchor, self.crawlables())
+
+        if tag == SentenceTag.VARIABLE_DECLARATION:
+            name = self.string()
+            return sentences.VariableDeclaration(anchor, name, self.descriptor())
+
+        if tag == SentenceTag.VARIABLE_ASSIGNMENT:
+            nameTree = self.crawlables()
+            descriptor = self.descriptor()
+            return sentences.VariableAssignment(anchor, nameTree, descriptor, self.expression())
+
+        raise Exception(f"Corrupt module {self.module.path}, unknown sentence tag {tag}")
+
+    def descriptor(self) -> words.VariableDescriptor | None:
+        tag = self.byte()
+        if tag == WordTag.NONE: return None
+        if tag != WordTag.DESCRIPTOR: raise Exception(f"Corrupt module {self.module.path}, unknown descriptor tag {tag}")
+        typeTree = self.names()
+        features = self.stringList()
+        return words.VariableDescriptor(typeTree, features, self.generics())
+
+    def generics(self) -> list[words.Generic]:
+        generics = []
+        for _ in range(self.uint()):
+            typeTree = self.names()
+            appertains = [self.names() for _ in range(self.uint())]
+            behaves = [self.names() for _ in range(self.uint())]
+            generics.append(words.Generic(typeTree, appertains, behaves))
+        return generics
+
+    def expression(self) -> words.Expression:
+        tag = self.byte()
+        if tag == WordTag.OPERATOR:
+            kind = words.OperatorKind(self.uint())
+            leftHand = self.crawlables()
+            return words.Operator(kind, leftHand, self.expression())
+        if tag == WordTag.CRAWLABLE_LIST: return self.crawlables()
+        raise Exception(f"Corrupt module {self.module.path}, unknown expression tag {tag}")
+
+    def crawlables(self) -> list[words.Crawlable]:
+        crawlables = []
+        for _ in range(self.uint()):
+            tag = self.byte()
+            if tag == WordTag.NAME_MENTION: crawlables.append(words.NameMention(self.string()))
+            elif tag == WordTag.FUNCTION_CALL:
+                name = self.string()
+                parameters = [self.expression() for _ in range(self.uint())]
+                crawlables.append(words.FunctionCall(name, parameters, self.generics()))
+            elif tag == WordTag.NUMBER_LITERAL:
+                value = self.string()
+                crawlables.append(words.NumberLiteral(value, "." in value))
+            elif tag == WordTag.STRING_LITERAL: crawlables.append(words.StringLiteral(self.string()))
+            else: raise Exception(f"Corrupt module {self.module.path}, unknown word tag {tag}")
+        return crawlables
+
+
+def _groupDeclarations(sentenceList: list[Sentence]) -> tuple[list[list[Sentence]], list[Sentence]]:
+    """Splits the top level sentences into the declarations (each with its body) and everything else"""
+    declarations: list[list[Sentence]] = []
+    others: list[Sentence] = []
+    current: list[Sentence] | None = None
+    depth = 0
+
+    for sentence in sentences.flatten(sentenceList):
+        kind = type(sentence)
+
+        if depth == 0 and kind in (sentences.FunctionDeclaration, sentences.ClassDeclaration):
+            current = [sentence]
+            declarations.append(current)
+            continue
+
+        if kind == sentences.ScopeOpener: depth += 1
+        elif kind == sentences.ScopeCloser: depth -= 1
+
+        if current is not None: current.append(sentence)
+        else: others.append(sentence)
+
+        if depth == 0: current = None
+
+    return declarations, others
+
+
+def writeModule(path: str, sentenceList: list[Sentence], source: str) -> None:
+    """Writes the sentences parsed from source as a module file. Written to a temporary file first and then
+        moved, a reader never sees half a module
+    """
+    strings: dict[str, int] = {}
+    records = bytearray()
+    entries = []
+    declarations, others = _groupDeclarations(sentenceList)
+
+    for declaration in declarations:
+        writer = _Writer(strings)
+        for sentence in declaration: writer.sentence(sentence)
+        kind = DeclarationKind.FUNCTION if type(declaration[0]) == sentences.FunctionDeclaration else DeclarationKind.CLASS
+        entries.append((declaration[0].name, kind, len(records), writer.data))
+        records += writer.data
+
+    writer = _Writer(strings)
+    for sentence in others: writer.sentence(sentence)
+    globalsOffset, globalsRecord = len(records), writer.data
+    records += globalsRecord
+
+    blobs = [string.encode() for string in strings]
+    stringOffsets = [0]
+    for blob in blobs: stringOffsets.append(stringOffsets[-1] + len(blob))
+    stringCrcs = [zlib.crc32(blob) for blob in blobs]
+    stringTable = struct.pack(f"<{len(stringOffsets) + len(stringCrcs)}I", *stringOffsets, *stringCrcs) + b"".join(blobs)
+
+    entries.sort(key=lambda entry: entry[0])
+    directory = b"".join(ENTRY.pack(kind, strings[name], offset, len(data), zlib.crc32(data)) for name, kind, offset, data in entries)
+
+    sourceMap = SourceMap()
+    sourceMap.extend(source)
+    newLines = struct.pack(f"<{len(sourceMap.newLines)}I", *sourceMap.newLines)
+
+    stringsOffset = HEADER.size
+    directoryOffset = stringsOffset + len(stringTable)
+    newLinesOffset = directoryOffset + len(directory)
+    recordsOffset = newLinesOffset + len(newLines)
+
+    fields = [MAGIC, VERSION, 0, bytes.fromhex(hashText(source)), len(source), len(strings), stringsOffset,
+        directoryOffset, len(entries), newLinesOffset, len(sourceMap.newLines), recordsOffset,
+        recordsOffset + globalsOffset, len(globalsRecord), zlib.crc32(globalsRecord), zlib.crc32(newLines)]
+    directoryCrc = zlib.crc32(directory, zlib.crc32(HEADER.pack(*fields, 0)[:-4]))
+
+    temporaryPath = path + ".tmp"
+    with open(temporaryPath, "wb") as f:
+        f.write(HEADER.pack(*fields, directoryCrc))
+        f.write(stringTable)
+        f.write(directory)
+        f.write(newLines)
+        f.write(records)
+    os.replace(temporaryPath, path)
+
+
+class ModuleFile:
+    """An open module file. Declarations are decoded on first lookup and then cached"""
+
+    def __init__(self, path: str, sourceHash: str | None = None) -> None:
+        """If sourceHash is given, a module compiled from a different source is rejected as stale"""
+        self.path: str = path
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size < HEADER.size: raise Exception(f"{path} is not a leaf module, too short")
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            self._checkTables(sourceHash)
+        except Exception:
+            self.close()
+            raise
+
+        self.source: SourceMap = SourceMap()
+        self.source.newLines = _U32Array(self.buffer, self.newLinesOffset, self.newLinesCount, self.newLinesCrc, path)
+        self.source.length = self.sourceLength
+
+        self.strings: dict[int, str] = {}
+        self.declarations: dict[str, list[Sentence]] = {}
+
+    def _checkTables(self, sourceHash: str | None) -> None:
+        (magic, version, _, digest, self.sourceLength, self.stringCount, self.stringsOffset, self.directoryOffset,
+            self.declarationCount, self.newLinesOffset, self.newLinesCount, self.recordsOffset, self.globalsOffset,
+            self.globalsLength, self.globalsCrc, self.newLinesCrc, directoryCrc) = HEADER.unpack_from(self.buffer)
+
+        if magic != MAGIC: raise Exception(f"{self.path} is not a leaf module")
+        if version != VERSION: raise Exception(f"{self.path} has module format version {version}, expected {VERSION}")
+        if sourceHash is not None and digest.hex() != sourceHash:
+            raise Exception(f"{self.path} is stale, its source changed since it was written")
+
+        if not (HEADER.size <= self.stringsOffset <= self.directoryOffset <= self.newLinesOffset <= self.recordsOffset <= len(self.buffer)):
+            raise Exception(f"Corrupt module {self.path}, sections out of bounds")
+        if (self.stringsOffset + 4 * (2 * self.stringCount + 1) > self.directoryOffset
+            or self.directoryOffset + ENTRY.size * self.declarationCount > self.newLinesOffset
+            or self.newLinesOffset + 4 * self.newLinesCount > self.recordsOffset):
+            raise Exception(f"Corrupt module {self.path}, tables out of bounds")
+
+        with memoryview(self.buffer) as view:
+            crc = zlib.crc32(view[self.directoryOffset:self.directoryOffset + ENTRY.size * self.declarationCount], zlib.crc32(view[:HEADER.size - 4]))
+        if crc != directoryCrc: raise Exception(f"Corrupt module {self.path}, directory does not match its checksum")
+
+    def close(self) -> None:
+        try:
+            if hasattr(self, "source") and type(self.source.newLines) == _U32Array:
+                #DECODED SENTENCES KEEP THEIR POSITIONS AFTER CLOSING
+                self.source.newLines.check()
+                self.source.newLines = list(struct.unpack_from(f"<{self.newLinesCount}I", self.buffer, self.newLinesOffset))
+        finally:
+            self.buffer.close()
+
+    def __enter__(self) -> "ModuleFile":
+        return self
+
+    def __exit__(self, *exception) -> None:
+        self.close()
+
+
+    def string(self, index: int) -> str:
+        string = self.strings.get(index)
+        if string is None:
+            if index >= self.stringCount: raise Exception(f"Corrupt module {self.path}, string {index} out of the table")
+            start, end = struct.unpack_from("<2I", self.buffer, self.stringsOffset + 4 * index)
+            crc = U32.unpack_from(self.buffer, self.stringsOffset + 4 * (self.stringCount + 1 + index))[0]
+            blobOffset = self.stringsOffset + 4 * (2 * self.stringCount + 1)
+            blob = self.buffer[blobOffset + start:blobOffset + end]
+            if blobOffset + end > self.directoryOffset or zlib.crc32(blob) != crc:
+                raise Exception(f"Corrupt module {self.path}, string {index} does not match its checksum")
+            string = str(blob, "utf-8")
+            self.strings[index] = string
+        return string
+
+    def _entry(self, index: int) -> tuple[int, int, int, int, int]:
+        """kind, name index, record offset, record length, record crc32"""
+        return ENTRY.unpack_from(self.buffer, self.directoryOffset + ENTRY.size * index)
+
+    def names(self) -> list[str]:
+        """Names of the declared functions and classes, sorted"""
+        return [self.string(self._entry(i)[1]) for i in range(self.declarationCount)]
+
+    def __len__(self) -> int:
+        return self.declarationCount
+
+    def __contains__(self, name: str) -> bool:
+        return self._find(name) is not None
+
+    def _find(self, name: str) -> tuple[int, int, int, int, int] | None:
+        index = bisect_left(range(self.declarationCount), name, key=lambda i: self.string(self._entry(i)[1]))
+        if index == self.declarationCount: return None
+        entry = self._entry(index)
+        return entry if self.string(entry[1]) == name else None
+
+    def declaration(self, name: str) -> list[Sentence]:
+        """The declaration of the function or class (first sentence) followed by its body"""
+        declaration = self.declarations.get(name)
+        if declaration is None:
+            entry = self._find(name)
+            if entry is None: raise KeyError(name)
+            _, _, offset, length, crc = entry
+            declaration = self._decode(self.recordsOffset + offset, length, crc)
+            self.declarations[name] = declaration
+        return declaration
+
+    def sentences(self) -> list[Sentence]:
+        """Every sentence of the module, in source order, as the sentencer would have returned them"""
+        records = sorted(self._entry(i)[2:] for i in range(self.declarationCount))
+        declarations = [self._decode(self.recordsOffset + offset, length, crc) for offset, length, crc in records]
+        others = self._decode(self.globalsOffset, self.globalsLength, self.globalsCrc)
+
+        merged = []
+        othersIndex = 0
+        for declaration in declarations:
+            while othersIndex < len(others) and others[othersIndex].offset < declaration[0].offset:
+                merged.append(others[othersIndex])
+                othersIndex += 1
+            merged += declaration
+        return merged + others[othersIndex:]
+
+    def _decode(self, start: int, length: int, crc: int) -> list[Sentence]:
+        end = start + length
+        if end > len(self.buffer) or zlib.crc32(self.buffer[start:end]) != crc:
+            raise Exception(f"Corrupt module {self.path}, record at {start} does not match its checksum")
+
+        reader = _Reader(self, start, end)
+        decoded = []
+        while reader.index < end:
+            decoded.append(reader.sentence())
+        return decoded
+
+
+def loadModule(modulePath: str, sourcePath: str | None = None) -> ModuleFile:
+    """Opens a module, rejecting it if sourcePath is given and its content is not the one the module was written from"""
+    sourceHash = None
+    if sourcePath is not None:
+        with open(sourcePath, "r") as f:
+            sourceHash = hashText(f.read())
+    return ModuleFile(modulePath, sourceHash)
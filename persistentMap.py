@@ -0,0 +1,172 @@
+"""
+Persistent (immutable) hash map. Every insertion returns a new map that shares all untouched
+nodes with the old one, so keeping a snapshot around is free
+Implemented as a hash array mapped trie (HAMT): 32-way nodes indexed by 5 bit chunks of the hash
+"""
+
+from typing import Any, Iterator
+
+
+_BITS = 5
+_WIDTH = 1 << _BITS
+_MASK = _WIDTH - 1
+_MAX_SHIFT = 60 # sys.hash_info.width is 64, past this point only full hash collisions remain
+
+
+def _bitpos(keyHash: int, shift: int) -> int:
+    return 1 << ((keyHash >> shift) & _MASK)
+
+
+def _index(bitmap: int, bit: int) -> int:
+    return (bitmap & (bit - 1)).bit_count()
+
+
+class _Leaf:
+    __slots__ = ("keyHash", "key", "value")
+
+    def __init__(self, keyHash: int, key: Any, value: Any) -> None:
+        self.keyHash: int = keyHash
+        self.key: Any = key
+        self.value: Any = value
+
+
+class _Collision:
+    """Bucket for keys whose whole hash is equal"""
+    __slots__ = ("keyHash", "leaves")
+
+    def __init__(self, keyHash: int, leaves: tuple[_Leaf, ...]) -> None:
+        self.keyHash: int = keyHash
+        self.leaves: tuple[_Leaf, ...] = leaves
+
+
+class _Node:
+    """Bitmap indexed node, only stores the children that are present"""
+    __slots__ = ("bitmap", "children")
+
+    def __init__(self, bitmap: int, children: tuple) -> None:
+        self.bitmap: int = bitmap
+        self.children: tuple = children
+
+
+_EMPTY_NODE = _Node(0, ())
+
+
+def _merge(first: _Leaf | _Collision, second: _Leaf, shift: int) -> _Node | _Collision:
+    """Builds the smallest subtree holding two entries with different keys"""
+    if shift > _MAX_SHIFT or first.keyHash == second.keyHash:
+        if type(first) is _Collision:
+            return _Collision(first.keyHash, first.leaves + (second,))
+        return _Collision(first.keyHash, (first, second))
+
+    firstBit = _bitpos(first.keyHash, shift)
+    secondBit = _bitpos(second.keyHash, shift)
+
+    if firstBit == secondBit:
+        return _Node(firstBit, (_merge(first, second, shift + _BITS),))
+    if firstBit < secondBit:
+        return _Node(firstBit | secondBit, (first, second))
+    return _Node(firstBit | secondBit, (second, first))
+
+
+def _assoc(node: _Node, shift: int, leaf: _Leaf) -> tuple[_Node, bool]:
+    """Returns the new node and whether the map grew"""
+    bit = _bitpos(leaf.keyHash, shift)
+    index = _index(node.bitmap, bit)
+
+    if not node.bitmap & bit:
+        children = node.children[:index] + (leaf,) + node.children[index:]
+        return _Node(node.bitmap | bit, children), True
+
+    child = node.children[index]
+    grew = True
+
+    if type(child) is _Node:
+        newChild, grew = _assoc(child, shift + _BITS, leaf)
+
+    elif type(child) is _Leaf:
+        if child.keyHash == leaf.keyHash and child.key == leaf.key:
+            newChild, grew = leaf, False
+        else:
+            newChild = _merge(child, leaf, shift + _BITS)
+
+    else: #COLLISION
+        if child.keyHash == leaf.keyHash:
+            leaves = tuple(l for l in child.leaves if l.key != leaf.key)
+            grew = len(leaves) == len(child.leaves)
+            newChild = _Collision(child.keyHash, leaves + (leaf,))
+        else:
+            newChild = _Node(_bitpos(child.keyHash, shift + _BITS), (child,))
+            newChild, grew = _assoc(newChild, shift + _BITS, leaf)
+
+    children = node.children[:index] + (newChild,) + node.children[index + 1:]
+    return _Node(node.bitmap, children), grew
+
+
+def _iterate(node: _Node) -> Iterator[_Leaf]:
+    for child in node.children:
+        if type(child) is _Leaf: yield child
+        elif type(child) is _Node: yield from _iterate(child)
+        else: yield from child.leaves
+
+
+class PersistentMap:
+    """Immutable mapping. set() returns a new map in O(log n) sharing structure with this one"""
+    __slots__ = ("_root", "_size")
+
+    def __init__(self, root: _Node = _EMPTY_NODE, size: int = 0) -> None:
+        self._root: _Node = root
+        self._size: int = size
+
+    @staticmethod
+    def fromItems(items) -> "PersistentMap":
+        result = PersistentMap()
+        for key, value in items:
+            result = result.set(key, value)
+        return result
+
+    def set(self, key: Any, value: Any) -> "PersistentMap":
+        root, grew = _assoc(self._root, 0, _Leaf(hash(key), key, value))
+        return PersistentMap(root, self._size + 1 if grew else self._size)
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        keyHash = hash(key)
+        node = self._root
+        shift = 0
+
+        while True:
+            bit = _bitpos(keyHash, shift)
+            if not node.bitmap & bit: return default
+
+            child = node.children[_index(node.bitmap, bit)]
+            if type(child) is _Node:
+                node = child
+                shift += _BITS
+
+            elif type(child) is _Leaf:
+                return child.value if child.keyHash == keyHash and child.key == key else default
+
+            else:
+                for leaf in child.leaves:
+                    if leaf.key == key: return leaf.value
+                return default
+
+    def __contains__(self, key: Any) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[Any]:
+        return (leaf.key for leaf in _iterate(self._root))
+
+    def items(self) -> Iterator[tuple[Any, Any]]:
+        return ((leaf.key, leaf.value) for leaf in _iterate(self._root))
+
+    def values(self) -> Iterator[Any]:
+        return (leaf.value for leaf in _iterate(self._root))
+
+    def __repr__(self) -> str:
+        return f"PersistentMap({dict(self.items())})"
+
+
+_MISSING = object()
@@ -0,0 +1,49 @@
+"""
+The whole Tokenizer -> Sentencer -> Compiler pipeline for one source, and for many sources at the same time.
+Every stage keeps its working state in a per call context, so the stages can be shared between threads
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from tokenizer import Tokenizer
+from sentencer import Sentencer
+from sentences import Sentence
+from compiler import Compiler
+
+
+_tokenizer = Tokenizer()
+_sentencer = Sentencer()
+_compiler = Compiler()
+
+
+class CompileResult:
+    """Sentences of a file (None if it could not be parsed) and the errors found compiling it"""
+
+    def __init__(self, sentences: list[Sentence] | None, diagnostics: list[str]) -> None:
+        self.sentences: list[Sentence] | None = sentences
+        self.diagnostics: list[str] = diagnostics
+
+
+def compileSource(content: str) -> CompileResult:
+    try:
+        sentenceList = _sentencer.parseSentences(_tokenizer.tokenize(content))
+    except Exception as e:
+        return CompileResult(None, [str(e)])
+
+    try:
+        _compiler.compile(sentenceList)
+    except Exception as e:
+        return CompileResult(sentenceList, str(e).split("\n"))
+
+    return CompileResult(sentenceList, [])
+
+
+def compileMany(sources: list[str], threads: int = 1) -> list[CompileResult]:
+    """Compiles the sources on a thread pool, results in the same order. Scales with threads on free threaded python,
+        with the GIL it still overlaps reading and compiling without the pickling cost of a process pool
+    """
+    if threads <= 1:
+        return [compileSource(source) for source in sources]
+
+    with ThreadPoolExecutor(threads) as pool:
+        return list(pool.map(compileSource, sources))
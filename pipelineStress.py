@@ -0,0 +1,101 @@
+"""
+Stress test of the reentrant pipeline. Compiles generated sources on a thread pool (compileMany) and then one by one,
+and fails (exit code 1) if any result differs: diagnostics, sentences, what the compiler marked on them (types,
+frame locals) and the symbol ids, which have to name the same text after being interned from many threads at once
+Every round uses names no round used before, so the threads race on interning them
+"""
+
+import argparse
+import sys
+import time
+
+from pipeline import CompileResult, compileMany
+from symbols import Interned, nameOf
+from tokenizer import SourceMap
+
+
+def generatedSources(round: int, nSources: int, nFunctions: int) -> list[str]:
+    """Valid sources and sources with errors (names in use, parse errors). Names are unique to the round"""
+    sources = []
+    for s in range(nSources):
+        prefix = f"r{round}s{s}"
+        parts = [f"class {prefix}Car<T: {prefix}Engine % Drives>{{\n    speed: int = 3;\n    def getSpeed(unit: int): int {{\n        return speed + unit;\n    }}\n}}\n"]
+        for f in range(nFunctions):
+            parts.append(
+                f"def {prefix}f{f}(car: {prefix}Car, a: int): int {{\n"
+                f"    b: int = a + {f};\n"
+                f"    label: string = \"{prefix}\" + \"x\";\n"
+                f"    return car.getSpeed(b) + b;\n"
+                f"}}\n"
+            )
+        if s % 3 == 1: parts.append(f"{prefix}f0: int = 1;\n") #NAME ALREADY IN USE
+        if s % 3 == 2: parts.append(f"def {prefix}broken(a: int): int {{ return a + ; }}\n") #PARSE ERROR
+        sources.append("".join(parts))
+    return sources
+
+
+def describe(value, errors: list[str]):
+    """Comparable form of a result: the attributes of every object, recursively. Symbol ids are checked against
+        their text (into errors) and left out, they depend on the order names were first interned
+    """
+    if isinstance(value, (list, tuple)): return [describe(v, errors) for v in value]
+    if isinstance(value, SourceMap): return value.length
+    if value is None or isinstance(value, (int, float, str)): return value
+    if not hasattr(value, "__dict__"): return repr(value)
+
+    if isinstance(value, Interned):
+        for symbolField, textField in value.symbolFields:
+            symbol, text = getattr(value, symbolField, None), getattr(value, textField)
+            if text is not None and (symbol is None or nameOf(symbol) != text):
+                errors.append(f"{type(value).__name__} {text!r} has the symbol of {nameOf(symbol) if symbol is not None else None!r}")
+
+    skipped = {symbolField for symbolField, _ in getattr(value, "symbolFields", ())}
+    return (type(value).__name__, {k: describe(v, errors) for k, v in sorted(vars(value).items()) if k not in skipped})
+
+
+def compare(parallel: list[CompileResult], sequential: list[CompileResult]) -> list[str]:
+    errors = []
+    for index, (a, b) in enumerate(zip(parallel, sequential)):
+        if a.diagnostics != b.diagnostics:
+            errors.append(f"source {index}: diagnostics differ\n    {a.diagnostics}\n    {b.diagnostics}")
+        if describe(a.sentences, errors) != describe(b.sentences, errors):
+            errors.append(f"source {index}: sentences differ")
+    if len(parallel) != len(sequential): errors.append(f"{len(parallel)} results from the threads, {len(sequential)} sequential")
+    return errors
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compile in parallel and sequentially, fail if the results differ")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--sources", type=int, default=48, help="sources per round")
+    parser.add_argument("--functions", type=int, default=40, help="functions per source")
+    args = parser.parse_args()
+
+    gil = getattr(sys, "_is_gil_enabled", lambda: True)()
+    print(f"Python {sys.version.split()[0]}, GIL {'enabled' if gil else 'disabled'}, {args.threads} threads")
+
+    failures = 0
+    for round in range(args.rounds):
+        sources = generatedSources(round, args.sources, args.functions)
+
+        start = time.perf_counter()
+        parallel = compileMany(sources, threads=args.threads) #FIRST, SO THE THREADS INTERN THE NEW NAMES
+        parallelTime = time.perf_counter() - start
+
+        start = time.perf_counter()
+        sequential = compileMany(sources, threads=1)
+        sequentialTime = time.perf_counter() - start
+
+        errors = compare(parallel, sequential)
+        failures += len(errors)
+        for error in errors[:10]: print(f"round {round}: {error}")
+        print(f"round {round}: {len(sources)} sources, {sum(len(r.diagnostics) > 0 for r in sequential)} with errors, "
+            f"{parallelTime * 1000:.0f} ms on threads, {sequentialTime * 1000:.0f} ms sequential, {len(errors)} differences")
+
+    if failures > 0: sys.exit(1)
+    print("Parallel results match the sequential ones")
+
+
+if __name__ == "__main__":
+    main()
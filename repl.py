@@ -0,0 +1,58 @@
+"""
+Interactive leaf. The tokenizer, sentencer and compiler stay alive between inputs, so every line only costs
+the tokenizing and parsing of its own text (plus the tokens of a statement still pending from previous lines)
+"""
+
+from tokenizer import Tokenizer, TokenizerContext
+from sentencer import Sentencer, SentencerContext
+from compiler import Compiler, CompilerContext
+
+
+class Repl:
+
+    def __init__(self) -> None:
+        self.tokenizer: TokenizerContext = Tokenizer().newContext()
+        self.sentencer: SentencerContext = Sentencer().newContext()
+        self.compiler: CompilerContext = Compiler().newContext()
+
+    def prompt(self) -> str:
+        """... while a statement or a block is still open"""
+        if self.sentencer.isPending() or self.compiler.scopeManager.nLayers > 1: return "... "
+        return ">>> "
+
+    def feedLine(self, line: str) -> list[str]:
+        """Feeds one line of input, returns the errors found in it"""
+        errors = []
+
+        try:
+            newSentences = self.sentencer.feed(self.tokenizer.feed(line + "\n"))
+        except Exception as e:
+            #DROP THE BROKEN STATEMENT, KEEP EVERYTHING COMPILED SO FAR
+            source = self.tokenizer.source #KEEPS COUNTING LINES FROM THE START OF THE SESSION
+            self.tokenizer.reset()
+            self.tokenizer.source = source
+            self.sentencer.reset()
+            return [str(e)]
+
+        for sentence in newSentences:
+            try:
+                self.compiler.feed(sentence)
+            except Exception as e:
+                errors.append(str(e))
+
+        return errors
+
+    def run(self) -> None:
+        while True:
+            try:
+                line = input(self.prompt())
+            except (EOFError, KeyboardInterrupt):
+                print()
+                return
+
+            for error in self.feedLine(line):
+                print(error)
+
+
+if __name__ == "__main__":
+    Repl().run()
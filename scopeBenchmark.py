@@ -0,0 +1,130 @@
+"""
+Memory and time of keeping the visible names at every ScopeOpener of deeply nested generated programs:
+    persistent: the compiler's ScopeManager, one snapshot (O(1), shares structure) per block
+    copy: lists of classes, functions and variables copied for every block, as the scope manager used to do
+Both check every declared name against the visible ones
+"""
+
+import argparse
+import time
+import tracemalloc
+
+import sentences
+from tokenizer import Tokenizer
+from sentencer import Sentencer
+from sentences import Sentence
+from compiler import CompilerContext
+from scopeManager import Scope
+from leaf.leafClass import LeafClass, BASE_CLASSES
+from leaf.leafFunction import LeafFunction
+from leaf.leafVariable import LeafVariable
+
+
+def nestedProgram(nGlobals: int, nFunctions: int, depth: int, perBlock: int) -> str:
+    """nGlobals global variables, then functions whose bodies nest depth blocks declaring perBlock variables each"""
+    lines = [f"global{i}: int = {i};" for i in range(nGlobals)]
+    for f in range(nFunctions):
+        lines.append(f"def function{f}(p{f}: int): int {{")
+        for level in range(depth):
+            indent = "    " * (level + 1)
+            lines += [f"{indent}local{f}x{level}x{i}: int = {i};" for i in range(perBlock)]
+            lines.append(f"{indent}{{")
+        lines += ["    " * (level + 1) + "}" for level in reversed(range(depth))]
+        lines.append(f"    return p{f};")
+        lines.append("}")
+    return "\n".join(lines)
+
+
+class CopyingScopes:
+    """The scope lists of the old ScopeManager, a snapshot copies them"""
+
+    def __init__(self) -> None:
+        self.classesInScope: list[LeafClass] = list(BASE_CLASSES.values())
+        self.functionsInScope: list[LeafFunction] = []
+        self.variablesInScope: list[LeafVariable] = []
+        self.outerScopes: list[tuple[int, int, int]] = []
+
+    def declare(self, symbols: list, symbol: LeafClass | LeafFunction | LeafVariable) -> None:
+        """Same check as the compiler: the name must not be visible yet"""
+        names = [s.scopedSymbols[-1] for s in self.classesInScope + self.functionsInScope + self.variablesInScope]
+        if symbol.scopedSymbols[-1] in names: raise Exception(f"{symbol.scopedName[-1]} already in use")
+        symbols.append(symbol)
+
+    def snapshot(self) -> tuple[list, list, list]:
+        return (list(self.classesInScope), list(self.functionsInScope), list(self.variablesInScope))
+
+    def openScope(self) -> None:
+        self.outerScopes.append((len(self.classesInScope), len(self.functionsInScope), len(self.variablesInScope)))
+
+    def closeScope(self) -> None:
+        nClasses, nFunctions, nVariables = self.outerScopes.pop()
+        del self.classesInScope[nClasses:]
+        del self.functionsInScope[nFunctions:]
+        del self.variablesInScope[nVariables:]
+
+
+def persistentSnapshots(sentenceList: list[Sentence]) -> list[Scope]:
+    compiler = CompilerContext()
+    compiler.reset(sentenceList)
+    snapshots = []
+    for sentence in sentenceList:
+        compiler._checkSentence(sentence)
+        if type(sentence) == sentences.ScopeOpener: snapshots.append(compiler.scopeManager.snapshot())
+    return snapshots
+
+
+def copiedSnapshots(sentenceList: list[Sentence]) -> list[tuple[list, list, list]]:
+    scopes = CopyingScopes()
+    snapshots = []
+    parameters = []
+    for sentence in sentenceList:
+        kind = type(sentence)
+        if kind == sentences.ScopeOpener:
+            scopes.openScope()
+            for parameter in parameters: scopes.declare(scopes.variablesInScope, LeafVariable([parameter.name], [parameter.symbol]))
+            parameters = []
+            snapshots.append(scopes.snapshot())
+        elif kind == sentences.ScopeCloser: scopes.closeScope()
+        elif kind == sentences.FunctionDeclaration:
+            scopes.declare(scopes.functionsInScope, LeafFunction([sentence.name], [sentence.symbol]))
+            parameters = sentence.parameters
+        elif kind == sentences.VariableAssignment and sentence.descriptor is not None:
+            scopes.declare(scopes.variablesInScope, LeafVariable([sentence.nameTree[0].value], [sentence.nameTree[0].symbol]))
+    return snapshots
+
+
+def measure(build, sentenceList: list[Sentence]) -> tuple[float, int]:
+    """Seconds of one build, and bytes still allocated (the snapshots) by another one (tracing slows it down)"""
+    start = time.perf_counter()
+    build(sentenceList)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    snapshots = build(sentenceList)
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del snapshots
+    return elapsed, retained
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare persistent scope snapshots against copying the scope per block")
+    parser.add_argument("--globals", type=int, default=500, help="global variables of every program")
+    parser.add_argument("--functions", type=int, default=50)
+    parser.add_argument("--per-block", type=int, default=4, help="variables declared in every block")
+    parser.add_argument("--depths", default="4,16,64", help="comma separated nesting depths")
+    args = parser.parse_args()
+
+    print(f"{'depth':>6} {'blocks':>7} {'persistent KB':>14} {'copy KB':>10} {'persistent ms':>14} {'copy ms':>9}")
+    for depth in map(int, args.depths.split(",")):
+        source = nestedProgram(args.globals, args.functions, depth, args.per_block)
+        sentenceList = Sentencer().parseSentences(Tokenizer().tokenize(source))
+        nBlocks = sum(type(s) == sentences.ScopeOpener for s in sentenceList)
+
+        persistentTime, persistentBytes = measure(persistentSnapshots, sentenceList)
+        copyTime, copyBytes = measure(copiedSnapshots, sentenceList)
+        print(f"{depth:>6} {nBlocks:>7} {persistentBytes / 1024:>14.0f} {copyBytes / 1024:>10.0f} {persistentTime * 1000:>14.1f} {copyTime * 1000:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
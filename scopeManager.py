@@ -1,23 +1,81 @@
-
 from leaf.leafClass import LeafClass, BASE_CLASSES
 from leaf.leafFunction import LeafFunction
 from leaf.leafVariable import LeafVariable
+from persistentMap import PersistentMap
+
+type LeafSymbol = LeafClass | LeafFunction | LeafVariable
+
+
+class Scope:
+    """Immutable snapshot of every class, function and variable visible at one point of the program.
+        Adding a symbol returns a new scope that shares structure with this one, so snapshots can be kept per block
+        and handed to other threads or processes safely
+    """
+    __slots__ = ("symbols", "depth")
+
+    def __init__(self, symbols: PersistentMap, depth: int) -> None:
+        self.symbols: PersistentMap = symbols
+        self.depth: int = depth
+
+    def withSymbol(self, symbol: LeafSymbol) -> "Scope":
+        return Scope(self.symbols.set(symbol.scopedSymbols[-1], symbol), self.depth)
+
+    def opened(self) -> "Scope":
+        """The scope of a block nested in this one, starts with the same visible names"""
+        return Scope(self.symbols, self.depth + 1)
+
+    def lookup(self, symbol: int) -> LeafSymbol | None:
+        return self.symbols.get(symbol)
+
+    def __contains__(self, symbol: int) -> bool:
+        return symbol in self.symbols
+
+    def __reduce__(self):
+        """Keyed by symbol ids, which are per process: rebuilt from the symbols (interned again) on load"""
+        return (_rebuildScope, (list(self.symbols.values()), self.depth))
+
+
+def _rebuildScope(leafSymbols: list[LeafSymbol], depth: int) -> Scope:
+    return Scope(PersistentMap.fromItems((s.scopedSymbols[-1], s) for s in leafSymbols), depth)
+
+
+BASE_SCOPE = _rebuildScope(list(BASE_CLASSES.values()), 1)
+
 
 class ScopeManager:
     """Contains all classes, functions and variables that are defined in this scope"""
 
-    def __init__(self) -> None:
-        self.classesInScope: list[LeafClass] = [b for b in BASE_CLASSES.values()]
-        self.functionsInScope: list[LeafFunction] = []
-        self.variablesInScope: list[LeafVariable] = []
+    def __init__(self, scope: Scope | None = None) -> None:
+        """Starts from the given scope (e.g. the global symbols of a file) or from the base classes"""
+        self.scope: Scope = BASE_SCOPE if scope is None else scope
+        self.outerScopes: list[Scope] = []
+
+    @property
+    def nLayers(self) -> int:
+        return self.scope.depth
+
+    def snapshot(self) -> Scope:
+        """O(1), the returned scope never changes"""
+        return self.scope
+
+    def openScope(self) -> None:
+        self.outerScopes.append(self.scope)
+        self.scope = self.scope.opened()
 
-        self.nLayers: int = 1
+    def closeScope(self) -> None:
+        if len(self.outerScopes) == 0:
+            raise Exception("Cannot close the global scope")
+        self.scope = self.outerScopes.pop()
 
+    def addClass(self, leafClass: LeafClass) -> None:
+        self.scope = self.scope.withSymbol(leafClass)
 
-    def _getAllNames(self) -> list[str]:
-        return [c.scopedName[-1] for c in self.classesInScope + self.functionsInScope + self.variablesInScope]
+    def addFunction(self, leafFunction: LeafFunction) -> None:
+        self.scope = self.scope.withSymbol(leafFunction)
 
-    def isNameInValid(self, name: str) -> bool:
-        """Returns if the name conflicts with something in scope"""
-        return name in self._getAllNames()
+    def addVariable(self, leafVariable: LeafVariable) -> None:
+        self.scope = self.scope.withSymbol(leafVariable)
 
+    def isNameInValid(self, symbol: int) -> bool:
+        """Returns if the name (its symbol id) conflicts with something in scope"""
+        return symbol in self.scope
@@ -7,8 +7,13 @@ from tokenizer import Token, TokenKind
 import words
 import sentences
 from sentences import Sentence
+from symbols import intern
 
 
+DEF = intern("def")
+CLASS = intern("class")
+RETURN = intern("return")
+
 
 class SentencerState(IntEnum):
     NEUTRAL = 0
@@ -16,10 +21,80 @@ class SentencerState(IntEnum):
     EXPECTING_ASSINGMENT = 2
 
 
+#STATES OF _consumeGenerics: READING THE TYPE, WHAT IT APPERTAINS TO (AFTER :) OR HOW IT BEHAVES (AFTER %)
+GENERIC_TYPE = 0
+GENERIC_APPERTAINS = 1
+GENERIC_BEHAVES = 2
+
+#TOKEN KINDS AS THE PLAIN ints TOKENS CARRY, COMPARED MUCH FASTER THAN THE TokenKind MEMBERS
+STRING = int(TokenKind.STRING)
+NUMBER = int(TokenKind.NUMBER)
+EQUALS = int(TokenKind.EQUALS)
+COMMA = int(TokenKind.COMMA)
+DOT = int(TokenKind.DOT)
+COLON = int(TokenKind.COLON)
+SEMICOLON = int(TokenKind.SEMICOLON)
+OPEN_PAR = int(TokenKind.OPEN_PAR)
+CLOSE_PAR = int(TokenKind.CLOSE_PAR)
+OPEN_BRA = int(TokenKind.OPEN_BRA)
+CLOSE_BRA = int(TokenKind.CLOSE_BRA)
+OPEN_CUR = int(TokenKind.OPEN_CUR)
+CLOSE_CUR = int(TokenKind.CLOSE_CUR)
+OPEN_ANG = int(TokenKind.OPEN_ANG)
+CLOSE_ANG = int(TokenKind.CLOSE_ANG)
+QUOTES = int(TokenKind.QUOTES)
+PIPE = int(TokenKind.PIPE)
+AND = int(TokenKind.AND)
+PERCENT = int(TokenKind.PERCENT)
+
+IN_STRING_LITERAL = frozenset((STRING, NUMBER))
+
+#SentencerState AS PLAIN ints, THE STATE IS COMPARED ON EVERY STATEMENT
+NEUTRAL = int(SentencerState.NEUTRAL)
+EXPECTING_DESCRIPTOR_BEFORE_ASSIGNMENT = int(SentencerState.EXPECTING_DESCRIPTOR_BEFORE_ASSIGNMENT)
+EXPECTING_ASSINGMENT = int(SentencerState.EXPECTING_ASSINGMENT)
+
+
+def _nameMention(context: "SentencerContext", token: Token) -> words.NameMention:
+    return words.NameMention(token.value, token.symbol)
+
+def _numberLiteral(context: "SentencerContext", token: Token) -> words.NumberLiteral:
+    return words.NumberLiteral(token.value, "." in token.value)
+
+def _stringLiteral(context: "SentencerContext", token: Token) -> words.StringLiteral:
+    return context._consumeStringLiteral()
+
+#THE TOKENS A CRAWLABLE (AND SO AN EXPRESSION) CAN START WITH, AND THE WORD EACH ONE MAKES
+CRAWLABLE_WORDS = {
+    STRING: _nameMention,
+    NUMBER: _numberLiteral,
+    QUOTES: _stringLiteral,
+}
+
+
 class Sentencer:
-    """Transforms the list of tokens to a list of sentences"""
+    """Transforms the list of tokens to a list of sentences
+        In lazy mode the bodies of functions and classes are not parsed, they are skipped by brace matching and
+        left as an UnparsedBody that parses itself the first time its sentences are needed
+        Holds no state, every call works on its own SentencerContext so one instance can be shared between threads
+    """
+
+    def __init__(self, lazy: bool = False) -> None:
+        self.lazy: bool = lazy
+
+    def parseSentences(self, tokens: list[Token]) -> list[Sentence]:
+        return SentencerContext(self.lazy).parseSentences(tokens)
+
+    def newContext(self) -> "SentencerContext":
+        """A context to parse tokens that arrive in pieces (feed)"""
+        return SentencerContext(self.lazy)
 
-    def __init__(self) -> None:
+
+class SentencerContext:
+    """Working state of one parse"""
+
+    def __init__(self, lazy: bool = False) -> None:
+        self.lazy: bool = lazy
         self.reset()
 
     def reset(self) -> None:
@@ -27,10 +102,11 @@ class Sentencer:
         self.sentences: list[Sentence] = []
         self.tokens: list[Token] = []
 
-        self.state: SentencerState = SentencerState.NEUTRAL
+        self.state: int = NEUTRAL
 
         self.nameTree: list[words.NameMention | words.FunctionCall] = []
         self.descriptor: words.VariableDescriptor = None
+        self.statementStart: Token = None #FIRST TOKEN OF THE DECLARATION OR ASSIGNMENT BEING CONSUMED
 
     def parseSentences(self, tokens: list[Token]) -> list[Sentence]:
         self.reset()
@@ -40,95 +116,131 @@ class Sentencer:
             self._consume()
 
         return self.sentences
-    
+
+    def feed(self, tokens: list[Token]) -> list[Sentence]:
+        """Parses more tokens, continuing where the previous call left. Returns only the new complete sentences.
+            A statement cut by the end of the tokens is kept pending (only its tokens, already parsed ones are dropped)
+            and parsed again when more tokens arrive
+        """
+        self.tokens += tokens
+        self.sentences = []
+
+        while self.index < len(self.tokens):
+            checkpoint = (self.index, self.state, self.nameTree, self.descriptor)
+            nSentences = len(self.sentences)
+
+            try:
+                self._consume()
+            except IndexError:
+                #EVERY TOKEN IS READ AS self.tokens[self.index]: ONLY AN INDEX PAST THE END MEANS THE TOKENS RAN OUT
+                if self.index < len(self.tokens): raise
+                #RAN OUT OF TOKENS MID STATEMENT, WAIT FOR MORE
+                self.index, self.state, self.nameTree, self.descriptor = checkpoint
+                del self.sentences[nSentences:]
+                break
+
+        del self.tokens[:self.index]
+        self.index = 0
+
+        return self.sentences
+
+    def isPending(self) -> bool:
+        """Whether a statement was started and not finished"""
+        return len(self.tokens) > 0 or self.state != NEUTRAL
+
     def _consume(self) -> None:
-        if self.state == SentencerState.NEUTRAL: self._consumeNeutral()
-        elif self.state == SentencerState.EXPECTING_DESCRIPTOR_BEFORE_ASSIGNMENT: self._consumeTypeBeforeExpression()
-        elif self.state == SentencerState.EXPECTING_ASSINGMENT: self._consumeRightSideExpression()
+        if self.state == NEUTRAL: self._consumeNeutral()
+        elif self.state == EXPECTING_DESCRIPTOR_BEFORE_ASSIGNMENT: self._consumeTypeBeforeExpression()
+        elif self.state == EXPECTING_ASSINGMENT: self._consumeRightSideExpression()
         else:
             raise Exception(f"Unkonwn sentencer state {self.state}")
         
 
     def _consumeNeutral(self) -> None:
         token = self.tokens[self.index]
+        kind = token.kind
         
-        if token.kind == TokenKind.STRING:
-            if token.value == "def":
+        if kind == STRING:
+            if token.symbol == DEF:
                 self._consumeFunctionDeclaration()
+                if self.lazy: self._skipBody()
 
-            elif token.value == "class":
+            elif token.symbol == CLASS:
                 self._consumeClassDeclaration()
+                if self.lazy: self._skipBody()
 
-            elif token.value == "return":
+            elif token.symbol == RETURN:
                 self._consumeReturnDeclaration()
 
             else:
-                initialLine = token.line
+                self.statementStart = token
                 crawlable = self._consumeCrawlable()
 
                 token = self.tokens[self.index]
-                if token.kind == TokenKind.SEMICOLON:
+                kind = token.kind
+                if kind == SEMICOLON:
                     self.index += 1
-                    self.sentences.append(sentences.NakedFunctionCall(initialLine, crawlable))
+                    self.sentences.append(sentences.NakedFunctionCall(self.statementStart, crawlable))
 
-                elif token.kind == TokenKind.COLON:
+                elif kind == COLON:
                     self.index += 1
                     self.nameTree = crawlable
-                    self.state = SentencerState.EXPECTING_DESCRIPTOR_BEFORE_ASSIGNMENT
+                    self.state = EXPECTING_DESCRIPTOR_BEFORE_ASSIGNMENT
                 
-                elif token.kind == TokenKind.EQUALS:
+                elif kind == EQUALS:
                     self.index += 1
                     self.nameTree = crawlable
-                    self.state = SentencerState.EXPECTING_ASSINGMENT
+                    self.state = EXPECTING_ASSINGMENT
 
                 else:
-                    raise Exception(f"Unknown token {token} in line {token.line}")
+                    raise Exception(f"Unknown token {token} at {token.position}")
                 
-        elif token.kind == TokenKind.OPEN_CUR:
+        elif kind == OPEN_CUR:
             self.index += 1
-            self.sentences.append(sentences.ScopeOpener(token.line))
+            self.sentences.append(sentences.ScopeOpener(token))
 
-        elif token.kind == TokenKind.CLOSE_CUR:
+        elif kind == CLOSE_CUR:
             self.index += 1
-            self.sentences.append(sentences.ScopeCloser(token.line))
+            self.sentences.append(sentences.ScopeCloser(token))
 
-        elif token.kind == TokenKind.SEMICOLON:
+        elif kind == SEMICOLON:
             self.index += 1
 
         else:
-            raise Exception(f"Invalid token {token} in line {token.line}")
+            raise Exception(f"Invalid token {token} at {token.position}")
 
     def _consumeTypeBeforeExpression(self) -> None:
-        initialLine = self.tokens[self.index].line
-
         self.descriptor = self._consumeDescription()
 
         token = self.tokens[self.index]
-        if token.kind == TokenKind.EQUALS:
+        if token.kind == EQUALS:
             self.index += 1
-            self.state = SentencerState.EXPECTING_ASSINGMENT
+            self.state = EXPECTING_ASSINGMENT
 
-        elif token.kind == TokenKind.SEMICOLON:
+        elif token.kind == SEMICOLON:
             self.index += 1
-            self.sentences.append(sentences.VariableDeclaration(initialLine, self.nameTree[0].value, self.descriptor))
-            self.state = SentencerState.NEUTRAL
+            self.sentences.append(sentences.VariableDeclaration(self.statementStart, self.nameTree[0].value, self.descriptor, self.nameTree[0].symbol))
+            self.state = NEUTRAL
             self.nameTree = []
             self.descriptor = None
 
+        else:
+            raise Exception(f"Expected = or ; at {token.position} got {token}")
+
     def _consumeRightSideExpression(self) -> None:
         """Consume an expression after an equals in the typical x: int = 3; """
         
         expression = self._consumeExpression()
 
         token = self.tokens[self.index]
-        if token.kind != TokenKind.SEMICOLON:
-            raise Exception(f"Expected semicolon at line {token.line} got {token}")
+        if token.kind != SEMICOLON:
+            raise Exception(f"Expected semicolon at {token.position} got {token}")
         
         self.index += 1
 
-        self.sentences.append(sentences.VariableAssignment(token.line, self.nameTree, self.descriptor, expression))
+        self.sentences.append(sentences.VariableAssignment(self.statementStart, self.nameTree, self.descriptor, expression))
 
-        self.state = SentencerState.NEUTRAL
+        self.state = NEUTRAL
         self.nameTree = []
         self.descriptor = None
 
@@ -137,45 +249,45 @@ class Sentencer:
         self.index += 1
         nameToken = self.tokens[self.index]
 
-        initialLine = nameToken.line
+        initialToken = nameToken
         functionParams = None
         functionGenerics: list[words.Generic] = []
 
-        if nameToken.kind != TokenKind.STRING:
-            raise Exception(f"Expected function name at line {self.tokens[self.index].line}, found {self.tokens[self.index]}")
+        if nameToken.kind != STRING:
+            raise Exception(f"Expected function name at {self.tokens[self.index].position}, found {self.tokens[self.index]}")
         
         self.index += 1
         
 
         while True:
             token = self.tokens[self.index]
-            if token.kind == TokenKind.OPEN_PAR:
+            if token.kind == OPEN_PAR:
                 self.index += 1
                 functionParams = self._consumeParams()
 
-            elif token.kind == TokenKind.COLON:
+            elif token.kind == COLON:
                 self.index += 1
                 break
 
-            elif token.kind == TokenKind.OPEN_ANG:
+            elif token.kind == OPEN_ANG:
                 if functionParams is not None or len(functionGenerics) > 0:
-                    raise Exception(f"Function params or generics of the function already declared, unexpected < in line {token.line}")
+                    raise Exception(f"Function params or generics of the function already declared, unexpected < at {token.position}")
                 self.index += 1
                 functionGenerics = self._consumeGenerics()
 
             else:
-                raise Exception(f"Unexpected token {token} in line {token.line}")
+                raise Exception(f"Unexpected token {token} at {token.position}")
 
         if functionParams is None:
-            raise Exception(f"Expected param declaration between parenthesis at line {initialLine}, got SEMICOLON instead")
+            raise Exception(f"Expected param declaration between parenthesis at {initialToken.position}, got SEMICOLON instead")
 
         functionReturn = self._consumeDescription()
 
         token = self.tokens[self.index]
-        if token.kind != TokenKind.OPEN_CUR:
-            raise Exception(f"Expected {'{'} after function declaration at line {token.line}, got {token}")
+        if token.kind != OPEN_CUR:
+            raise Exception(f"Expected {'{'} after function declaration at {token.position}, got {token}")
         
-        self.sentences.append(sentences.FunctionDeclaration(initialLine, nameToken.value, functionParams, functionGenerics, functionReturn))
+        self.sentences.append(sentences.FunctionDeclaration(initialToken, nameToken.value, functionParams, functionGenerics, functionReturn, nameToken.symbol))
         
 
     def _consumeClassDeclaration(self) -> None:
@@ -183,47 +295,69 @@ class Sentencer:
         self.index += 1
         nameToken = self.tokens[self.index]
 
-        initialLine = nameToken.line
+        initialToken = nameToken
         classGenerics: list[words.Generic] = []
         classFeatures: list[str] = []
 
         genericsDeclared = False
         featuresDeclared = False
 
-        if nameToken.kind != TokenKind.STRING:
-            raise Exception(f"Expected class name at line {self.tokens[self.index].line}, got {self.tokens[self.index]}")
+        if nameToken.kind != STRING:
+            raise Exception(f"Expected class name at {self.tokens[self.index].position}, got {self.tokens[self.index]}")
         
         self.index += 1
 
         while True:
             token = self.tokens[self.index]
-            if token.kind == TokenKind.OPEN_BRA and not featuresDeclared:
+            if token.kind == OPEN_BRA and not featuresDeclared:
                 self.index += 1
                 classFeatures = self._consumeFeatures()
                 featuresDeclared = True
-            elif token.kind == TokenKind.OPEN_ANG and not genericsDeclared:
+            elif token.kind == OPEN_ANG and not genericsDeclared:
                 self.index += 1
                 classGenerics = self._consumeGenerics()
                 genericsDeclared = True
-            elif token.kind == TokenKind.OPEN_CUR:
+            elif token.kind == OPEN_CUR:
                 break
-
-        self.sentences.append(sentences.ClassDeclaration(initialLine, nameToken.value, classFeatures, classGenerics))
+            else:
+                raise Exception(f"Unexpected token {token} at {token.position}, expecting [ < or {{ after the class name")
+
+        self.sentences.append(sentences.ClassDeclaration(initialToken, nameToken.value, classFeatures, classGenerics, nameToken.symbol))
+
+    def _skipBody(self) -> None:
+        """Skips from the { (included) to its matching } (included) looking only at the token kinds"""
+        tokens = self.tokens
+        start = self.index
+        depth = 0
+
+        for i in range(start, len(tokens)):
+            kind = tokens[i].kind
+            if kind == OPEN_CUR: depth += 1
+            elif kind == CLOSE_CUR:
+                depth -= 1
+                if depth == 0:
+                    self.index = i + 1
+                    self.sentences.append(sentences.UnparsedBody(tokens[start], tokens[start:self.index]))
+                    return
+
+        #AN IndexError PAST THE END, SO feed WAITS FOR MORE TOKENS
+        self.index = len(tokens)
+        raise IndexError(f"Expected }} closing the {{ at {tokens[start].position}")
 
     def _consumeReturnDeclaration(self) -> None:
         """Consumes return + expression + ;"""
         self.index += 1
-        line = self.tokens[self.index].line
+        initialToken = self.tokens[self.index]
 
         expression = self._consumeExpression()
 
         token = self.tokens[self.index]
-        if token.kind != TokenKind.SEMICOLON:
-            raise Exception(f"Expected semicolon at line {token.line} got {token}")
+        if token.kind != SEMICOLON:
+            raise Exception(f"Expected semicolon at {token.position} got {token}")
         
         self.index += 1
 
-        self.sentences.append(sentences.ReturnExpression(token.line, expression))
+        self.sentences.append(sentences.ReturnExpression(initialToken, expression))
         
 
     def _consumeGenerics(self) -> list[words.Generic]:
@@ -231,109 +365,71 @@ class Sentencer:
             Example of generics <T: A|B % C&D, U>
         """
         
+        tokens = self.tokens
         generics = []
-        
+
+        state = GENERIC_TYPE
+        typeTree = []
+        appertains = []
+        behaves = []
+        current = typeTree #WHERE THE NAMES GO: THE TYPE, THE LAST APPERTAINS OPTION OR THE LAST BEHAVIOUR
+
         while True:
-            #OUTER LOOP, ONLY BREAK WHEN > IS FOUND, VIA RETURNING
+            token = tokens[self.index]
+            kind = token.kind
 
-            analytinzg = None # None, "appertains", "behaves"
-            typeTree = []
-            appertains = []
-            behaves = []
+            if kind == STRING:
+                self.index += 1
+                current.append(words.NameMention(token.value, token.symbol))
 
-            while True:
-                token = self.tokens[self.index]
+            elif kind == DOT: self.index += 1
 
-                if analytinzg is None:
-                    if token.kind == TokenKind.CLOSE_ANG:
-                        self.index += 1
-                        if len(typeTree) > 0:
-                            generics.append(words.Generic(typeTree, appertains, behaves))
-                        return generics
-                    
-                    elif token.kind == TokenKind.STRING:
-                        self.index += 1
-                        typeTree.append(words.NameMention(token.value))
+            elif kind == CLOSE_ANG:
+                if state != GENERIC_TYPE and len(current) == 0: raise Exception(f"Expected type before closing at {token.position}")
+                self.index += 1
+                if len(typeTree) > 0:
+                    generics.append(words.Generic(typeTree, appertains, behaves))
+                return generics
 
-                    elif token.kind == TokenKind.DOT: self.index += 1
+            elif kind == COMMA:
+                if len(current) == 0: raise Exception(f"Expected a type in generics before comma at {token.position}")
+                self.index += 1
+                generics.append(words.Generic(typeTree, appertains, behaves))
 
-                    elif token.kind == TokenKind.COMMA:
-                        if len(typeTree) == 0: raise Exception(f"Expected a type in generics before comma in line {token.line}")
-                        self.index += 1
-                        generics.append(words.Generic(typeTree, appertains, behaves))
-                        continue
-                    
-                    elif token.kind == TokenKind.COLON:
-                        if len(typeTree) == 0: raise Exception(f"Expected a type in generics before colon in line {token.line}")
-                        self.index += 1
-                        analytinzg = "appertains"
-                        appertains.append([])
-
-                    else:
-                        raise Exception(f"Unexpected {token} in line {token.line}")
-                    
-                elif analytinzg == "appertains":
-                    if token.kind == TokenKind.CLOSE_ANG:
-                        if len(appertains[-1]) == 0: raise Exception(f"Expected type before closing in line {token.line}")
-                        self.index += 1
-                        return generics
-                    
-                    elif token.kind == TokenKind.STRING:
-                        self.index += 1
-                        appertains[-1].append(words.NameMention(token.value))
+                state = GENERIC_TYPE
+                typeTree = []
+                appertains = []
+                behaves = []
+                current = typeTree
 
-                    elif token.kind == TokenKind.DOT: self.index += 1
+            elif kind == COLON and state == GENERIC_TYPE:
+                if len(typeTree) == 0: raise Exception(f"Expected a type in generics before colon at {token.position}")
+                self.index += 1
+                state = GENERIC_APPERTAINS
+                current = []
+                appertains.append(current)
 
-                    elif token.kind == TokenKind.COMMA:
-                        if len(appertains[-1]) == 0: raise Exception(f"Expected a type in generics before comma in line {token.line}")
-                        self.index += 1
-                        generics.append(words.Generic(typeTree, appertains, behaves))
-                        continue
-                    
-                    elif token.kind == TokenKind.PIPE:
-                        if len(appertains[-1]) == 0: raise Exception(f"Expected type before | in line {token.line}")
-                        self.index += 1
-                        appertains.append([])
-
-                    elif token.kind == TokenKind.PERCENT:
-                        if not ((len(appertains) == 1 and len(appertains[-1]) == 0) or len(appertains[-1]) > 0):
-                            raise Exception(f"Expected a type before % in line {token.line}")
-                        self.index += 1
-                        analytinzg = "behaves"
-                        behaves.append([])
-
-                    else:
-                        raise Exception(f"Unexpected {token} in line {token.line}")
-
-                elif analytinzg == "behaves":
-                    if token.kind == TokenKind.CLOSE_ANG:
-                        if len(behaves[-1]) == 0: raise Exception(f"Expected type before closing in line {token.line}")
-                        self.index += 1
-                        return generics
-                    
-                    elif token.kind == TokenKind.STRING:
-                        self.index += 1
-                        behaves[-1].append(words.NameMention(token.value))
+            elif kind == PIPE and state == GENERIC_APPERTAINS:
+                if len(current) == 0: raise Exception(f"Expected type before | at {token.position}")
+                self.index += 1
+                current = []
+                appertains.append(current)
 
-                    elif token.kind == TokenKind.DOT: self.index += 1
+            elif kind == PERCENT and state == GENERIC_APPERTAINS:
+                if len(current) == 0 and len(appertains) > 1: raise Exception(f"Expected a type before % at {token.position}")
+                self.index += 1
+                state = GENERIC_BEHAVES
+                current = []
+                behaves.append(current)
 
-                    elif token.kind == TokenKind.COMMA:
-                        if len(behaves[-1]) == 0: raise Exception(f"Expected a type in generics before comma in line {token.line}")
-                        self.index += 1
-                        generics.append(words.Generic(typeTree, appertains, behaves))
-                        continue
-                    
-                    elif token.kind == TokenKind.AND:
-                        if len(behaves[-1]) == 0: raise Exception(f"Expected type before & in line {token.line}")
-                        self.index += 1
-                        behaves.append([])
+            elif kind == AND and state == GENERIC_BEHAVES:
+                if len(current) == 0: raise Exception(f"Expected type before & at {token.position}")
+                self.index += 1
+                current = []
+                behaves.append(current)
 
-                    else:
-                        raise Exception(f"Unexpected {token} in line {token.line}")
-                    
-                else:
-                    raise Exception(f"Unkwown analyzing state {analytinzg}")
-                
+            else:
+                raise Exception(f"Unexpected {token} at {token.position}")
 
 
     def _consumeFeatures(self) -> list[str]:
@@ -343,24 +439,25 @@ class Sentencer:
         while True:
             token = self.tokens[self.index]
 
-            if token.kind == TokenKind.CLOSE_BRA:
+            if token.kind == CLOSE_BRA:
                 self.index += 1
                 break
 
-            if token.kind != TokenKind.STRING:
-                raise Exception(f"Expected a feature in line {token.line}")
+            if token.kind != STRING:
+                raise Exception(f"Expected a feature at {token.position}")
             
             self.index += 1
             commaToken = self.tokens[self.index]
             
-            if commaToken.kind == TokenKind.COMMA:
+            if commaToken.kind == COMMA:
                 self.index += 1
                 features.append(token.value)
-            elif commaToken.kind == TokenKind.CLOSE_BRA:
+            elif commaToken.kind == CLOSE_BRA:
                 self.index += 1
+                features.append(token.value)
                 break
             else:
-                raise Exception(f"Expecting a comma after feature {token} in line {token.line}")
+                raise Exception(f"Expecting a comma after feature {token} at {token.position}")
             
             
         
@@ -376,30 +473,30 @@ class Sentencer:
         while True:
             token = self.tokens[self.index]
 
-            if token.kind != TokenKind.STRING:
-                raise Exception(f"Expected string in parameter declaration in line {token.line}")
+            if token.kind != STRING:
+                raise Exception(f"Expected string in parameter declaration at {token.position}")
             
             self.index += 1
 
 
             nextToken = self.tokens[self.index]
 
-            if nextToken.kind == TokenKind.COLON:
+            if nextToken.kind == COLON:
                 self.index += 1
-                params.append(words.ParameterDescription(token.value, self._consumeDescription()))
+                params.append(words.ParameterDescription(token.value, self._consumeDescription(), token.symbol))
 
-            elif nextToken.kind != TokenKind.COMMA and nextToken.kind != TokenKind.CLOSE_PAR:
-                raise Exception(f"Unexpecred token {nextToken} in line {nextToken.line}, expecting , ) or :")
+            elif nextToken.kind != COMMA and nextToken.kind != CLOSE_PAR:
+                raise Exception(f"Unexpecred token {nextToken} at {nextToken.position}, expecting , ) or :")
             
             
             commaOrClosure = self.tokens[self.index]
-            if commaOrClosure.kind == TokenKind.COMMA:
+            if commaOrClosure.kind == COMMA:
                 self.index += 1
-            elif commaOrClosure.kind == TokenKind.CLOSE_PAR:
+            elif commaOrClosure.kind == CLOSE_PAR:
                 self.index += 1
                 break
             else:
-                raise Exception(f"Unexpecred token {nextToken} in line {nextToken.line}, expecting , ) or :")
+                raise Exception(f"Unexpecred token {nextToken} at {nextToken.position}, expecting , ) or :")
         
         return params
 
@@ -416,19 +513,19 @@ class Sentencer:
         while True:
             token = self.tokens[self.index]
             
-            if token.kind == TokenKind.STRING:
+            if token.kind == STRING:
                 self.index += 1
-                typeTree.append(words.NameMention(token.value))
+                typeTree.append(words.NameMention(token.value, token.symbol))
             
-            elif token.kind == TokenKind.DOT:
+            elif token.kind == DOT:
                 self.index += 1
 
-            elif token.kind == TokenKind.OPEN_ANG:
+            elif token.kind == OPEN_ANG:
                 #STARTS BEING THE GENERICS
                 self.index += 1
                 generics = self._consumeGenerics()
 
-            elif token.kind == TokenKind.OPEN_BRA:
+            elif token.kind == OPEN_BRA:
                 #STARTS THE FEATURES
                 self.index += 1
                 features = self._consumeFeatures()
@@ -443,11 +540,11 @@ class Sentencer:
         """Consumes an expression (a simple crawlable or operator and returns it)"""
         
         token = self.tokens[self.index]
-        if token.kind in [TokenKind.STRING, TokenKind.NUMBER]:
+        if token.kind in CRAWLABLE_WORDS:
             firstThing = self._consumeCrawlable()
 
         else:
-            raise Exception(f"Expected string or number at line {token.line} got {token}")
+            raise Exception(f"Expected string or number at {token.position} got {token}")
 
         
         nextToken = self.tokens[self.index]
@@ -463,75 +560,68 @@ class Sentencer:
 
     def _consumeCrawlable(self) -> list[words.Crawlable]:
         """Consumes a crawlable example: car.getSpeed().max.inUnit("m") and stops (without consuming) at other token"""
-        
-        def getCorrectCrawlable(token: Token)-> words.Crawlable:
-            if token.kind == TokenKind.STRING:
-                return words.NameMention(token.value)
-            elif token.kind == TokenKind.NUMBER:
-                return words.NumberLiteral(token.value, "." in token.value)
-            
-            elif token.kind == TokenKind.QUOTES:
-                return self._consumeStringLiteral()
-            else:
-                raise Exception("literals have to be string or number")
-            
+
+        tokens = self.tokens
         nameTree = []
 
         shouldHaveDot = False
         alreadyHadDot = True
 
         while True:
-            token = self.tokens[self.index]
+            token = tokens[self.index]
+            kind = token.kind
 
             if shouldHaveDot:
-                if token.kind == TokenKind.DOT:
+                if kind == DOT:
                     self.index += 1
                     shouldHaveDot = False
                     alreadyHadDot = True
                 
-                elif token.kind == TokenKind.STRING or token.kind == TokenKind.QUOTES:
-                    raise Exception(f"Unexpected token {token} in line {token.line}")
+                elif kind == STRING or kind == QUOTES:
+                    raise Exception(f"Unexpected token {token} at {token.position}")
                 
                 else: #TODO: ELSE IF VALID BREAKABLE TOKENS
                     break
 
             elif alreadyHadDot:
-                if token.kind in [TokenKind.STRING, TokenKind.NUMBER, TokenKind.QUOTES]:
+                makeWord = CRAWLABLE_WORDS.get(kind)
+                if makeWord is not None:
                     self.index += 1
                     alreadyHadDot = False
-                    nameTree.append(getCorrectCrawlable(token))
+                    nameTree.append(makeWord(self, token))
                 
                 else:
-                    raise Exception(f"Expected name after string in line {token.line} got {token}")
+                    raise Exception(f"Expected name after string at {token.position} got {token}")
                 
             else:
                 #not should have dot, not preceded by a dot, must be a dot or parenthesis for variable call or end of crawlable
-                if token.kind == TokenKind.DOT:
+                if kind == DOT:
                     alreadyHadDot = True
                     self.index += 1
 
-                elif token.kind == TokenKind.OPEN_PAR:
-                    if len(nameTree) == 0: raise Exception(f"Unexpected parenthesis opening in line {token.line}")
-                    if type(nameTree[-1]) != words.NameMention: raise Exception(f"Unexpected parenthesis opening ater {type(nameTree[-1])} in line {token.line}")
+                elif kind == OPEN_PAR:
+                    if len(nameTree) == 0: raise Exception(f"Unexpected parenthesis opening at {token.position}")
+                    if type(nameTree[-1]) != words.NameMention: raise Exception(f"Unexpected parenthesis opening ater {type(nameTree[-1])} at {token.position}")
                     self.index += 1
-                    nameTree[-1] = words.FunctionCall(nameTree[-1].value, self._consumeFunctionCallParams(), [])
+                    nameTree[-1] = words.FunctionCall(nameTree[-1].value, self._consumeFunctionCallParams(), [], nameTree[-1].symbol)
                     shouldHaveDot = True
 
-                elif token.kind == TokenKind.OPEN_ANG:
+                elif kind == OPEN_ANG:
                     self.index += 1
                     generics = self._consumeGenerics()
                     
-                    nextToken = self.tokens[self.index]
-                    if nextToken.kind != TokenKind.OPEN_PAR:
-                        raise Exception(f"Expected ( in line {nextToken.line}")
+                    nextToken = tokens[self.index]
+                    if nextToken.kind != OPEN_PAR:
+                        raise Exception(f"Expected ( at {nextToken.position}")
                     
-                    if len(nameTree) == 0: raise Exception(f"Unexpected parenthesis opening in line {token.line}")
-                    if type(nameTree[-1]) != words.FunctionCall: raise Exception(f"Unexpected parenthesis opening ater {type(nameTree[-1])} in line {token.line}")
+                    if len(nameTree) == 0: raise Exception(f"Unexpected parenthesis opening at {token.position}")
+                    if type(nameTree[-1]) != words.NameMention: raise Exception(f"Unexpected parenthesis opening ater {type(nameTree[-1])} at {token.position}")
                     self.index += 1
-                    nameTree[-1] = words.FunctionCall(nameTree[-1].value, self._consumeFunctionCallParams(), generics)
+                    nameTree[-1] = words.FunctionCall(nameTree[-1].value, self._consumeFunctionCallParams(), generics, nameTree[-1].symbol)
+                    shouldHaveDot = True
 
-                elif token.kind in [TokenKind.STRING, TokenKind.NUMBER, TokenKind.QUOTES]:
-                    raise Exception(f"Invalid token {token} in line {token.line}")
+                elif kind in CRAWLABLE_WORDS:
+                    raise Exception(f"Invalid token {token} at {token.position}")
                 
                 else:
                     break
@@ -542,23 +632,21 @@ class Sentencer:
 
 
     def _consumeStringLiteral(self) -> words.StringLiteral:
-        alowedInString = [TokenKind.STRING, TokenKind.NUMBER]
-
         string = ""
 
         while True:
             token = self.tokens[self.index]
             
-            if token.kind in alowedInString:
+            if token.kind in IN_STRING_LITERAL:
                 self.index += 1
                 string += token.value
 
-            elif token.kind == TokenKind.QUOTES:
+            elif token.kind == QUOTES:
                 self.index += 1
                 break
 
             else:
-                raise Exception(f"Token {token} not allowed in string in line {token.line}")
+                raise Exception(f"Token {token} not allowed in string at {token.position}")
 
         return words.StringLiteral(string)
     
@@ -569,21 +657,21 @@ class Sentencer:
         args: list[words.Crawlable] = []
 
         while True:
-            token = self.tokens[self.index]
-            if token.kind == TokenKind.CLOSE_PAR:
+            if self.tokens[self.index].kind == CLOSE_PAR:
                 break
 
             args.append(self._consumeExpression())
 
             token = self.tokens[self.index]
+            kind = token.kind
 
-            if token.kind == TokenKind.COMMA:
+            if kind == COMMA:
                 self.index += 1
 
-            elif token.kind == TokenKind.CLOSE_PAR:
+            elif kind == CLOSE_PAR:
                 break
             else:
-                raise Exception(f"Expected comma at function call at line {token.line}")
+                raise Exception(f"Expected comma at function call at {token.position}")
         
         self.index += 1 #consume closing par
         return args
@@ -1,30 +1,48 @@
 """
 Sentences types
 """
+from typing import Iterator
+
 import words
+from symbols import Interned, intern
+from tokenizer import Token, SourceMap
 
 class Sentence:
-     def __init__(self, line: int) -> None:
-          self.line: int = line
+     """Records the offset of the token it starts at, line and column are only computed for diagnostics"""
+     def __init__(self, token: Token) -> None:
+          self.offset: int = token.offset
+          self.source: SourceMap = token.source
+
+     @property
+     def line(self) -> int:
+          return self.source.lineOf(self.offset)
+
+     @property
+     def position(self) -> str:
+          """line:column"""
+          return self.source.describe(self.offset)
 
 
 class ScopeOpener(Sentence):
     """Opens a scope with a {"""
-    def __init__(self, line: int) -> None:
-         super().__init__(line)
+    def __init__(self, token: Token) -> None:
+         super().__init__(token)
 
 class ScopeCloser(Sentence):
     """Closes a scope with a }"""
-    def __init__(self, line: int) -> None:
-         super().__init__(line)
+    def __init__(self, token: Token) -> None:
+         super().__init__(token)
 
 
-class FunctionDeclaration(Sentence):
+class FunctionDeclaration(Sentence, Interned):
     """Function declaration. Name (only one word), generics and params"""
-    def __init__(self, line: int, name: str, parameters: list[words.ParameterDescription], generics: list[words.Generic], returnDescriptor: words.VariableDescriptor) -> None:
+    symbolFields = (("symbol", "name"),)
+
+    def __init__(self, token: Token, name: str, parameters: list[words.ParameterDescription], generics: list[words.Generic], returnDescriptor: words.VariableDescriptor, symbol: int | None = None) -> None:
         
-        super().__init__(line)
+        super().__init__(token)
         self.name: str = name
+        self.symbol: int = intern(name) if symbol is None else symbol
         self.parameters: list[words.ParameterDescription] = parameters
         self.generics: list[words.Generic] = generics
         self.returnDescriptor: words.VariableDescriptor = returnDescriptor
@@ -33,43 +51,76 @@ class FunctionDeclaration(Sentence):
         return f"Declaring {self.name} with generics {self.generics} params {self.parameters} returning {self.returnDescriptor}"
 
 
-class ClassDeclaration(Sentence):
+class ClassDeclaration(Sentence, Interned):
     """Declaration of a class. Currently missing extends and behaves"""
-    def __init__(self, line: int, name: str, features: list[str], generics: list[words.Generic]) -> None:
+    symbolFields = (("symbol", "name"),)
+
+    def __init__(self, token: Token, name: str, features: list[str], generics: list[words.Generic], symbol: int | None = None) -> None:
         
-        super().__init__(line)
+        super().__init__(token)
         self.name: str = name
+        self.symbol: int = intern(name) if symbol is None else symbol
         self.features: list[str] = features
         self.generics: list[words.Generic] = generics
 
 class ReturnExpression(Sentence):
-    def __init__(self, line: int, expression: words.Expression) -> None:
+    def __init__(self, token: Token, expression: words.Expression) -> None:
         
-        super().__init__(line)
+        super().__init__(token)
         self.expression: words.Expression = expression
 
 
 class NakedFunctionCall(Sentence):
     """Function call without a return car.setPosition(3);"""
-    def __init__(self, line: int, tree: list[words.Crawlable]) -> None:
-        super().__init__(line)
+    def __init__(self, token: Token, tree: list[words.Crawlable]) -> None:
+        super().__init__(token)
         self.tree: list[words.Crawlable] = tree
 
 
-class VariableDeclaration(Sentence):
+class VariableDeclaration(Sentence, Interned):
     """Variable declaration without initialization"""
-    def __init__(self, line: int, variableName: str, descriptor: words.VariableDescriptor) -> None:
-        super().__init__(line)
+    symbolFields = (("symbol", "variableName"),)
+    frameLocal: bool = False #SET BY THE ESCAPE ANALYSIS IF THE VALUE NEVER LEAVES ITS FUNCTION
+
+    def __init__(self, token: Token, variableName: str, descriptor: words.VariableDescriptor, symbol: int | None = None) -> None:
+        super().__init__(token)
 
         self.variableName: str = variableName
+        self.symbol: int = intern(variableName) if symbol is None else symbol
         self.descriptor: words.VariableDescriptor = descriptor
 
 
 class VariableAssignment(Sentence):
     """The typical car.speed = 10 + 3; """
-    def __init__(self, line: int, nameTree: list[words.Crawlable], descriptor: words.VariableDescriptor | None, expression: words.Expression) -> None:
-        super().__init__(line)
+    frameLocal: bool = False #SET BY THE ESCAPE ANALYSIS IF IT DECLARES A VALUE THAT NEVER LEAVES ITS FUNCTION
+    def __init__(self, token: Token, nameTree: list[words.Crawlable], descriptor: words.VariableDescriptor | None, expression: words.Expression) -> None:
+        super().__init__(token)
         self.nameTree: list[words.Crawlable] = nameTree
         self.descriptor: words.VariableDescriptor | None = descriptor
         self.expression: words.Expression = expression
 
+
+
+class UnparsedBody(Sentence):
+    """Body of a function or class ({ and } included) left unparsed by a lazy Sentencer. Only its tokens are
+        recorded, it is parsed the first time its sentences are accessed and then cached
+    """
+    def __init__(self, token: Token, tokens: list) -> None:
+        super().__init__(token)
+        self.tokens: list = tokens #ITS OWN SLICE, THE TOKEN LIST OF A SentencerContext.feed IS TRIMMED
+        self._sentences: list[Sentence] | None = None
+
+    @property
+    def sentences(self) -> list[Sentence]:
+        if self._sentences is None:
+            from sentencer import Sentencer #SENTENCER IMPORTS THIS MODULE
+            self._sentences = Sentencer(lazy=True).parseSentences(self.tokens)
+            self.tokens = [] #NOT NEEDED ANYMORE
+        return self._sentences
+
+
+def flatten(sentenceList: list[Sentence]) -> Iterator[Sentence]:
+    """Iterates the sentences parsing the unparsed bodies on the way, as if the list had been fully parsed"""
+    for sentence in sentenceList:
+        if type(sentence) == UnparsedBody: yield from flatten(sentence.sentences)
+        else: yield sentence
@@ -0,0 +1,63 @@
+"""
+Global symbol table. The tokenizer gives every distinct identifier a dense integer id, the id travels through tokens,
+words, sentences and scopes so names are compared and hashed as integers. The text is stored once per distinct name
+and only looked up for diagnostics
+"""
+
+import threading
+
+
+class SymbolTable:
+    """Append only. Lookups take no lock, only the insertion of a new name does"""
+
+    def __init__(self) -> None:
+        self.ids: dict[str, int] = {}
+        self.names: list[str] = []
+        self.lock: threading.Lock = threading.Lock()
+
+    def intern(self, name: str) -> int:
+        symbol = self.ids.get(name)
+        if symbol is not None: return symbol
+
+        with self.lock:
+            symbol = self.ids.get(name)
+            if symbol is None:
+                symbol = len(self.names)
+                self.names.append(name) #BEFORE PUBLISHING THE ID, SO AN ID ALWAYS HAS ITS NAME
+                self.ids[name] = symbol
+            return symbol
+
+    def nameOf(self, symbol: int) -> str:
+        return self.names[symbol]
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+
+SYMBOLS = SymbolTable()
+
+def intern(name: str) -> int:
+    return SYMBOLS.intern(name)
+
+def nameOf(symbol: int) -> str:
+    return SYMBOLS.nameOf(symbol)
+
+
+class Interned:
+    """Base of the objects that carry symbol ids next to their text. Ids only mean something in the process that
+        interned them: pickling drops them and unpickling interns the text again
+        symbolFields are (id attribute, text attribute) pairs
+    """
+    symbolFields: tuple[tuple[str, str], ...] = ()
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        for symbolField, _ in self.symbolFields:
+            state.pop(symbolField, None)
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        for symbolField, textField in self.symbolFields:
+            text = getattr(self, textField)
+            setattr(self, symbolField, None if text is None else intern(text))
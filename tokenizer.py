@@ -2,9 +2,12 @@
 The tokenizer transforms the chars in the file to a list of tokens
 """
 
+from bisect import bisect_left
 from enum import IntEnum
 from typing import Union
 
+from symbols import SYMBOLS, Interned
+
 
 
 class TokenKind(IntEnum):
@@ -31,18 +34,92 @@ class TokenKind(IntEnum):
     PERCENT = 19 # %
 
 
-class Token:
+#TOKENS CARRY THEIR KIND AS A PLAIN int: COMPARING IT WITH AN int IS SEVERAL TIMES FASTER THAN WITH AN IntEnum MEMBER
+STRING_KIND = int(TokenKind.STRING)
+NUMBER_KIND = int(TokenKind.NUMBER)
+
+#KIND OF THE TOKEN OF EVERY PUNCTUATION CHAR
+PUNCTUATION = {char: int(kind) for char, kind in (
+    ("=", TokenKind.EQUALS), (":", TokenKind.COLON), (";", TokenKind.SEMICOLON), (",", TokenKind.COMMA),
+    ("(", TokenKind.OPEN_PAR), (")", TokenKind.CLOSE_PAR), ("[", TokenKind.OPEN_BRA), ("]", TokenKind.CLOSE_BRA),
+    ("{", TokenKind.OPEN_CUR), ("}", TokenKind.CLOSE_CUR), ("<", TokenKind.OPEN_ANG), (">", TokenKind.CLOSE_ANG),
+    (".", TokenKind.DOT), ("+", TokenKind.PLUS), ("\"", TokenKind.QUOTES), ("|", TokenKind.PIPE), ("&", TokenKind.AND),
+    ("%", TokenKind.PERCENT),
+)}
+
+
+class SourceMap:
+    """
+    Offsets of the new lines of a source. Tokens and sentences only record raw offsets,
+    line and column are computed from here (bisect) when a diagnostic needs them
+    """
+
+    def __init__(self) -> None:
+        self.newLines: list[int] = []
+        self.length: int = 0
+        self.chunks: list[str] = [] #THE TEXT SEEN, JOINED WHEN IT IS ASKED FOR
+
+    def extend(self, string: str) -> None:
+        """Records the new lines of more text, appended after the text already seen"""
+        newLines = self.newLines
+        index = string.find("\n")
+        while index != -1:
+            newLines.append(self.length + index)
+            index = string.find("\n", index + 1)
+        self.length += len(string)
+        self.chunks.append(string)
+
+    @property
+    def text(self) -> str | None:
+        """The whole text, None if the map was not built from it (e.g. loaded from a module file)"""
+        if len(self.chunks) == 0 and self.length > 0: return None
+        if len(self.chunks) != 1: self.chunks = ["".join(self.chunks)]
+        return self.chunks[0]
+
+    def lineOf(self, offset: int) -> int:
+        return bisect_left(self.newLines, offset) + 1
+
+    def columnOf(self, offset: int) -> int:
+        line = self.lineOf(offset)
+        lineStart = 0 if line == 1 else self.newLines[line - 2] + 1
+        return offset - lineStart + 1
+
+    def describe(self, offset: int) -> str:
+        """line:column, both starting at 1"""
+        return f"{self.lineOf(offset)}:{self.columnOf(offset)}"
+
+
+class Token(Interned):
     """
     A token. Represents a "word", number or special character
+    Words (STRING tokens) also carry the symbol id of their text
+    Only the offset in the source is recorded, line and column are computed on demand
+    The kind is the int value of its TokenKind
     """
+    symbolFields = (("symbol", "value"),)
 
-    def __init__(self, kind: TokenKind, value: Union[None, str], line: int) -> None:
-        self.kind: TokenKind = kind
+    def __init__(self, kind: int, value: Union[None, str], offset: int, source: SourceMap, symbol: Union[None, int] = None) -> None:
+        self.kind: int = kind
         self.value: Union[None, str] = value
-        self.line: int = line
+        self.offset: int = offset
+        self.source: SourceMap = source
+        self.symbol: Union[None, int] = symbol
+
+    @property
+    def line(self) -> int:
+        return self.source.lineOf(self.offset)
+
+    @property
+    def column(self) -> int:
+        return self.source.columnOf(self.offset)
+
+    @property
+    def position(self) -> str:
+        """line:column"""
+        return self.source.describe(self.offset)
 
     def __repr__(self) -> str:
-        string =  f" {self.kind.name}"
+        string =  f" {TokenKind(self.kind).name}"
         if self.value is not None:
             string += f" {self.value}"
         return string
@@ -57,6 +134,24 @@ class TokenizerState(IntEnum):
 class Tokenizer:
     """
     tokenize function transforms the chars in the file to a list of tokens
+    Holds no state, every call works on its own TokenizerContext so one instance can be shared between threads
+    """
+
+    def tokenize(self, string: str) -> list[Token]:
+        return TokenizerContext().feed(string)
+
+    def newContext(self) -> "TokenizerContext":
+        """A context to tokenize text that arrives in pieces (feed)"""
+        return TokenizerContext()
+
+    def tokenizeRange(self, source: SourceMap, start: int, end: int) -> list[Token]:
+        """Tokens of the text of source between the offsets, as they were when the whole text was tokenized"""
+        return TokenizerContext().feedRange(source, start, end)
+
+
+class TokenizerContext:
+    """
+    Working state of one tokenization
     """
 
     def __init__(self) -> None:
@@ -67,33 +162,46 @@ class Tokenizer:
         self.state: TokenizerState = TokenizerState.NEUTRAL
         self.currentString: str = ""
         self.currentNumber: str = ""
+        self.tokenStart: int = 0 #OFFSET WHERE THE WORD OR NUMBER BEING CONSUMED STARTED
+        self.source: SourceMap = SourceMap()
 
-    def tokenize(self, string: str) -> list[Token]:
-        self.reset()
-
-        line: int = 1
-
-        for char in string:
-            if char == "\n": line += 1
-            elif char == "\t": pass
-            else: self._consumeChar(char, line)
+    def feed(self, string: str) -> list[Token]:
+        """Tokenizes more text, continuing where the previous call left (offsets and half consumed words).
+            Returns only the new tokens
+        """
+        self.tokens = []
+        start = self.source.length
+        self.source.extend(string)
+        self._consumeText(string, start)
+        return self.tokens
 
+    def feedRange(self, source: SourceMap, start: int, end: int) -> list[Token]:
+        """Tokenizes part of a text already recorded in source, the tokens point to source"""
+        self.reset()
+        self.source = source
+        self._consumeText(source.text[start:end], start)
+        self._consumeChar(" ", end) #ENDS A WORD OR NUMBER CUT BY THE END OF THE RANGE
         return self.tokens
+
+    def _consumeText(self, string: str, start: int) -> None:
+        for offset, char in enumerate(string, start):
+            if char == "\n" or char == "\t": self._consumeChar(" ", offset) #WHITESPACE, ENDS THE WORD OR NUMBER BEING CONSUMED
+            else: self._consumeChar(char, offset)
     
-    def _consumeChar(self, char: str, line: int) -> None:
+    def _consumeChar(self, char: str, offset: int) -> None:
 
         if self.state == TokenizerState.NEUTRAL:
-            potentialToken = self._consumeNeutral(char, line)
+            potentialToken = self._consumeNeutral(char, offset)
             if potentialToken is not None: self.tokens.append(potentialToken)
 
         elif self.state == TokenizerState.CONSUMING_STRING:
-            potentialTokens: Union[None, tuple[Token, Union[None, Token]]] = self._consumeString(char, line)
+            potentialTokens: Union[None, tuple[Token, Union[None, Token]]] = self._consumeString(char, offset)
             if potentialTokens is not None:
                 self.tokens.append(potentialTokens[0])
                 if potentialTokens[1] is not None: self.tokens.append(potentialTokens[1])
 
         elif self.state == TokenizerState.CONSUMING_NUMBER:
-            potentialTokens: Union[None, tuple[Token, Union[None, Token]]] = self._consumeNumber(char, line)
+            potentialTokens: Union[None, tuple[Token, Union[None, Token]]] = self._consumeNumber(char, offset)
             if potentialTokens is not None:
                 self.tokens.append(potentialTokens[0])
                 if potentialTokens[1] is not None: self.tokens.append(potentialTokens[1])
@@ -102,68 +210,55 @@ class Tokenizer:
             raise Exception(f"Tokenizer error: Unknown state {self.state.name}")
 
     
-    def _consumeNeutral(self, char: str, line: int) -> Union[None, Token]:
+    def _consumeNeutral(self, char: str, offset: int) -> Union[None, Token]:
         if char.isnumeric():
             self.state = TokenizerState.CONSUMING_NUMBER
+            self.tokenStart = offset
             self.currentNumber += char
             return None
         
         if char.isalpha() or char == "_":
             self.state = TokenizerState.CONSUMING_STRING
+            self.tokenStart = offset
             self.currentString += char
             return None
 
         if char == " ": return None
-        if char == "=": return Token(TokenKind.EQUALS, None, line)
-        if char == ":": return Token(TokenKind.COLON, None, line)
-        if char == ";": return Token(TokenKind.SEMICOLON, None, line)
-        if char == ",": return Token(TokenKind.COMMA, None, line)
-        if char == "(": return Token(TokenKind.OPEN_PAR, None, line)
-        if char == ")": return Token(TokenKind.CLOSE_PAR, None, line)
-        if char == "[": return Token(TokenKind.OPEN_BRA, None, line)
-        if char == "]": return Token(TokenKind.CLOSE_BRA, None, line)
-        if char == "{": return Token(TokenKind.OPEN_CUR, None, line)
-        if char == "}": return Token(TokenKind.CLOSE_CUR, None, line)
-        if char == "<": return Token(TokenKind.OPEN_ANG, None, line)
-        if char == ">": return Token(TokenKind.CLOSE_ANG, None, line)
-        if char == ".": return Token(TokenKind.DOT, None, line)
-        if char == "+": return Token(TokenKind.PLUS, None, line)
-        if char == "\"": return Token(TokenKind.QUOTES, None, line)
-        if char == "|": return Token(TokenKind.PIPE, None, line)
-        if char == "&": return Token(TokenKind.AND, None, line)
-        if char == "%": return Token(TokenKind.PERCENT, None, line)
-
-        raise Exception(f"Character {char} in line {line} is not allowed")
-
-
-    def _consumeString(self, char: str, line: int) -> Union[None, tuple[Token, Union[None, Token]]]:
+        kind = PUNCTUATION.get(char)
+        if kind is not None: return Token(kind, None, offset, self.source)
+
+        raise Exception(f"Character {char} at {self.source.describe(offset)} is not allowed")
+
+
+    def _consumeString(self, char: str, offset: int) -> Union[None, tuple[Token, Union[None, Token]]]:
         
         if char.isalnum() or char == "_":
             self.currentString += char
             return None
                 
         else:
-            string = self.currentString
+            symbol = SYMBOLS.intern(self.currentString)
             self.currentString: str = ""
             self.state = TokenizerState.NEUTRAL
-            return (Token(TokenKind.STRING, string, line), self._consumeNeutral(char, line))
+            #THE TEXT IS THE ONE IN THE TABLE, PAID ONCE PER DISTINCT NAME
+            return (Token(STRING_KIND, SYMBOLS.names[symbol], self.tokenStart, self.source, symbol), self._consumeNeutral(char, offset))
         
     
-    def _consumeNumber(self, char: str, line: int) -> Union[None, tuple[Token, Union[None, Token]]]:
+    def _consumeNumber(self, char: str, offset: int) -> Union[None, tuple[Token, Union[None, Token]]]:
         if char.isnumeric():
             self.currentNumber += char
 
         elif char == ".":
             if "." in self.currentNumber:
-                raise Exception(f"Tokenizer error in line {line}. Numeric value {self.currentNumber} already has a decimal point.")
+                raise Exception(f"Tokenizer error at {self.source.describe(offset)}. Numeric value {self.currentNumber} already has a decimal point.")
             else:
                 self.currentNumber += "."
 
         elif char.isalpha():
-            raise Exception(f"Tokenizer error in line {line}. Cannot continue number declaration {self.currentNumber} with alphabetic character {char}")
+            raise Exception(f"Tokenizer error at {self.source.describe(offset)}. Cannot continue number declaration {self.currentNumber} with alphabetic character {char}")
         
         else:
             string = self.currentNumber
             self.currentNumber: str = ""
             self.state = TokenizerState.NEUTRAL
-            return (Token(TokenKind.NUMBER, string, line), self._consumeNeutral(char,line))
\ No newline at end of file
+            return (Token(NUMBER_KIND, string, self.tokenStart, self.source), self._consumeNeutral(char, offset))
\ No newline at end of file
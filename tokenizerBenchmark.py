@@ -0,0 +1,97 @@
+"""
+Cost of the positions of the tokens, computed lazily against eagerly. Tokenizes a generated source of many lines with:
+    lazy: the Tokenizer, tokens record their offset and line:column is found in the SourceMap (bisect) when asked for
+    eager: the tokenizer keeping the line and where it starts char by char, as it used to, and giving every token its
+        line and column when it is made
+And reports the time of the tokenization, and of asking the position of a few tokens (what a failed compilation
+does) and of all of them
+"""
+
+import argparse
+import time
+
+from tokenizer import Token, TokenizerContext
+
+
+class EagerLinesContext(TokenizerContext):
+    """Keeps the line and its start while consuming the chars, every token gets its line and column right away"""
+
+    def reset(self) -> None:
+        super().reset()
+        self.line: int = 1
+        self.lineStart: int = 0
+
+    def feed(self, string: str) -> list[Token]:
+        self.tokens = []
+        start = self.source.length
+        self.source.length += len(string) #NO NEW LINE INDEX, THE LINES ARE COUNTED BELOW
+        self._consumeText(string, start)
+        return self.tokens
+
+    def _consumeText(self, string: str, start: int) -> None:
+        tokens = self.tokens
+        line, lineStart = self.line, self.lineStart
+        for offset, char in enumerate(string, start):
+            made = len(tokens)
+            if char == "\n" or char == "\t": self._consumeChar(" ", offset)
+            else: self._consumeChar(char, offset)
+            if len(tokens) != made:
+                for token in tokens[made:]: token.eagerPosition = (line, token.offset - lineStart + 1) #A WORD NEVER SPANS LINES
+            if char == "\n":
+                line += 1
+                lineStart = offset + 1
+        self.line, self.lineStart = line, lineStart
+
+
+def generatedSource(nFunctions: int) -> str:
+    parts = []
+    for i in range(nFunctions):
+        parts.append(
+            f"def function{i}(car: Car, a: int): int {{\n"
+            f"\tb: int = a + {i}.5;\n"
+            f"\tlabel: string = \"route\" + \"{i}\";\n"
+            f"\tc: int = car.getSpeed(b).max(a, b) + b;\n"
+            f"\treturn c + car.speed;\n"
+            f"}}\n"
+        )
+    return "".join(parts)
+
+
+def best(function, repeats: int) -> float:
+    elapsed = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        elapsed = min(elapsed, time.perf_counter() - start)
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare tokenizing with lazy positions (offsets) against eager line tracking")
+    parser.add_argument("--functions", type=int, default=5000)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--asked", type=int, default=10, help="positions asked for, as the diagnostics of a failed compilation")
+    args = parser.parse_args()
+
+    source = generatedSource(args.functions)
+    lazyTokens = TokenizerContext().feed(source)
+    eagerTokens = EagerLinesContext().feed(source)
+    for lazy, eager in zip(lazyTokens, eagerTokens):
+        if (lazy.line, lazy.column) != eager.eagerPosition: raise Exception(f"Positions differ: {lazy.position} and {eager.eagerPosition}")
+
+    step = max(1, len(lazyTokens) // args.asked)
+    lazyTime = best(lambda: TokenizerContext().feed(source), args.repeats)
+    eagerTime = best(lambda: EagerLinesContext().feed(source), args.repeats)
+    lazyFew = best(lambda: [token.position for token in lazyTokens[::step]], args.repeats)
+    eagerFew = best(lambda: [f"{token.eagerPosition[0]}:{token.eagerPosition[1]}" for token in eagerTokens[::step]], args.repeats)
+    lazyAll = best(lambda: [token.position for token in lazyTokens], args.repeats)
+    eagerAll = best(lambda: [f"{token.eagerPosition[0]}:{token.eagerPosition[1]}" for token in eagerTokens], args.repeats)
+
+    print(f"{len(source)} chars, {source.count(chr(10))} lines, {len(lazyTokens)} tokens")
+    print(f"{'':>6} {'tokenize ms':>12} {'us/line':>8} {f'{args.asked} positions ms':>17} {'all positions ms':>17}")
+    for name, tokenize, few, every in (("lazy", lazyTime, lazyFew, lazyAll), ("eager", eagerTime, eagerFew, eagerAll)):
+        print(f"{name:>6} {tokenize * 1000:>12.1f} {tokenize / source.count(chr(10)) * 1e6:>8.2f} {few * 1000:>17.3f} {every * 1000:>17.1f}")
+
+
+if __name__ == "__main__":
+    main()
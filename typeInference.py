@@ -0,0 +1,328 @@
+"""
+Static type inference. Types come from literals, descriptors (variables, parameters, fields, function returns) and
+calls, and are propagated through chains (car.getSpeed().max) and operators. Every crawlable and operator gets its
+resolvedType (None if it can only be known at runtime) and every operator the specialised operation a backend can
+emit without checking types at runtime
+
+Functions are inferred once and cached. A cached function is inferred again only when the signature of something it
+depends on (function, class or global variable it mentions) changes
+A session (the REPL) gives the sentences in pieces instead: every piece is inferred against the globals of the
+pieces before, and only the functions that mention a global the piece declares are inferred again
+
+Names and types are symbol ids (symbols.py) in every table, the text is only looked up for the resolvedType
+annotations
+"""
+
+from typing import Iterable
+from weakref import WeakKeyDictionary
+
+import sentences
+import words
+from sentences import Sentence
+from words import Operation
+from symbols import intern, nameOf
+
+
+INT = intern("int")
+FLOAT = intern("float")
+STRING = intern("string")
+
+FUNCTION, CLASS, VARIABLE = 0, 1, 2 #KINDS OF DEPENDENCY, (KIND, SYMBOL)
+
+SUM_OPERATIONS = {
+    (INT, INT): (Operation.ADD_INT, INT),
+    (INT, FLOAT): (Operation.ADD_FLOAT, FLOAT),
+    (FLOAT, INT): (Operation.ADD_FLOAT, FLOAT),
+    (FLOAT, FLOAT): (Operation.ADD_FLOAT, FLOAT),
+    (STRING, STRING): (Operation.CONCAT, STRING),
+}
+
+
+def typeOf(descriptor: words.VariableDescriptor | None, generics: frozenset[int] = frozenset()) -> int | None:
+    """Symbol of the declared type, None if not declared or a generic parameter (only known per call)"""
+    if descriptor is None or len(descriptor.typeTree) == 0: return None
+    symbol = descriptor.typeTree[-1].symbol
+    return None if symbol in generics else symbol
+
+
+def _genericSymbols(generics: list[words.Generic]) -> frozenset[int]:
+    return frozenset(generic.typeTree[-1].symbol for generic in generics if len(generic.typeTree) > 0)
+
+
+class ClassInfo:
+    """Fields and methods declared in the body of a class"""
+
+    def __init__(self, declaration: sentences.ClassDeclaration) -> None:
+        self.declaration: sentences.ClassDeclaration = declaration
+        self.fields: dict[int, int | None] = {}
+        self.methods: dict[int, sentences.FunctionDeclaration] = {}
+
+    def signature(self) -> tuple:
+        return (tuple(sorted(self.fields.items(), key=lambda item: item[0])),
+            tuple(sorted((symbol, _signature(method)) for symbol, method in self.methods.items())))
+
+
+def _signature(declaration: sentences.FunctionDeclaration) -> tuple:
+    generics = _genericSymbols(declaration.generics)
+    return (tuple(typeOf(parameter.descriptor, generics) for parameter in declaration.parameters),
+        typeOf(declaration.returnDescriptor, generics), tuple(sorted(generics)))
+
+
+class Globals:
+    """Top level functions, classes and variables of the sentences being inferred"""
+
+    def __init__(self) -> None:
+        self.functions: dict[int, sentences.FunctionDeclaration] = {}
+        self.classes: dict[int, ClassInfo] = {}
+        self.variables: dict[int, int | None] = {}
+        self.bodies: list[tuple[sentences.FunctionDeclaration, ClassInfo | None, list[Sentence]]] = []
+        self.others: list[tuple[ClassInfo | None, Sentence]] = [] #SENTENCES OUTSIDE FUNCTIONS (GLOBALS, FIELDS)
+
+    def signatureOf(self, dependency: tuple[int, int]):
+        kind, symbol = dependency
+        if kind == FUNCTION:
+            declaration = self.functions.get(symbol)
+            return None if declaration is None else _signature(declaration)
+        if kind == CLASS:
+            info = self.classes.get(symbol)
+            return None if info is None else info.signature()
+        return self.variables.get(symbol, ())
+
+
+class _CachedFunction:
+    """Signatures of the dependencies when the function was inferred"""
+
+    def __init__(self, dependencies: dict[tuple[int, int], object]) -> None:
+        self.dependencies: dict[tuple[int, int], object] = dependencies
+
+
+class TypeInference:
+    """Keeps the cache between calls, give the same instance the same (unchanged) sentences to skip their functions.
+        Not thread safe, use one per thread
+    """
+
+    def __init__(self) -> None:
+        #KEYED BY THE DECLARATION ITSELF: REPARSED SOURCE IS NEW SENTENCES, AND DROPPED SENTENCES LEAVE THE CACHE
+        self.cache: WeakKeyDictionary[sentences.FunctionDeclaration, _CachedFunction] = WeakKeyDictionary()
+        self.inferred: int = 0 #FUNCTIONS INFERRED (NOT TAKEN FROM THE CACHE) BY THE LAST CALL
+        self.session: Globals = Globals() #GLOBALS OF THE PIECES GIVEN TO inferMore
+        self.dependents: dict[tuple[int, int], dict[sentences.FunctionDeclaration, tuple]] = {} #FUNCTIONS OF THE SESSION PER GLOBAL THEY MENTION
+
+    def infer(self, sentenceList: Iterable[Sentence]) -> None:
+        """Annotates every expression of the sentences. Bodies are parsed if they were not"""
+        table = collectGlobals(sentenceList)
+        self.inferred = 0
+
+        for declaration, owner, body in table.bodies:
+            cached = self.cache.get(declaration)
+            if cached is not None and all(table.signatureOf(d) == s for d, s in cached.dependencies.items()):
+                continue
+
+            function = _FunctionInference(table, declaration, owner)
+            for sentence in body:
+                function.sentence(sentence)
+
+            self.cache[declaration] = _CachedFunction({d: table.signatureOf(d) for d in function.dependencies})
+            self.inferred += 1
+
+        for owner, sentence in table.others:
+            _FunctionInference(table, None, owner).sentence(sentence)
+
+    def inferMore(self, sentenceList: Iterable[Sentence]) -> None:
+        """Annotates the next piece of the session: top level sentences (whole functions and classes) that follow
+            the ones of the previous calls. Costs the size of the piece and of the functions that depend on it
+        """
+        added = collectGlobals(sentenceList)
+        table = self.session
+        table.functions.update(added.functions)
+        table.classes.update(added.classes)
+        table.variables.update(added.variables)
+        self.inferred = 0
+
+        declared = [(FUNCTION, symbol) for symbol in added.functions] + [(CLASS, symbol) for symbol in added.classes] + [(VARIABLE, symbol) for symbol in added.variables]
+        stale = {}
+        for dependency in declared: stale.update(self.dependents.pop(dependency, {}))
+        for body in added.bodies: stale[body[0]] = body
+
+        for declaration, owner, body in stale.values():
+            function = _FunctionInference(table, declaration, owner)
+            for sentence in body:
+                function.sentence(sentence)
+            for dependency in function.dependencies:
+                self.dependents.setdefault(dependency, {})[declaration] = (declaration, owner, body)
+            self.inferred += 1
+
+        for owner, sentence in added.others:
+            _FunctionInference(table, None, owner).sentence(sentence)
+
+
+def collectGlobals(sentenceList: Iterable[Sentence]) -> Globals:
+    """Top level functions, classes (fields and methods) and variables, and the body of every function"""
+    table = Globals()
+    depth = 0
+    owner: ClassInfo | None = None #CLASS WHOSE BODY IS BEING READ
+    pending: Sentence | None = None
+    current: list[Sentence] | None = None #BODY OF THE FUNCTION BEING READ
+    currentDepth = 0
+
+    for sentence in sentences.flatten(sentenceList):
+        kind = type(sentence)
+
+        if current is not None:
+            current.append(sentence)
+            if kind == sentences.ScopeOpener: depth += 1
+            elif kind == sentences.ScopeCloser:
+                depth -= 1
+                if depth == currentDepth: current = None
+            continue
+
+        if kind == sentences.ScopeOpener:
+            if type(pending) == sentences.FunctionDeclaration:
+                current = [sentence]
+                currentDepth = depth
+                table.bodies.append((pending, owner if depth == 1 else None, current))
+            elif type(pending) == sentences.ClassDeclaration and depth == 0:
+                owner = table.classes[pending.symbol]
+            depth += 1
+            pending = None
+            continue
+
+        if kind == sentences.ScopeCloser:
+            depth -= 1
+            if depth == 0: owner = None
+            continue
+
+        pending = sentence
+        if kind in (sentences.VariableAssignment, sentences.NakedFunctionCall, sentences.ReturnExpression):
+            table.others.append((owner if depth == 1 else None, sentence))
+
+        if kind == sentences.FunctionDeclaration:
+            if depth == 0: table.functions[sentence.symbol] = sentence
+            elif owner is not None and depth == 1: owner.methods[sentence.symbol] = sentence
+
+        elif kind == sentences.ClassDeclaration:
+            if depth == 0: table.classes[sentence.symbol] = ClassInfo(sentence)
+
+        elif kind == sentences.VariableDeclaration or (kind == sentences.VariableAssignment and sentence.descriptor is not None):
+            symbol = sentence.symbol if kind == sentences.VariableDeclaration else sentence.nameTree[0].symbol
+            if depth == 0: table.variables[symbol] = typeOf(sentence.descriptor)
+            elif owner is not None and depth == 1: owner.fields[symbol] = typeOf(sentence.descriptor)
+
+    return table
+
+
+class _FunctionInference:
+
+    def __init__(self, table: Globals, declaration: sentences.FunctionDeclaration | None, owner: ClassInfo | None) -> None:
+        """declaration is None for the sentences outside functions"""
+        self.table: Globals = table
+        self.owner: ClassInfo | None = owner
+        self.generics: frozenset[int] = frozenset() if declaration is None else _genericSymbols(declaration.generics)
+        self.dependencies: set[tuple[int, int]] = set()
+        parameters = [] if declaration is None else declaration.parameters
+        self.scopes: list[dict[int, int | None]] = [{parameter.symbol: typeOf(parameter.descriptor, self.generics) for parameter in parameters}]
+        if owner is not None: self.dependencies.add((CLASS, owner.declaration.symbol))
+
+    def sentence(self, sentence: Sentence) -> None:
+        kind = type(sentence)
+
+        if kind == sentences.ScopeOpener: self.scopes.append({})
+        elif kind == sentences.ScopeCloser: self.scopes.pop()
+
+        elif kind == sentences.VariableDeclaration:
+            self.scopes[-1][sentence.symbol] = typeOf(sentence.descriptor, self.generics)
+
+        elif kind == sentences.VariableAssignment:
+            valueType = self.expression(sentence.expression)
+            if sentence.descriptor is not None:
+                self.scopes[-1][sentence.nameTree[0].symbol] = typeOf(sentence.descriptor, self.generics)
+            elif len(sentence.nameTree) == 1 and self.variable(sentence.nameTree[0].symbol) is None and valueType is not None:
+                self.assignUntyped(sentence.nameTree[0].symbol, valueType)
+            self.chain(sentence.nameTree)
+
+        elif kind == sentences.ReturnExpression: self.expression(sentence.expression)
+        elif kind == sentences.NakedFunctionCall: self.chain(sentence.tree)
+
+
+    def variable(self, symbol: int) -> int | None:
+        for scope in reversed(self.scopes):
+            if symbol in scope: return scope[symbol]
+        if self.owner is not None and symbol in self.owner.fields: return self.owner.fields[symbol]
+        self.dependencies.add((VARIABLE, symbol)) #ALSO IF UNKNOWN, DECLARING IT LATER CHANGES THE TYPE
+        return self.table.variables.get(symbol)
+
+    def assignUntyped(self, symbol: int, valueType: int) -> None:
+        """A local whose type was not known takes the type of what is assigned to it"""
+        for scope in reversed(self.scopes):
+            if symbol in scope:
+                scope[symbol] = valueType
+                return
+
+
+    def expression(self, expression: words.Expression) -> int | None:
+        if type(expression) != words.Operator: return self.chain(expression)
+
+        leftType = self.chain(expression.leftHand)
+        rightType = self.expression(expression.rightHand)
+        expression.operation, resolved = SUM_OPERATIONS.get((leftType, rightType), (Operation.DYNAMIC, None))
+        expression.resolvedType = None if resolved is None else nameOf(resolved)
+        return resolved
+
+    def chain(self, chain: list[words.Crawlable]) -> int | None:
+        """Type of every step of the chain, returns the type of the last one"""
+        current: int | None = None
+
+        for index, crawlable in enumerate(chain):
+            kind = type(crawlable)
+
+            if kind == words.NumberLiteral: current = FLOAT if crawlable.isFloat else INT
+            elif kind == words.StringLiteral: current = STRING
+
+            elif kind == words.NameMention:
+                current = self.variable(crawlable.symbol) if index == 0 else self.member(current, crawlable.symbol)
+
+            elif kind == words.FunctionCall:
+                for argument in crawlable.parameters: self.expression(argument)
+                current = self.call(crawlable, None if index == 0 else current, index == 0)
+
+            crawlable.resolvedType = None if current is None else nameOf(current)
+
+        return current
+
+    def member(self, ownerType: int | None, symbol: int) -> int | None:
+        info = self.classInfo(ownerType)
+        if info is None: return None
+        return info.fields.get(symbol)
+
+    def call(self, call: words.FunctionCall, receiverType: int | None, isFirst: bool) -> int | None:
+        symbol = call.functionSymbol
+        if isFirst:
+            self.dependencies.add((CLASS, symbol))
+            if symbol in self.table.classes: return symbol #CONSTRUCTION
+
+            method = self.owner.methods.get(symbol) if self.owner is not None else None
+            if method is not None: return self.returnType(method, call)
+
+            self.dependencies.add((FUNCTION, symbol))
+            declaration = self.table.functions.get(symbol)
+            return None if declaration is None else self.returnType(declaration, call)
+
+        info = self.classInfo(receiverType)
+        if info is None or symbol not in info.methods: return None
+        return self.returnType(info.methods[symbol], call)
+
+    def returnType(self, declaration: sentences.FunctionDeclaration, call: words.FunctionCall) -> int | None:
+        """Declared return type, a generic return type is resolved with the generics given in the call (f<int>())"""
+        if declaration.returnDescriptor is None or len(declaration.returnDescriptor.typeTree) == 0: return None
+        symbol = declaration.returnDescriptor.typeTree[-1].symbol
+
+        for generic, given in zip(declaration.generics, call.generics):
+            if len(generic.typeTree) > 0 and generic.typeTree[-1].symbol == symbol:
+                return given.typeTree[-1].symbol if len(given.typeTree) > 0 else None
+
+        return None if symbol in _genericSymbols(declaration.generics) else symbol
+
+    def classInfo(self, classSymbol: int | None) -> ClassInfo | None:
+        if classSymbol is None: return None
+        self.dependencies.add((CLASS, classSymbol))
+        return self.table.classes.get(classSymbol)
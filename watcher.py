@@ -0,0 +1,250 @@
+"""
+Watch mode. Waits for .lf files to change (inotify where available, polling otherwise), debounces bursts of saves
+and recompiles only the changed files and their dependents, keeping recently used parsed files in memory
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from tokenizer import Tokenizer
+from sentencer import Sentencer
+from sentences import Sentence
+from compiler import CompilerContext
+from typeInference import TypeInference
+from buildGraph import BuildGraph, collectFiles
+
+
+DEBOUNCE_SECONDS = 0.02
+POLL_SECONDS = 0.1
+
+
+class PollingWatcher:
+    """Fallback watcher, compares modification times of the .lf files"""
+
+    def __init__(self, paths: list[str]) -> None:
+        self.paths: list[str] = paths
+        self.mtimes: dict[str, int] = self._scan()
+
+    def _scan(self) -> dict[str, int]:
+        mtimes = {}
+        for path in collectFiles(self.paths):
+            try: mtimes[os.path.normpath(path)] = os.stat(path).st_mtime_ns
+            except FileNotFoundError: pass
+        return mtimes
+
+    def waitForChanges(self, timeout: float | None) -> set[str]:
+        """Returns the paths that changed, or an empty set if nothing changed before the timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        while True:
+            mtimes = self._scan()
+            changed = {p for p in mtimes.keys() | self.mtimes.keys() if mtimes.get(p) != self.mtimes.get(p)}
+            self.mtimes = mtimes
+            if len(changed) > 0: return changed
+
+            if deadline is not None and time.monotonic() >= deadline: return set()
+            time.sleep(POLL_SECONDS if deadline is None else max(0, min(POLL_SECONDS, deadline - time.monotonic())))
+
+    def close(self) -> None:
+        pass
+
+
+class InotifyWatcher:
+    """Linux watcher, the kernel tells us which files were written, created, moved or deleted"""
+
+    IN_CLOSE_WRITE = 0x008
+    IN_MOVED_FROM = 0x040
+    IN_MOVED_TO = 0x080
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    IN_ISDIR = 0x40000000
+    MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+    EVENT = struct.Struct("iIII")
+
+    def __init__(self, paths: list[str]) -> None:
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd: int = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        self.directories: dict[int, str] = {}
+        self.trees: list[str] = []
+        self.files: set[str] = set()
+        for path in paths:
+            if os.path.isdir(path):
+                self.trees.append(os.path.normpath(path))
+                self._watchTree(path)
+            else:
+                self.files.add(os.path.normpath(path))
+                self._watch(os.path.dirname(path) or ".")
+
+    def _watch(self, directory: str) -> None:
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), self.MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"cannot watch {directory}")
+        self.directories[wd] = directory
+
+    def _watchTree(self, directory: str) -> set[str]:
+        """Watches the directory and its subdirectories, returns the .lf files found in them"""
+        found = set()
+        for root, _, names in os.walk(directory):
+            self._watch(root)
+            found |= {os.path.normpath(os.path.join(root, n)) for n in names if n.endswith(".lf")}
+        return found
+
+    def _isWatched(self, path: str) -> bool:
+        if not path.endswith(".lf"): return False
+        return path in self.files or any(not os.path.relpath(path, tree).startswith("..") for tree in self.trees)
+
+    def waitForChanges(self, timeout: float | None) -> set[str]:
+        """Returns the paths that changed, or an empty set if nothing changed before the timeout"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if len(ready) == 0: return set()
+
+        changed = set()
+        data = os.read(self.fd, 64 * 1024)
+        offset = 0
+
+        while offset < len(data):
+            wd, mask, _, length = self.EVENT.unpack_from(data, offset)
+            offset += self.EVENT.size
+            name = data[offset:offset + length].rstrip(b"\0").decode()
+            offset += length
+
+            directory = self.directories.get(wd)
+            if directory is None: continue
+            path = os.path.normpath(os.path.join(directory, name))
+
+            if mask & self.IN_ISDIR:
+                if mask & (self.IN_CREATE | self.IN_MOVED_TO): changed |= self._watchTree(path)
+            elif self._isWatched(path):
+                changed.add(path)
+
+        return changed
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+def makeWatcher(paths: list[str]) -> InotifyWatcher | PollingWatcher:
+    try:
+        return InotifyWatcher(paths)
+    except (OSError, AttributeError, TypeError):
+        #NO LIBC OR NO inotify (NOT LINUX)
+        return PollingWatcher(paths)
+
+
+class ParsedCache:
+    """Parsed sentences of recently touched files. Files untouched for maxIdle seconds, or the least recently used ones
+        beyond maxEntries, are evicted so long sessions stay bounded
+    """
+
+    def __init__(self, maxEntries: int = 512, maxIdle: float = 600) -> None:
+        self.maxEntries: int = maxEntries
+        self.maxIdle: float = maxIdle
+        self.entries: OrderedDict[str, tuple[str, list[Sentence], float]] = OrderedDict()
+
+    def get(self, path: str, contentHash: str) -> list[Sentence] | None:
+        entry = self.entries.get(path)
+        if entry is None or entry[0] != contentHash: return None
+
+        self.entries[path] = (entry[0], entry[1], time.monotonic())
+        self.entries.move_to_end(path)
+        return entry[1]
+
+    def put(self, path: str, contentHash: str, sentences: list[Sentence]) -> None:
+        self.entries[path] = (contentHash, sentences, time.monotonic())
+        self.entries.move_to_end(path)
+        self.evict()
+
+    def evict(self) -> None:
+        limit = time.monotonic() - self.maxIdle
+        while len(self.entries) > 0:
+            path, (_, _, touched) = next(iter(self.entries.items()))
+            if len(self.entries) <= self.maxEntries and touched >= limit: break
+            del self.entries[path]
+
+
+class WatchSession:
+    """Keeps the build graph and the parsed files alive between rebuilds"""
+
+    def __init__(self, paths: list[str], workers: int = 1, explain: bool = False) -> None:
+        self.paths: list[str] = paths
+        self.workers: int = workers
+        self.explain: bool = explain
+        self.graph: BuildGraph = BuildGraph()
+        self.cache: ParsedCache = ParsedCache()
+        self.types: TypeInference = TypeInference() #FUNCTIONS OF CACHED FILES ARE NOT INFERRED AGAIN
+        self.files: list[str] = [os.path.normpath(p) for p in collectFiles(paths)]
+        self.pool: ProcessPoolExecutor | None = ProcessPoolExecutor(workers) if workers > 1 else None #ONE FOR EVERY REBUILD
+
+    def rebuild(self, changed: set[str] | None = None) -> None:
+        start = time.perf_counter()
+
+        if changed is not None and any(p not in self.files or not os.path.exists(p) for p in changed):
+            self.files = [os.path.normpath(p) for p in collectFiles(self.paths)]
+
+        steps = self.graph.plan(self.files, changed)
+
+        for step in steps:
+            if self.explain: print(f"{step.path}: rebuilding, {step.reason}")
+
+            try:
+                CompilerContext(self.workers, self.types, self.pool).compile(self._sentencesOf(step.path, step.sentences))
+            except Exception as e:
+                print(f"{step.path}: {e}")
+                self.graph.markFailed(step.path)
+            else:
+                self.graph.markBuilt(step.path)
+
+        self.graph.save()
+        self.cache.evict()
+        print(f"Rebuilt {len(steps)} file(s) in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    def _sentencesOf(self, path: str, parsed: list[Sentence] | None) -> list[Sentence]:
+        contentHash = self.graph.interfaces[path].contentHash
+        if parsed is None:
+            parsed = self.cache.get(path, contentHash)
+
+        if parsed is None:
+            with open(path, "r") as f:
+                parsed = Sentencer().parseSentences(Tokenizer().tokenize(f.read()))
+
+        self.cache.put(path, contentHash, parsed)
+        return parsed
+
+    def close(self) -> None:
+        if self.pool is not None: self.pool.shutdown()
+
+
+def watch(paths: list[str], workers: int = 1, explain: bool = False) -> None:
+    """Rebuilds everything once and then after every (debounced) burst of changes, until interrupted"""
+    session = WatchSession(paths, workers, explain)
+    watcher = makeWatcher(paths)
+    session.rebuild()
+
+    try:
+        while True:
+            changed = watcher.waitForChanges(None)
+            if len(changed) == 0: continue #SOMETHING ELSE IN THE TREE CHANGED, LIKE THE BUILD STATE FILE
+
+            while True:
+                more = watcher.waitForChanges(DEBOUNCE_SECONDS)
+                if len(more) == 0: break
+                changed |= more
+
+            session.rebuild(changed)
+
+    except KeyboardInterrupt:
+        pass
+
+    finally:
+        watcher.close()
+        session.close()
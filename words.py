@@ -4,9 +4,13 @@ Words are small structures within sentences sentences
 from enum import IntEnum
 
 from tokenizer import TokenKind
+from symbols import Interned, intern
+
+PLUS = int(TokenKind.PLUS) #TOKENS CARRY THEIR KIND AS A PLAIN int
 
 class NumberLiteral:
     """A number literal, such as 5 or 3.2"""
+    resolvedType: str | None = None #SET BY THE TYPE INFERENCE, ALSO IN THE OTHER CRAWLABLES
     
     def __init__(self, value: str, isFloat: bool) -> None:
         self.value: str = value
@@ -15,13 +19,18 @@ class NumberLiteral:
 
 class StringLiteral:
     """A string literal, between brackets, such as "John" """
+    resolvedType: str | None = None
     def __init__(self, value: str) -> None:
         self.value: str = value
 
-class NameMention:
+class NameMention(Interned):
     """String of the name of a variable or class. Can be chained (car.windshield) (would get the last) but not functions/methods"""
-    def __init__(self, value) -> None:
+    symbolFields = (("symbol", "value"),)
+    resolvedType: str | None = None
+
+    def __init__(self, value, symbol: int | None = None) -> None:
         self.value: str = value
+        self.symbol: int = intern(value) if symbol is None else symbol
 
     def __repr__(self) -> str:
         return f"{self.value}"
@@ -39,10 +48,14 @@ class Generic:
     def __repr__(self) -> str:
         return f"Generic {self.typeTree} appertains {self.appertains} behaves {self.behaves}"
 
-class FunctionCall:
+class FunctionCall(Interned):
     """Call of a function (or method) includes the name of the function (car.speed() is only speed) and the params and generics"""
-    def __init__(self, functionName: str, parameters: list[list["Crawlable"]], generics: list["Generic"]) -> None:
+    symbolFields = (("functionSymbol", "functionName"),)
+    resolvedType: str | None = None
+
+    def __init__(self, functionName: str, parameters: list[list["Crawlable"]], generics: list["Generic"], functionSymbol: int | None = None) -> None:
         self.functionName: str = functionName
+        self.functionSymbol: int = intern(functionName) if functionSymbol is None else functionSymbol
         self.parameters: list[ParameterDescription] = parameters
         self.generics: list[Generic] = generics
 
@@ -59,10 +72,13 @@ class VariableDescriptor:
     def __repr__(self) -> str:
         return f"type {self.typeTree} features {self.features} generics {self.generics}"
 
-class ParameterDescription:
+class ParameterDescription(Interned):
     """Name and descriptor of a parameter in a function declaration"""
-    def __init__(self, name: str, descriptor: VariableDescriptor) -> None:
+    symbolFields = (("symbol", "name"),)
+
+    def __init__(self, name: str, descriptor: VariableDescriptor, symbol: int | None = None) -> None:
         self.name: str = name
+        self.symbol: int = intern(name) if symbol is None else symbol
         self.descriptor: VariableDescriptor = descriptor
 
     def __repr__(self) -> str:
@@ -78,7 +94,18 @@ class OperatorKind(IntEnum):
     SUM = 0
 
 
+class Operation(IntEnum):
+    """What an operator does once the types of its operands are known"""
+    DYNAMIC = 0 #TYPES ONLY KNOWN AT RUNTIME, THE BACKEND HAS TO CHECK THEM
+    ADD_INT = 1
+    ADD_FLOAT = 2
+    CONCAT = 3
+
+
 class Operator:
+    resolvedType: str | None = None #SET BY THE TYPE INFERENCE
+    operation: Operation = Operation.DYNAMIC
+
     def __init__(self, kind: OperatorKind, leftHand: list[Crawlable], rightHand: list[Crawlable]) -> None:
         self.kind: OperatorKind = kind
         self.leftHand: list[Crawlable] = leftHand
@@ -86,8 +113,8 @@ class Operator:
 
 
     @staticmethod
-    def getOperator(tokenKind: TokenKind) -> None | OperatorKind:
-        if tokenKind == TokenKind.PLUS: return OperatorKind.SUM
+    def getOperator(tokenKind: int) -> None | OperatorKind:
+        if tokenKind == PLUS: return OperatorKind.SUM
 
         return None
     